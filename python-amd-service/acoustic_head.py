@@ -0,0 +1,93 @@
+"""
+Acoustic human/machine head on the shared Wav2Vec2 encoder
+One encoder pass per window feeds both the CTC head (transcription) and a
+small classifier over the mean-pooled hidden states of one encoder layer
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import torch
+from torch import nn
+from safetensors import safe_open
+from safetensors.torch import save_file
+
+LABELS = ("human", "machine")
+
+
+class AcousticHead(nn.Module):
+    """LayerNorm + two-layer MLP over pooled Wav2Vec2 hidden states
+
+    `layer` indexes the encoder's hidden_states tuple (0 = feature projection,
+    -1 = last layer, the one the CTC head reads).
+    """
+
+    def __init__(self, hidden_size: int, layer: int = -1, hidden: int = 128):
+        super().__init__()
+        self.hidden_size = hidden_size
+        self.layer = layer
+        self.hidden = hidden
+        self.net = nn.Sequential(
+            nn.LayerNorm(hidden_size),
+            nn.Linear(hidden_size, hidden),
+            nn.GELU(),
+            nn.Linear(hidden, len(LABELS)),
+        )
+
+    def forward(self, pooled: torch.Tensor) -> torch.Tensor:
+        return self.net(pooled)
+
+    @torch.no_grad()
+    def machine_probability(self, pooled: torch.Tensor) -> torch.Tensor:
+        return torch.softmax(self.forward(pooled.float()), dim=-1)[:, LABELS.index("machine")]
+
+
+def mean_pool(hidden: torch.Tensor, lengths: torch.Tensor) -> torch.Tensor:
+    """Mean over the first `lengths[i]` frames of each sequence (padding excluded)"""
+    frames = torch.arange(hidden.shape[1], device=hidden.device)
+    mask = (frames[None, :] < lengths[:, None]).to(hidden.dtype)
+    return (hidden * mask[..., None]).sum(dim=1) / mask.sum(dim=1, keepdim=True).clamp(min=1)
+
+
+@torch.no_grad()
+def encode(
+    model,
+    input_values: torch.Tensor,
+    attention_mask: Optional[torch.Tensor],
+    num_samples: Sequence[int],
+    layers: Sequence[int] = (),
+) -> Tuple[torch.Tensor, List[torch.Tensor]]:
+    """CTC logits and pooled hidden states of `layers` from one Wav2Vec2ForCTC encoder pass
+
+    Same computation as Wav2Vec2ForCTC.forward up to the logits. Hidden states
+    are averaged over each window's real frames only (`num_samples` at 16kHz),
+    not over the padding a batch adds to shorter windows.
+    """
+    need_all = any(layer != -1 for layer in layers)
+    outputs = model.wav2vec2(input_values, attention_mask=attention_mask, output_hidden_states=need_all)
+    last = outputs.last_hidden_state
+    logits = model.lm_head(model.dropout(last))
+
+    lengths = model._get_feat_extract_output_lengths(torch.tensor(list(num_samples))).to(last.device)
+    pooled = [
+        mean_pool(last if layer == -1 else outputs.hidden_states[layer], lengths)
+        for layer in layers
+    ]
+    return logits, pooled
+
+
+def save_head(head: AcousticHead, path: str, metrics: Optional[Dict[str, float]] = None):
+    """Write the head's weights and shape as safetensors (metrics go into the metadata)"""
+    metadata = {"hidden_size": str(head.hidden_size), "layer": str(head.layer), "hidden": str(head.hidden)}
+    for key, value in (metrics or {}).items():
+        metadata[f"metric.{key}"] = str(value)
+    save_file({key: value.contiguous() for key, value in head.state_dict().items()}, path, metadata=metadata)
+
+
+def load_head(path: str) -> Tuple[AcousticHead, Dict[str, str]]:
+    """Head saved by `save_head`, in eval mode, and its file metadata"""
+    with safe_open(path, framework="pt") as f:
+        metadata = f.metadata() or {}
+        state = {key: f.get_tensor(key) for key in f.keys()}
+    head = AcousticHead(int(metadata["hidden_size"]), int(metadata["layer"]), int(metadata["hidden"]))
+    head.load_state_dict(state)
+    return head.eval(), metadata
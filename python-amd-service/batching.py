@@ -0,0 +1,135 @@
+"""
+Cross-session micro-batching scheduler
+Collects inference requests from every active stream and /analyze call and
+runs them through the model as padded batches
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from metrics import QUEUE_WAIT_SECONDS
+from profiling import current_profile
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Groups concurrent submissions into batches bounded by size and wait time"""
+
+    def __init__(
+        self,
+        name: str,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 20.0,
+        pool=None,
+    ):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.pool = pool  # InferencePool that runs the batch; default executor if None
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.batches_run = 0
+        self.items_processed = 0
+        self.largest_batch = 0
+
+    def start(self):
+        """Start the batching worker on the running event loop"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the worker and fail anything still queued"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        while self._queue is not None and not self._queue.empty():
+            _, future, _, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError(f"{self.name} scheduler stopped"))
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result from the next batch"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future, time.monotonic(), current_profile.get()))
+        return await future
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future, float, Any]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _execute(self, items: List[Any]) -> List[Any]:
+        if self.pool is not None:
+            return await self.pool.run(self.batch_fn, items)
+        return await asyncio.get_running_loop().run_in_executor(None, self.batch_fn, items)
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            batch = [entry for entry in batch if not entry[1].cancelled()]
+            if not batch:
+                continue
+            # Time from submission until the batch starts, including the collection window
+            wait = QUEUE_WAIT_SECONDS.labels(f"batch:{self.name}")
+            now = time.monotonic()
+            for _, _, enqueued_at, _ in batch:
+                wait.observe(now - enqueued_at)
+
+            items = [item for item, _, _, _ in batch]
+            # A batch holding a profiled request's item is profiled on its behalf
+            profile = next((entry[3] for entry in batch if entry[3] is not None), None)
+            token = current_profile.set(profile)
+            try:
+                results = await self._execute(items)
+            except Exception as e:
+                logger.error(f"{self.name} batch of {len(items)} failed: {e}")
+                for _, future, _, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                current_profile.reset(token)
+
+            self.batches_run += 1
+            self.items_processed += len(items)
+            self.largest_batch = max(self.largest_batch, len(items))
+
+            for (_, future, _, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self) -> Dict:
+        """Batching counters for health reporting"""
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batches_run": self.batches_run,
+            "items_processed": self.items_processed,
+            "avg_batch_size": (self.items_processed / self.batches_run) if self.batches_run else 0.0,
+            "largest_batch": self.largest_batch,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
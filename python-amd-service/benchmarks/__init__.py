@@ -0,0 +1,4 @@
+"""
+Benchmarks for the AMD ML microservice
+Run from python-amd-service/, e.g. `python -m benchmarks.codec_bench`
+"""
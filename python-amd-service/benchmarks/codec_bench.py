@@ -0,0 +1,70 @@
+"""
+Microbenchmark: G.711 table decode vs the original stream decode
+Usage: python -m benchmarks.codec_bench [--frames N] [--repeat N]
+"""
+
+import argparse
+import base64
+import json
+import timeit
+
+import numpy as np
+
+from codec import decode_mulaw, encode_mulaw
+
+
+def legacy_decode(chunk: bytes) -> np.ndarray:
+    """The decode websocket_stream used before codec.py (not real G.711)"""
+    audio_data = np.frombuffer(chunk, dtype=np.uint8)
+    return (audio_data.astype(np.float32) - 128) / 128.0
+
+
+def run(frames: int, repeat: int) -> dict:
+    rng = np.random.default_rng(0)
+    pcm = (rng.standard_normal(160 * frames) * 4000).clip(-32768, 32767).astype(np.int16)
+    encoded = encode_mulaw(pcm)
+    frame = encoded[:160]
+    payload = base64.b64encode(frame).decode()
+    scratch = np.empty(1024, dtype=np.float32)
+
+    cases = {
+        "legacy_frame": lambda: legacy_decode(frame),
+        "table_frame": lambda: decode_mulaw(frame),
+        "table_frame_preallocated": lambda: decode_mulaw(frame, out=scratch),
+        "legacy_payload": lambda: legacy_decode(base64.b64decode(payload)),
+        "table_payload_preallocated": lambda: decode_mulaw(base64.b64decode(payload), out=scratch),
+        "legacy_buffer": lambda: legacy_decode(encoded),
+        "table_buffer": lambda: decode_mulaw(encoded),
+    }
+
+    results = {}
+    for name, fn in cases.items():
+        number = 2000 if "buffer" not in name else 20
+        best = min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+        samples = len(encoded) if "buffer" in name else 160
+        results[name] = {"us_per_call": best * 1e6, "ns_per_sample": best * 1e9 / samples}
+
+    # Decode accuracy against the original 16-bit signal
+    reference = pcm.astype(np.float32) / 32768.0
+    results["snr_db"] = {
+        "legacy": _snr(reference, legacy_decode(encoded)),
+        "table": _snr(reference, decode_mulaw(encoded)),
+    }
+    return results
+
+
+def _snr(reference: np.ndarray, decoded: np.ndarray) -> float:
+    noise = np.sum((reference - decoded) ** 2)
+    return float(10 * np.log10(np.sum(reference ** 2) / max(noise, 1e-12)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=150, help="20ms frames in the buffer case (150 = 3s)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.frames, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Synthetic 8kHz call-audio corpus for the benchmarks: speech-like greetings,
+voicemail greetings ending in a beep, call-progress tones and line noise,
+encoded as PCM16 or mu-law
+Usage: python -m benchmarks.corpus OUT_DIR [--clips 24] [--seconds 6] [--seed 0]
+"""
+
+import argparse
+import json
+import os
+import wave
+from typing import List, Tuple
+
+import numpy as np
+
+from codec import encode_mulaw
+
+SAMPLE_RATE = 8000
+ENCODINGS = ("pcm16", "mulaw")
+
+# kind -> label in the tools/labeled_audio.py layout ("other" is ignored there)
+KINDS = {
+    "greeting": "human",
+    "voicemail_beep": "machine",
+    "ringback": "other",
+    "noise": "other",
+}
+
+
+def tone(frequencies, seconds: float, level: float = 0.3) -> np.ndarray:
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return (level * sum(np.sin(2 * np.pi * f * t) for f in frequencies) / len(frequencies)).astype(np.float32)
+
+
+def noise(seconds: float, rng, level: float = 0.01) -> np.ndarray:
+    return (level * rng.standard_normal(int(SAMPLE_RATE * seconds))).astype(np.float32)
+
+
+def speech_like(seconds: float, rng) -> np.ndarray:
+    """Harmonic vowel-like bursts with a wandering pitch, separated by pauses"""
+    out = []
+    while sum(len(x) for x in out) < SAMPLE_RATE * seconds:
+        pitch = rng.uniform(90, 240)
+        n = int(SAMPLE_RATE * rng.uniform(0.1, 0.4))
+        t = np.arange(n) / SAMPLE_RATE
+        f0 = pitch * (1 + 0.05 * np.sin(2 * np.pi * 3 * t))
+        phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+        burst = sum(np.sin(k * phase) / k for k in range(1, 12)) * np.hanning(n)
+        out += [0.2 * burst, np.zeros(int(SAMPLE_RATE * rng.uniform(0.05, 0.2)))]
+    return np.concatenate(out)[:int(SAMPLE_RATE * seconds)].astype(np.float32)
+
+
+def _fit(audio: np.ndarray, seconds: float, rng) -> np.ndarray:
+    n = int(SAMPLE_RATE * seconds)
+    if len(audio) < n:
+        audio = np.concatenate([audio, noise((n - len(audio)) / SAMPLE_RATE, rng)])
+    return audio[:n]
+
+
+def make_clip(kind: str, seconds: float, rng) -> np.ndarray:
+    """One clip of the given kind, float32 in [-1, 1]"""
+    if kind == "greeting":
+        # "Hello?" then a pause for the caller, like a person answering
+        talk = rng.uniform(0.6, 1.5)
+        audio = np.concatenate([noise(0.3, rng), speech_like(talk, rng), noise(1.2, rng), speech_like(talk, rng)])
+    elif kind == "voicemail_beep":
+        # A long uninterrupted greeting followed by the record beep
+        beep_at = max(0.5, seconds - 1.0)
+        audio = np.concatenate([
+            speech_like(beep_at, rng),
+            tone([rng.choice([850, 1000, 1400])], 0.4),
+        ])
+    elif kind == "ringback":
+        audio = np.concatenate([tone([440, 480], 2.0), noise(4.0, rng)] * 2)
+    elif kind == "noise":
+        audio = noise(seconds, rng, level=rng.uniform(0.005, 0.05))
+    else:
+        raise ValueError(f"Unknown clip kind: {kind}")
+    return np.clip(_fit(audio, seconds, rng), -1.0, 1.0)
+
+
+def make_corpus(clips: int = 24, seconds: float = 6.0, seed: int = 0) -> List[Tuple[str, str, np.ndarray]]:
+    """(name, kind, audio) for `clips` clips, cycling through the kinds"""
+    rng = np.random.default_rng(seed)
+    kinds = list(KINDS)
+    corpus = []
+    for i in range(clips):
+        kind = kinds[i % len(kinds)]
+        corpus.append((f"{kind}_{i:03d}", kind, make_clip(kind, seconds, rng)))
+    return corpus
+
+
+def to_pcm16(audio: np.ndarray) -> np.ndarray:
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+
+
+def encode(audio: np.ndarray, encoding: str) -> bytes:
+    """Wire bytes of a clip in a service encoding (pcm16 or mulaw)"""
+    if encoding == "pcm16":
+        return to_pcm16(audio).astype("<i2").tobytes()
+    if encoding == "mulaw":
+        return encode_mulaw(to_pcm16(audio))
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def write_corpus(out_dir: str, corpus: List[Tuple[str, str, np.ndarray]]):
+    """Write PCM16 WAVs as <out>/<label>/<name>.wav plus a manifest.json"""
+    manifest = []
+    for name, kind, audio in corpus:
+        label = KINDS[kind]
+        os.makedirs(os.path.join(out_dir, label), exist_ok=True)
+        path = os.path.join(label, f"{name}.wav")
+        with wave.open(os.path.join(out_dir, path), "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(SAMPLE_RATE)
+            f.writeframes(encode(audio, "pcm16"))
+        manifest.append({"path": path, "kind": kind, "label": label, "seconds": len(audio) / SAMPLE_RATE})
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("out_dir")
+    parser.add_argument("--clips", type=int, default=24)
+    parser.add_argument("--seconds", type=float, default=6.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    corpus = make_corpus(args.clips, args.seconds, args.seed)
+    write_corpus(args.out_dir, corpus)
+    print(f"Wrote {len(corpus)} clips to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
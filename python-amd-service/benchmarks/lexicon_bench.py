@@ -0,0 +1,76 @@
+"""
+Microbenchmark: compiled phrase matcher vs the original substring scan,
+as the lexicon grows
+Usage: python -m benchmarks.lexicon_bench [--sizes 20 100 1000 10000] [--repeat N]
+"""
+
+import argparse
+import json
+import random
+import timeit
+
+import config
+from lexicon import PhraseMatcher, load_lexicon
+
+TRANSCRIPTION = (
+    "Hi, you have reached the voicemail of John Smith. I'm not available right now. "
+    "Please leave a message after the beep and I will call you back as soon as I can."
+)
+
+
+def legacy_score(text: str, machine_patterns, human_patterns) -> tuple:
+    """The per-call substring scan analyze_transcription_for_amd used before lexicon.py"""
+    text = text.lower().strip()
+    machine_score = sum(1 for pattern in machine_patterns if pattern in text)
+    human_score = sum(1 for pattern in human_patterns if pattern in text)
+    return machine_score, human_score
+
+
+def synthetic_lexicon(size: int, seed: int = 0) -> dict:
+    """The shipped lexicon padded with random 1-5 word phrases up to `size` phrases"""
+    rng = random.Random(seed)
+    lexicon = load_lexicon(config.LEXICON_PATH)
+    vocabulary = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9))) for _ in range(5000)]
+    labels = list(lexicon)
+    total = sum(len(entries) for entries in lexicon.values())
+    while total < size:
+        phrase = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 5)))
+        label = labels[total % len(labels)]
+        if phrase not in lexicon[label]:
+            lexicon[label][phrase] = 1.0
+            total += 1
+    return lexicon
+
+
+def run(sizes, repeat: int) -> dict:
+    results = {}
+    for size in sizes:
+        lexicon = synthetic_lexicon(size)
+        machine, human = list(lexicon["machine"]), list(lexicon["human"])
+
+        build_s = min(timeit.repeat(lambda: PhraseMatcher(lexicon), number=1, repeat=repeat))
+        matcher = PhraseMatcher(lexicon)
+        number = 2000 if size <= 1000 else 200
+        legacy_s = min(timeit.repeat(lambda: legacy_score(TRANSCRIPTION, machine, human), number=number, repeat=repeat)) / number
+        matcher_s = min(timeit.repeat(lambda: matcher.score(TRANSCRIPTION), number=number, repeat=repeat)) / number
+
+        results[str(size)] = {
+            "build_ms": build_s * 1000,
+            "legacy_us_per_call": legacy_s * 1e6,
+            "matcher_us_per_call": matcher_s * 1e6,
+            "speedup": legacy_s / matcher_s,
+            "matched": matcher.score(TRANSCRIPTION)[1],
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 100, 1000, 10000], help="Lexicon sizes (phrases)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.sizes, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
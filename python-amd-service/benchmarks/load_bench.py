@@ -0,0 +1,451 @@
+"""
+Benchmark: load and latency of main.py / main_simple.py under concurrent /analyze
+requests, /analyze/batch loads and /stream/{call_sid} sessions on a synthetic corpus
+Usage: python -m benchmarks.load_bench [--service simple|ml] [--stub] [--small]
+       [--scenarios analyze,batch,stream] [--concurrency 8] [--sessions 8] [--out report.json]
+       python -m benchmarks.load_bench --url http://host:8001 [--pid PID] ...
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+import websockets
+
+from benchmarks.corpus import ENCODINGS, SAMPLE_RATE, encode, make_corpus
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICES = {"simple": "main_simple:app", "ml": "main:app"}
+SCENARIOS = ("analyze", "batch", "stream")
+FRAME_BYTES = SAMPLE_RATE // 50  # one 20ms mu-law media frame, as Twilio sends
+
+
+def summarize(values: List[float]) -> Dict:
+    """Count, mean and tail percentiles of latencies in ms"""
+    if not values:
+        return {"count": 0}
+    values = np.asarray(values)
+    return {
+        "count": len(values),
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "p99": float(np.percentile(values, 99)),
+        "max": float(values.max()),
+    }
+
+
+class ProcessMonitor:
+    """CPU time and resident memory of the service process over one scenario
+
+    Reads /proc/<pid>, so it needs Linux and a service on this host; without a
+    pid only the benchmark client's own CPU time is reported.
+    """
+
+    def __init__(self, pid: Optional[int], interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self._page_size = os.sysconf("SC_PAGE_SIZE")
+        self._ticks = os.sysconf("SC_CLK_TCK")
+
+    def _cpu_seconds(self) -> Optional[float]:
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / self._ticks  # utime + stime
+        except (OSError, IndexError, ValueError):
+            return None
+
+    def _rss_bytes(self) -> Optional[int]:
+        try:
+            with open(f"/proc/{self.pid}/statm") as f:
+                return int(f.read().split()[1]) * self._page_size
+        except (OSError, IndexError, ValueError):
+            return None
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            rss = self._rss_bytes()
+            if rss is not None:
+                self._peak = max(self._peak, rss)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self._client_start = resource.getrusage(resource.RUSAGE_SELF)
+        self._peak = 0
+        if self.pid is not None:
+            self._cpu_start = self._cpu_seconds()
+            self._done = threading.Event()
+            self._sampler = threading.Thread(target=self._sample, daemon=True)
+            self._sampler.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.duration = time.perf_counter() - self._start
+        client = resource.getrusage(resource.RUSAGE_SELF)
+        self.result = {
+            "client_cpu_seconds": (client.ru_utime - self._client_start.ru_utime)
+            + (client.ru_stime - self._client_start.ru_stime),
+        }
+        if self.pid is not None:
+            self._done.set()
+            self._sampler.join()
+            cpu_end, rss_end = self._cpu_seconds(), self._rss_bytes()
+            if cpu_end is not None and self._cpu_start is not None:
+                cpu = cpu_end - self._cpu_start
+                self.result["service_cpu_seconds"] = cpu
+                self.result["service_cpu_percent"] = cpu / self.duration * 100 if self.duration else 0.0
+            if rss_end is not None:
+                self.result["service_rss_mb_peak"] = max(self._peak, rss_end) / 2**20
+                self.result["service_rss_mb_end"] = rss_end / 2**20
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def service_env(args) -> Dict[str, str]:
+    """Environment for a service started with the benchmark's settings"""
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    if not args.cache:
+        # The corpus repeats, so cached results would hide the model cost
+        env["RESULT_CACHE_MAX_ENTRIES"] = "0"
+    if args.stub:
+        # Weight-free ML service: only the WebRTC VAD analyzer is used
+        env.update(PRELOAD_MODELS="vad", MODEL_WARMUP="false", HF_HUB_OFFLINE="1", TRANSFORMERS_OFFLINE="1")
+    if args.small:
+        env["WHISPER_MODEL"] = "tiny"
+    if args.model_store:
+        env["MODEL_STORE_DIR"] = args.model_store
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    return env
+
+
+def start_service(args, port: int, log_file) -> subprocess.Popen:
+    """Run the service under uvicorn on localhost with the benchmark's settings"""
+    command = [sys.executable, "-m", "uvicorn", SERVICES[args.service],
+               "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=SERVICE_DIR, env=service_env(args), stdout=log_file, stderr=subprocess.STDOUT)
+
+
+def wait_ready(url: str, service: str, process: Optional[subprocess.Popen], timeout: float):
+    """Poll /ready (ML service) or /health until the service accepts requests"""
+    probe = f"{url}/ready" if service == "ml" else f"{url}/health"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Service exited with code {process.returncode}")
+        try:
+            if requests.get(probe, timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise TimeoutError(f"Service not ready after {timeout:.0f}s ({probe})")
+
+
+def run_analyze(url: str, corpus, args, monitor: ProcessMonitor) -> Dict:
+    """`--requests` POST /analyze calls from `--concurrency` client threads"""
+    bodies = [
+        {"audio_data": base64.b64encode(encode(audio, args.encoding)).decode(), "sample_rate": SAMPLE_RATE,
+         "model_type": args.model_type, "encoding": args.encoding}
+        for _, _, audio in corpus
+    ]
+    local = threading.local()
+
+    def call(i: int):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = local.session.post(f"{url}/analyze", json=bodies[i % len(bodies)], timeout=args.timeout)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        return (time.perf_counter() - start) * 1000, ok
+
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(call, range(args.warmup)))
+        with monitor:
+            results = list(pool.map(call, range(args.requests)))
+
+    latencies = [ms for ms, ok in results if ok]
+    audio_seconds = sum(len(corpus[i % len(corpus)][2]) for i in range(args.requests)) / SAMPLE_RATE
+    return {
+        "requests": args.requests,
+        "errors": len(results) - len(latencies),
+        "concurrency": args.concurrency,
+        "duration_s": monitor.duration,
+        "throughput_rps": len(latencies) / monitor.duration,
+        "audio_seconds_per_second": audio_seconds / monitor.duration,
+        "latency_ms": summarize(latencies),
+        **monitor.result,
+    }
+
+
+def run_batch(url: str, corpus, args, monitor: ProcessMonitor) -> Dict:
+    """`--batches` POST /analyze/batch calls of `--batch-size` clips each"""
+    clips = [
+        {"id": name, "audio_data": base64.b64encode(encode(audio, args.encoding)).decode(),
+         "sample_rate": SAMPLE_RATE, "encoding": args.encoding}
+        for name, _, audio in corpus
+    ]
+    bodies = [
+        {"clips": [clips[(i * args.batch_size + j) % len(clips)] for j in range(args.batch_size)],
+         "model_type": args.model_type}
+        for i in range(args.batches)
+    ]
+    local = threading.local()
+
+    def call(body: Dict):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = local.session.post(f"{url}/analyze/batch", json=body, timeout=args.timeout)
+            lines = [json.loads(line) for line in response.text.splitlines() if line.strip()]
+            failed = response.status_code != 200 or len(lines) != len(body["clips"])
+            clip_errors = sum("error" in line for line in lines)
+        except (requests.RequestException, ValueError):
+            failed, clip_errors = True, len(body["clips"])
+        return (time.perf_counter() - start) * 1000, failed, clip_errors
+
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        with monitor:
+            results = list(pool.map(call, bodies))
+
+    latencies = [ms for ms, failed, _ in results if not failed]
+    return {
+        "requests": args.batches,
+        "batch_size": args.batch_size,
+        "errors": sum(failed for _, failed, _ in results),
+        "clip_errors": sum(errors for _, _, errors in results),
+        "concurrency": args.concurrency,
+        "duration_s": monitor.duration,
+        "throughput_rps": len(latencies) / monitor.duration,
+        "clips_per_second": len(latencies) * args.batch_size / monitor.duration,
+        "latency_ms": summarize(latencies),
+        **monitor.result,
+    }
+
+
+def media_frames(audio: bytes) -> List[Tuple[float, str]]:
+    """(offset in seconds, base64 payload) of each 20ms frame of mu-law audio"""
+    return [
+        (i / FRAME_BYTES * 0.02, base64.b64encode(audio[i:i + FRAME_BYTES]).decode())
+        for i in range(0, len(audio), FRAME_BYTES)
+    ]
+
+
+async def stream_session(url: str, call_sid: str, frames: List[Tuple[float, str]], speed: float,
+                         drain_seconds: float) -> Dict:
+    """Send (offset, payload) media frames as a Twilio stream paced at `speed`
+
+    Each result is timed against the last frame sent; `decision_ms` is the
+    time from call start to the first human/machine (not unknown) event.
+    """
+    ws_url = url.replace("http", "ws", 1) + f"/stream/{call_sid}"
+    session = {"results": 0, "beeps": 0, "result_lag_ms": [], "first_result_ms": None, "decision_ms": None,
+               "error": None}
+    start = time.perf_counter()
+    last_sent = start
+
+    async def receive(ws):
+        async for message in ws:
+            now = time.perf_counter()
+            session["last_event"] = now
+            message = json.loads(message)
+            event = message.get("event")
+            if event == "analysis_result":
+                session["results"] += 1
+                session["result_lag_ms"].append((now - last_sent) * 1000)
+            elif event == "beep_detected":
+                session["beeps"] += 1
+            if session["first_result_ms"] is None and event in ("analysis_result", "beep_detected"):
+                session["first_result_ms"] = (now - start) * 1000
+            if session["decision_ms"] is None and message.get("detection") in ("human", "machine"):
+                session["decision_ms"] = (now - start) * 1000
+
+    try:
+        async with websockets.connect(ws_url, max_size=None) as ws:
+            receiver = asyncio.create_task(receive(ws))
+            for offset, frame in frames:
+                if speed > 0:
+                    delay = start + offset / speed - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                await ws.send(json.dumps({"event": "media", "media": {"payload": frame}}))
+                last_sent = time.perf_counter()
+            await ws.send(json.dumps({"event": "stop"}))
+            # main.py closes on "stop"; main_simple.py keeps the socket open, so drain briefly
+            try:
+                await asyncio.wait_for(receiver, drain_seconds)
+            except asyncio.TimeoutError:
+                pass
+    except Exception as e:
+        session["error"] = f"{type(e).__name__}: {e}"
+    session["end"] = max(last_sent, session.get("last_event", start))
+    return session
+
+
+def run_stream(url: str, corpus, args, monitor: ProcessMonitor) -> Dict:
+    """`--sessions` concurrent /stream/{call_sid} sessions, one corpus clip each"""
+    clips = [encode(audio, "mulaw") for _, _, audio in corpus]
+    frames = [media_frames(clip) for clip in clips]
+
+    async def run_all():
+        return await asyncio.gather(*(
+            stream_session(url, f"CA{i:06d}", frames[i % len(frames)], args.speed, args.drain_seconds)
+            for i in range(args.sessions)
+        ))
+
+    with monitor:
+        start = time.perf_counter()
+        sessions = asyncio.run(run_all())
+    # Until the last frame or result, excluding the drain after "stop"
+    busy = max(session["end"] for session in sessions) - start
+
+    ok = [session for session in sessions if session["error"] is None]
+    audio_seconds = sum(len(clips[i % len(clips)]) for i in range(args.sessions)) / SAMPLE_RATE
+    return {
+        "sessions": args.sessions,
+        "errors": len(sessions) - len(ok),
+        "error_samples": sorted({session["error"] for session in sessions if session["error"]})[:3],
+        "speed": args.speed,
+        "duration_s": busy,
+        "windows": sum(session["results"] for session in ok),
+        "windows_per_second": sum(session["results"] for session in ok) / busy,
+        "beeps": sum(session["beeps"] for session in ok),
+        "audio_seconds_per_second": audio_seconds / busy,
+        "first_result_ms": summarize([s["first_result_ms"] for s in ok if s["first_result_ms"] is not None]),
+        "decision_ms": summarize([s["decision_ms"] for s in ok if s["decision_ms"] is not None]),
+        "result_lag_ms": summarize([ms for session in ok for ms in session["result_lag_ms"]]),
+        **monitor.result,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=SERVICE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> Dict:
+    corpus = make_corpus(args.clips, args.seconds, args.seed)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "service": args.service if args.url is None else args.url,
+            "args": vars(args),
+        },
+        "scenarios": {},
+    }
+
+    process, log_file = None, None
+    url, pid = args.url, args.pid
+    if url is None:
+        port = free_port()
+        log_file = tempfile.NamedTemporaryFile("w+", prefix="amd-bench-", suffix=".log", delete=False)
+        report["meta"]["service_log"] = log_file.name
+        process = start_service(args, port, log_file)
+        url, pid = f"http://127.0.0.1:{port}", process.pid
+
+    try:
+        started = time.perf_counter()
+        wait_ready(url, args.service, process, args.startup_timeout)
+        report["meta"]["startup_s"] = time.perf_counter() - started
+
+        for scenario in args.scenarios:
+            if scenario == "batch" and args.service == "simple":
+                report["scenarios"][scenario] = {"skipped": "main_simple.py has no /analyze/batch"}
+                continue
+            if scenario == "stream" and args.stub:
+                report["scenarios"][scenario] = {"skipped": "streams run Whisper, which stub mode does not load"}
+                continue
+            runner = {"analyze": run_analyze, "batch": run_batch, "stream": run_stream}[scenario]
+            print(f"Running {scenario}...", file=sys.stderr)
+            report["scenarios"][scenario] = runner(url, corpus, args, ProcessMonitor(pid))
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            log_file.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--service", choices=SERVICES, default="simple", help="Service to start (ignored with --url)")
+    parser.add_argument("--url", help="Benchmark an already running service instead of starting one")
+    parser.add_argument("--pid", type=int, help="Process id of the --url service, for CPU and RSS")
+    parser.add_argument("--stub", action="store_true", help="ML service without model weights (VAD analyzer only)")
+    parser.add_argument("--small", action="store_true", help="Use the tiny Whisper model")
+    parser.add_argument("--model-store", help="MODEL_STORE_DIR for the ML service (offline weights)")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra service setting, e.g. --env BATCH_MAX_SIZE=16 (repeatable)")
+    parser.add_argument("--cache", action="store_true", help="Keep the result cache enabled")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated: analyze,batch,stream")
+    parser.add_argument("--model-type", help="model_type for /analyze and /analyze/batch "
+                                             "(default: vad with --stub, otherwise ensemble)")
+    parser.add_argument("--encoding", choices=ENCODINGS, default="mulaw")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client threads for analyze and batch")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=4, help="Unmeasured /analyze calls first")
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent stream sessions")
+    parser.add_argument("--speed", type=float, default=1.0, help="Stream pacing (1 = real time, 0 = unpaced)")
+    parser.add_argument("--drain-seconds", type=float, default=0.5, help="Wait for late results after \"stop\"")
+    parser.add_argument("--clips", type=int, default=24)
+    parser.add_argument("--seconds", type=float, default=6.0, help="Clip length")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout")
+    parser.add_argument("--startup-timeout", type=float, default=600.0)
+    parser.add_argument("--out", help="Also write the JSON report here")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    if args.stub and args.service != "ml":
+        parser.error("--stub applies to --service ml")
+    if args.model_type is None:
+        args.model_type = "vad" if args.stub else "ensemble"
+
+    report = run(args)
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark: replay recorded /stream/{call_sid} sessions (see STREAM_RECORD_DIR)
+against a running service with their recorded frame timing, at 1x or faster
+Usage: python -m benchmarks.replay RECORDING_OR_DIR [...] --url http://localhost:8001
+       [--speed 1] [--concurrency 0] [--repeat 1] [--pid PID] [--out report.json]
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import time
+from typing import Dict, List, Tuple
+
+from benchmarks.load_bench import ProcessMonitor, git_commit, stream_session, summarize
+from session_recorder import MEDIA, SUFFIX, read_session
+
+
+def find_recordings(paths: List[str]) -> List[str]:
+    """Recording files named directly or found (recursively) under directories"""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                found += [os.path.join(root, name) for name in names if name.endswith(SUFFIX)]
+        else:
+            found.append(path)
+    return sorted(found)
+
+
+def load_recording(path: str) -> Tuple[Dict, List[Tuple[float, str]]]:
+    """Header (plus audio_seconds) and (offset, base64 payload) media frames of one recording"""
+    header, records = read_session(path)
+    frames, samples = [], 0
+    for offset, kind, payload in records:
+        if kind == MEDIA:
+            frames.append((offset, base64.b64encode(payload).decode()))
+            samples += len(payload)  # one mu-law byte per sample
+    header["audio_seconds"] = samples / header["sample_rate"]
+    return header, frames
+
+
+def run(args) -> Dict:
+    recordings = [(path, *load_recording(path)) for path in find_recordings(args.recordings)]
+    if not recordings:
+        raise SystemExit("No recordings found")
+    plan = [recordings[i % len(recordings)] for i in range(len(recordings) * args.repeat)]
+
+    async def replay_all():
+        limit = asyncio.Semaphore(args.concurrency or len(plan))
+
+        async def replay(i: int, path: str, header: Dict, frames):
+            async with limit:
+                session = await stream_session(args.url, f"REPLAY{i:06d}", frames, args.speed, args.drain_seconds)
+            session["recording"] = os.path.basename(path)
+            session["audio_seconds"] = header["audio_seconds"]
+            return session
+
+        return await asyncio.gather(*(replay(i, *recording) for i, recording in enumerate(plan)))
+
+    monitor = ProcessMonitor(args.pid)
+    with monitor:
+        start = time.perf_counter()
+        sessions = asyncio.run(replay_all())
+    busy = max(session["end"] for session in sessions) - start
+
+    ok = [session for session in sessions if session["error"] is None]
+    audio_seconds = sum(session["audio_seconds"] for session in sessions)
+    summary = {
+        "sessions": len(sessions),
+        "recordings": len(recordings),
+        "errors": len(sessions) - len(ok),
+        "error_samples": sorted({session["error"] for session in sessions if session["error"]})[:3],
+        "speed": args.speed,
+        "duration_s": busy,
+        "audio_seconds": audio_seconds,
+        "windows": sum(session["results"] for session in ok),
+        "undecided_sessions": sum(session["decision_ms"] is None for session in ok),
+        "decision_ms": summarize([s["decision_ms"] for s in ok if s["decision_ms"] is not None]),
+        "first_result_ms": summarize([s["first_result_ms"] for s in ok if s["first_result_ms"] is not None]),
+        "result_lag_ms": summarize([ms for session in ok for ms in session["result_lag_ms"]]),
+        **monitor.result,
+    }
+    if "service_cpu_seconds" in monitor.result:
+        # One process serves every session, so per-session CPU is the average
+        summary["service_cpu_seconds_per_session"] = monitor.result["service_cpu_seconds"] / len(sessions)
+        summary["service_cpu_seconds_per_audio_second"] = monitor.result["service_cpu_seconds"] / audio_seconds
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "commit": git_commit(),
+            "url": args.url,
+            "args": vars(args),
+        },
+        "summary": summary,
+        "sessions": [
+            {
+                "recording": session["recording"],
+                "audio_seconds": session["audio_seconds"],
+                "windows": session["results"],
+                "beeps": session["beeps"],
+                "decision_ms": session["decision_ms"],
+                "first_result_ms": session["first_result_ms"],
+                "result_lag_ms_max": max(session["result_lag_ms"], default=None),
+                "error": session["error"],
+            }
+            for session in sessions
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recordings", nargs="+", help=f"{SUFFIX} files or directories holding them")
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--pid", type=int, help="Process id of the service, for CPU and RSS")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = recorded timing, 4 = 4x faster, 0 = unpaced")
+    parser.add_argument("--concurrency", type=int, default=0, help="Sessions at once (0 = all)")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay each recording this many times")
+    parser.add_argument("--drain-seconds", type=float, default=0.5, help="Wait for late results after \"stop\"")
+    parser.add_argument("--out", help="Also write the JSON report here")
+    args = parser.parse_args()
+
+    report = run(args)
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark: streaming beep detector cost per 20ms frame and detections on
+synthetic call audio (beeps, call-progress tones, speech-like audio, noise)
+Usage: python -m benchmarks.tone_bench [--threshold 0.7] [--repeat 5]
+"""
+
+import argparse
+import json
+import timeit
+
+import numpy as np
+
+from benchmarks.corpus import SAMPLE_RATE, noise, speech_like, tone
+from tone_detector import ToneDetector
+
+FRAME = SAMPLE_RATE // 50
+
+
+def cases(seed: int = 0) -> dict:
+    """name -> (audio, whether a beep should be reported)"""
+    rng = np.random.default_rng(seed)
+    return {
+        "beep_1000hz_after_speech": (np.concatenate([speech_like(3, rng), tone([1000], 0.5), noise(1, rng)]), True),
+        "beep_off_grid_1037hz": (np.concatenate([noise(1, rng), tone([1037], 0.3), noise(1, rng)]), True),
+        "beep_quiet_850hz": (np.concatenate([noise(1, rng), tone([850], 0.4, level=0.03), noise(1, rng)]), True),
+        "blip_60ms": (np.concatenate([noise(1, rng), tone([1000], 0.06), noise(1, rng)]), False),
+        "ringback_440_480": (np.concatenate([tone([440, 480], 2), noise(4, rng)] * 2), False),
+        "dialtone_350_440": (tone([350, 440], 3), False),
+        "long_tone_4s": (np.concatenate([noise(0.5, rng), tone([1000], 4), noise(0.5, rng)]), False),
+        "speech": (speech_like(6, rng), False),
+        "noise": (noise(6, rng), False),
+    }
+
+
+def run(threshold: float, repeat: int) -> dict:
+    report = {"threshold": threshold, "cases": {}}
+    correct = 0
+    for name, (audio, expected) in cases().items():
+        detector = ToneDetector(SAMPLE_RATE, threshold=threshold)
+        events = []
+        for start in range(0, len(audio), FRAME):
+            events += detector.process(audio[start:start + FRAME])
+        correct += bool(events) == expected
+        report["cases"][name] = {
+            "expected_beep": expected,
+            "events": [{k: round(v, 3) for k, v in event.items()} for event in events],
+        }
+    report["correct"] = f"{correct}/{len(report['cases'])}"
+
+    # Per-frame cost, as websocket_stream calls it (one 20ms frame at a time)
+    audio = cases()["speech"][0]
+    frames = [audio[start:start + FRAME] for start in range(0, len(audio) - FRAME + 1, FRAME)]
+    detector = ToneDetector(SAMPLE_RATE, threshold=threshold)
+
+    def feed():
+        for frame in frames:
+            detector.process(frame)
+
+    seconds = min(timeit.repeat(feed, number=1, repeat=repeat))
+    report["us_per_frame"] = seconds / len(frames) * 1e6
+    report["realtime_factor"] = (len(frames) * FRAME / SAMPLE_RATE) / seconds
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threshold", type=float, default=0.7, help="Tonal energy share (BEEP_THRESHOLD)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.threshold, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark: short-window Whisper decode vs the 30s decode paths on streaming windows
+
+Compares per-window latency of `model.transcribe` (the original per-window
+call), the padded 30s `whisper.decode` batch path and the short-window
+decode, and how closely their transcriptions and AMD detections agree with
+`transcribe`.
+Usage: python -m benchmarks.whisper_decode_bench [--corpus DIR] [--window 3.0] [--max-windows 50]
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import torch
+import whisper
+
+import config
+import whisper_fast
+from preprocessing import PreparedAudio
+
+
+def _windows(corpus: str, seconds: float, limit: int):
+    if corpus:
+        from tools.labeled_audio import iter_labeled_clips
+
+        clips = ((audio, sample_rate) for _, _, audio, sample_rate in iter_labeled_clips(corpus))
+    else:
+        # No corpus: tone plus noise, for latency only
+        rng = np.random.default_rng(0)
+        t = np.arange(int(8000 * seconds * limit)) / 8000
+        clips = [((0.1 * np.sin(2 * np.pi * 300 * t) + 0.01 * rng.standard_normal(len(t))).astype(np.float32), 8000)]
+
+    count = 0
+    for audio, sample_rate in clips:
+        size = int(seconds * sample_rate)
+        for start in range(0, max(len(audio) - size, 0) + 1, size):
+            yield PreparedAudio(audio[start:start + size], sample_rate)
+            count += 1
+            if count >= limit:
+                return
+
+
+def _word_error_rate(reference: str, hypothesis: str) -> float:
+    ref, hyp = reference.lower().split(), hypothesis.lower().split()
+    if not ref:
+        return float(bool(hyp))
+    row = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        previous, row[0] = row[0], i
+        for j, hyp_word in enumerate(hyp, 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, previous + (ref_word != hyp_word))
+    return row[-1] / len(ref)
+
+
+def run(corpus: str, seconds: float, limit: int) -> dict:
+    import main
+
+    main.load_model_weights(["whisper"])
+    model = main.models["whisper"]
+    n_mels = model.dims.n_mels
+    fp16 = model.device.type == "cuda"
+
+    def transcribe(window):
+        return model.transcribe(window.audio_16k, fp16=fp16)["text"].strip()
+
+    def decode_30s(window):
+        mel = torch.from_numpy(window.log_mel(n_mels)[None]).to(model.device)
+        options = whisper.DecodingOptions(fp16=fp16, without_timestamps=True)
+        return whisper.decode(model, mel, options)[0].text.strip()
+
+    def short(window):
+        n_samples = whisper_fast.mel_samples(len(window.audio_16k))
+        mel = torch.from_numpy(window.log_mel(n_mels, n_samples)[None])
+        return whisper_fast.transcribe_short(model, mel, config.WHISPER_LANGUAGE, config.WHISPER_MAX_TOKENS)[0]
+
+    modes = {"transcribe": transcribe, "decode_30s": decode_30s, "short": short}
+    windows = list(_windows(corpus, seconds, limit))
+    for fn in modes.values():
+        fn(windows[0])  # warm up
+
+    texts = {name: [] for name in modes}
+    latencies = {name: [] for name in modes}
+    for window in windows:
+        window.audio_16k  # resampling is shared by every mode; keep it out of the timings
+        for name, fn in modes.items():
+            start = time.perf_counter()
+            texts[name].append(fn(window))
+            latencies[name].append((time.perf_counter() - start) * 1000)
+
+    reference = texts["transcribe"]
+    reference_detections = [main.analyze_transcription_for_amd(text)[0] for text in reference]
+    report = {"windows": len(windows), "window_seconds": seconds, "modes": {}}
+    for name in modes:
+        detections = [main.analyze_transcription_for_amd(text)[0] for text in texts[name]]
+        report["modes"][name] = {
+            "latency_ms_avg": float(np.mean(latencies[name])),
+            "latency_ms_p95": float(np.percentile(latencies[name], 95)),
+            "speedup_vs_transcribe": float(np.mean(latencies["transcribe"]) / np.mean(latencies[name])),
+            "exact_match_vs_transcribe": float(np.mean([a == b for a, b in zip(reference, texts[name])])),
+            "wer_vs_transcribe": float(np.mean([_word_error_rate(a, b) for a, b in zip(reference, texts[name])])),
+            "detection_agreement_vs_transcribe": float(np.mean([a == b for a, b in zip(reference_detections, detections)])),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Labeled corpus (human/, machine/) to cut windows from")
+    parser.add_argument("--window", type=float, default=3.0, help="Window length in seconds (stream default 3s)")
+    parser.add_argument("--max-windows", type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(run(args.corpus, args.window, args.max_windows), indent=2))
+
+
+if __name__ == "__main__":
+    main()
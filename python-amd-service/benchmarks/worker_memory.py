@@ -0,0 +1,207 @@
+"""
+Benchmark: memory of N ML service workers, as N independent uvicorn workers (each
+loading its own models) versus serve.py prefork workers sharing one copy
+Usage: python -m benchmarks.worker_memory [--workers 4] [--modes independent,prefork]
+       [--stub | --model-store DIR] [--requests 200] [--out report.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Set
+
+import requests
+
+from benchmarks.corpus import ENCODINGS, make_corpus
+from benchmarks.load_bench import (
+    SERVICE_DIR, ProcessMonitor, free_port, git_commit, run_analyze, service_env,
+)
+
+MODES = ("independent", "prefork")
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def process_tree(pid: int) -> List[int]:
+    """The process and all of its descendants"""
+    pids, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        pids.append(current)
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending += [int(child) for child in f.read().split()]
+        except OSError:
+            pass
+    return pids
+
+
+def smaps_rollup(pid: int) -> Dict[str, int]:
+    """Memory totals of one process in bytes (Linux 4.14+)"""
+    totals = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in SMAPS_FIELDS:
+                    totals[key] = int(value.split()[0]) * 1024
+    except OSError:
+        pass
+    return totals
+
+
+def tree_memory(pid: int) -> Dict:
+    """RSS, PSS and USS (private memory) summed over the process tree, in MB
+
+    RSS counts shared pages once per process; PSS splits them between the
+    processes sharing them, so the PSS total is the tree's real footprint.
+    """
+    processes = []
+    for process in process_tree(pid):
+        totals = smaps_rollup(process)
+        if totals:
+            processes.append({
+                "pid": process,
+                "rss_mb": totals.get("Rss", 0) / 2**20,
+                "pss_mb": totals.get("Pss", 0) / 2**20,
+                "uss_mb": (totals.get("Private_Clean", 0) + totals.get("Private_Dirty", 0)) / 2**20,
+            })
+    return {
+        "processes": len(processes),
+        "rss_mb": sum(p["rss_mb"] for p in processes),
+        "pss_mb": sum(p["pss_mb"] for p in processes),
+        "uss_mb": sum(p["uss_mb"] for p in processes),
+        "per_process": processes,
+    }
+
+
+def start_workers(mode: str, args, port: int, log_file) -> subprocess.Popen:
+    env = service_env(args)
+    threads = str(args.threads or max(1, (os.cpu_count() or 1) // args.workers))
+    if mode == "prefork":
+        env["SERVE_TORCH_THREADS"] = threads
+        command = [sys.executable, "serve.py"]
+    else:
+        env["OMP_NUM_THREADS"] = threads
+        command = [sys.executable, "-m", "uvicorn", "main:app"]
+    command += ["--host", "127.0.0.1", "--port", str(port), "--workers", str(args.workers), "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=SERVICE_DIR, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+
+
+def wait_workers_ready(url: str, workers: int, process: subprocess.Popen, timeout: float) -> Set[int]:
+    """Poll /ready on fresh connections until `workers` distinct worker pids answer 200"""
+    ready: Set[int] = set()
+    deadline = time.monotonic() + timeout
+    while len(ready) < workers:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{len(ready)} of {workers} workers ready after {timeout:.0f}s")
+        if process.poll() is not None:
+            raise RuntimeError(f"Service exited with code {process.returncode}")
+        try:
+            response = requests.get(f"{url}/ready", timeout=2, headers={"Connection": "close"})
+            if response.status_code == 200:
+                ready.add(response.json()["pid"])
+                continue
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    return ready
+
+
+def run_mode(mode: str, corpus, args) -> Dict:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    log_file = tempfile.NamedTemporaryFile("w+", prefix=f"amd-{mode}-", suffix=".log", delete=False)
+    process = start_workers(mode, args, port, log_file)
+    try:
+        started = time.perf_counter()
+        wait_workers_ready(url, args.workers, process, args.startup_timeout)
+        result = {"service_log": log_file.name, "startup_s": time.perf_counter() - started}
+        time.sleep(args.settle_seconds)
+        result["memory_idle"] = tree_memory(process.pid)
+        if args.requests:
+            print(f"Running analyze against {mode} workers...", file=sys.stderr)
+            result["analyze"] = run_analyze(url, corpus, args, ProcessMonitor(None))
+            # Pages the workers wrote to while serving are no longer shared
+            result["memory_after_load"] = tree_memory(process.pid)
+        return result
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log_file.close()
+
+
+def run(args) -> Dict:
+    corpus = make_corpus(args.clips, args.seconds, args.seed)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "modes": {},
+    }
+    for mode in args.modes:
+        print(f"Starting {args.workers} {mode} workers...", file=sys.stderr)
+        report["modes"][mode] = run_mode(mode, corpus, args)
+
+    if set(MODES) <= set(report["modes"]):
+        independent, prefork = report["modes"]["independent"], report["modes"]["prefork"]
+        key = "memory_after_load" if "memory_after_load" in prefork else "memory_idle"
+        report["pss_saved_mb"] = independent[key]["pss_mb"] - prefork[key]["pss_mb"]
+        report["pss_ratio"] = prefork[key]["pss_mb"] / independent[key]["pss_mb"]
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma-separated: independent,prefork")
+    parser.add_argument("--threads", type=int, default=0, help="Torch threads per worker (0 = CPU count / workers)")
+    parser.add_argument("--stub", action="store_true", help="Without model weights (VAD analyzer only)")
+    parser.add_argument("--small", action="store_true", help="Use the tiny Whisper model")
+    parser.add_argument("--model-store", help="MODEL_STORE_DIR (offline weights)")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra service setting, e.g. --env WAV2VEC2_PRECISION=int8 (repeatable)")
+    parser.add_argument("--cache", action="store_true", help="Keep the result cache enabled")
+    parser.add_argument("--model-type", help="model_type for /analyze (default: vad with --stub, otherwise ensemble)")
+    parser.add_argument("--encoding", choices=ENCODINGS, default="mulaw")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client threads")
+    parser.add_argument("--requests", type=int, default=200, help="/analyze calls after startup (0 = memory only)")
+    parser.add_argument("--warmup", type=int, default=4, help="Unmeasured /analyze calls first")
+    parser.add_argument("--clips", type=int, default=24)
+    parser.add_argument("--seconds", type=float, default=6.0, help="Clip length")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout")
+    parser.add_argument("--settle-seconds", type=float, default=2.0, help="Wait after startup before measuring")
+    parser.add_argument("--startup-timeout", type=float, default=600.0)
+    parser.add_argument("--out", help="Also write the JSON report here")
+    args = parser.parse_args()
+    args.modes = [name.strip() for name in args.modes.split(",") if name.strip()]
+    unknown = set(args.modes) - set(MODES)
+    if unknown:
+        parser.error(f"Unknown modes: {', '.join(sorted(unknown))}")
+    if args.model_type is None:
+        args.model_type = "vad" if args.stub else "ensemble"
+
+    report = run(args)
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Table-driven G.711 codec for telephony media payloads
+Decodes mu-law / A-law bytes to linear PCM with a precomputed 256-entry
+lookup table, vectorized over the whole buffer
+"""
+
+import base64
+import struct
+from typing import Optional, Tuple
+
+import numpy as np
+
+SUPPORTED_ENCODINGS = ("mulaw", "alaw", "pcm16")
+
+
+def _build_mulaw_table() -> np.ndarray:
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    sign = codes & 0x80
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = (((mantissa << 3) + 0x84) << exponent) - 0x84
+    return np.where(sign != 0, -magnitude, magnitude).astype(np.int16)
+
+
+def _build_alaw_table() -> np.ndarray:
+    codes = np.arange(256, dtype=np.int32) ^ 0x55
+    sign = codes & 0x80
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = np.where(
+        exponent == 0,
+        (mantissa << 4) + 8,
+        ((mantissa << 4) + 0x108) << np.maximum(exponent - 1, 0),
+    )
+    return np.where(sign != 0, magnitude, -magnitude).astype(np.int16)
+
+
+MULAW_TO_INT16 = _build_mulaw_table()
+ALAW_TO_INT16 = _build_alaw_table()
+MULAW_TO_FLOAT32 = (MULAW_TO_INT16 / 32768.0).astype(np.float32)
+ALAW_TO_FLOAT32 = (ALAW_TO_INT16 / 32768.0).astype(np.float32)
+
+_TABLES = {
+    ("mulaw", np.dtype(np.int16)): MULAW_TO_INT16,
+    ("mulaw", np.dtype(np.float32)): MULAW_TO_FLOAT32,
+    ("alaw", np.dtype(np.int16)): ALAW_TO_INT16,
+    ("alaw", np.dtype(np.float32)): ALAW_TO_FLOAT32,
+}
+
+
+def _output(n: int, dtype, out: Optional[np.ndarray]) -> np.ndarray:
+    if out is None or len(out) < n or out.dtype != np.dtype(dtype):
+        return np.empty(n, dtype=dtype)
+    return out[:n]
+
+
+def decode_g711(data, encoding: str = "mulaw", out: Optional[np.ndarray] = None, dtype=np.float32) -> np.ndarray:
+    """Decode G.711 bytes to int16 or float32 ([-1, 1)) samples
+
+    `data` may be any buffer (bytes, bytearray, memoryview); it is read in
+    place. When `out` is a large enough array of the requested dtype the
+    samples are written into it and a view of the decoded prefix is returned.
+    """
+    table = _TABLES.get((encoding, np.dtype(dtype)))
+    if table is None:
+        raise ValueError(f"Unsupported G.711 decode: {encoding} -> {np.dtype(dtype)}")
+    codes = np.frombuffer(data, dtype=np.uint8)
+    target = _output(len(codes), dtype, out)
+    np.take(table, codes, out=target, mode="clip")  # indices are always in range; "clip" avoids buffering
+    return target
+
+
+def decode_mulaw(data, out: Optional[np.ndarray] = None, dtype=np.float32) -> np.ndarray:
+    """Decode mu-law bytes (Twilio media payloads) to linear samples"""
+    return decode_g711(data, "mulaw", out, dtype)
+
+
+def decode_alaw(data, out: Optional[np.ndarray] = None, dtype=np.float32) -> np.ndarray:
+    """Decode A-law bytes to linear samples"""
+    return decode_g711(data, "alaw", out, dtype)
+
+
+def decode_pcm16(data, out: Optional[np.ndarray] = None, dtype=np.float32) -> np.ndarray:
+    """Decode little-endian 16-bit PCM bytes; int16 output is a zero-copy view"""
+    pcm = np.frombuffer(data, dtype="<i2", count=len(data) // 2)
+    if np.dtype(dtype) == np.int16:
+        return pcm
+    target = _output(len(pcm), dtype, out)
+    np.multiply(pcm, 1.0 / 32768.0, out=target, casting="unsafe")
+    return target
+
+
+def decode_audio(data, encoding: str = "pcm16", out: Optional[np.ndarray] = None, dtype=np.float32) -> np.ndarray:
+    """Decode raw audio bytes in any supported encoding"""
+    if encoding == "pcm16":
+        return decode_pcm16(data, out, dtype)
+    return decode_g711(data, encoding, out, dtype)
+
+
+def decode_base64(payload: str, encoding: str = "mulaw", out: Optional[np.ndarray] = None, dtype=np.float32) -> np.ndarray:
+    """Decode a base64 media payload straight into linear samples"""
+    return decode_audio(base64.b64decode(payload), encoding, out, dtype)
+
+
+def encode_mulaw(samples: np.ndarray) -> bytes:
+    """Encode int16 samples to mu-law bytes (used for test corpora and replays)"""
+    x = samples.astype(np.int32) >> 2
+    mask = np.where(x < 0, 0x7F, 0xFF)
+    x = np.minimum(np.abs(x), 8159) + 0x21
+    segment = np.floor(np.log2(x)).astype(np.int32) - 5
+    mantissa = np.where(segment > 7, 0x0F, (x >> (np.minimum(segment, 7) + 1)) & 0x0F)
+    return ((((np.minimum(segment, 7) << 4) | mantissa) ^ mask) & 0xFF).astype(np.uint8).tobytes()
+
+
+def encode_alaw(samples: np.ndarray) -> bytes:
+    """Encode int16 samples to A-law bytes"""
+    x = samples.astype(np.int32)
+    mask = np.where(x >= 0, 0xD5, 0x55)
+    x = np.minimum(np.where(x >= 0, x, -x - 1), 32767)
+    exponent = np.where(x < 256, 0, np.floor(np.log2(np.maximum(x, 1))).astype(np.int32) - 7)
+    mantissa = np.where(exponent == 0, x >> 4, x >> (exponent + 3)) & 0x0F
+    return (((exponent << 4) | mantissa) ^ mask).astype(np.uint8).tobytes()
+
+
+# WAV container formats that map onto a supported encoding
+_WAV_FORMATS = {1: "pcm16", 6: "alaw", 7: "mulaw"}
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def parse_wav(data) -> Tuple[memoryview, str, int, int]:
+    """Locate the sample data in a RIFF/WAVE buffer without copying it
+
+    Returns (data view, encoding, sample_rate, channels). Supports 16-bit
+    PCM, mu-law and A-law, including WAVE_FORMAT_EXTENSIBLE headers.
+    """
+    view = memoryview(data)
+    if len(view) < 12 or bytes(view[0:4]) != b"RIFF" or bytes(view[8:12]) != b"WAVE":
+        raise ValueError("Not a RIFF/WAVE file")
+
+    encoding = sample_rate = channels = None
+    offset = 12
+    while offset + 8 <= len(view):
+        chunk_id = bytes(view[offset:offset + 4])
+        chunk_size = struct.unpack_from("<I", view, offset + 4)[0]
+        body = offset + 8
+
+        if chunk_id == b"fmt ":
+            audio_format, channels, sample_rate = struct.unpack_from("<HHI", view, body)
+            bits = struct.unpack_from("<H", view, body + 14)[0]
+            if audio_format == _WAVE_FORMAT_EXTENSIBLE and chunk_size >= 26:
+                audio_format = struct.unpack_from("<H", view, body + 24)[0]
+            encoding = _WAV_FORMATS.get(audio_format)
+            if encoding is None or (encoding == "pcm16" and bits != 16) or (encoding != "pcm16" and bits != 8):
+                raise ValueError(f"Unsupported WAV format {audio_format} with {bits}-bit samples")
+        elif chunk_id == b"data":
+            if encoding is None:
+                raise ValueError("WAV data chunk before fmt chunk")
+            # Streamed WAVs may leave the size unset; take what is there
+            end = min(body + chunk_size, len(view))
+            return view[body:end], encoding, sample_rate, channels
+
+        offset = body + chunk_size + (chunk_size & 1)
+
+    raise ValueError("WAV file has no data chunk")
+
+
+def decode_wav(data, out: Optional[np.ndarray] = None, dtype=np.float32) -> Tuple[np.ndarray, int]:
+    """Decode a WAV buffer to mono samples; returns (samples, sample_rate)"""
+    payload, encoding, sample_rate, channels = parse_wav(data)
+    samples = decode_audio(payload, encoding, out, dtype)
+    if channels and channels > 1:
+        # Telephony analysis only needs one leg; take the first channel
+        samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels)[:, 0]
+    return samples, sample_rate
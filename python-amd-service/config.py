@@ -0,0 +1,172 @@
+"""
+Runtime configuration for the AMD ML microservice
+Values are read from environment variables (see env.example)
+"""
+
+import os
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+
+def _env_str(name: str, default: str) -> str:
+    return os.getenv(name, default)
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def _env_list(name: str, default: str) -> list:
+    return [item.strip() for item in os.getenv(name, default).split(",") if item.strip()]
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Model sources: hub ids, or a local artifact store written by tools.export_models.
+# With MODEL_STORE_DIR set, weights are memory-mapped from <dir>/<version> offline.
+WAV2VEC2_MODEL = _env_str("WAV2VEC2_MODEL", "facebook/wav2vec2-base-960h")
+WHISPER_MODEL = _env_str("WHISPER_MODEL", "base")
+MODEL_STORE_DIR = _env_str("MODEL_STORE_DIR", "")
+MODEL_STORE_VERSION = _env_str("MODEL_STORE_VERSION", "latest")
+
+# Short-window Whisper decode: windows up to WHISPER_FAST_MAX_SECONDS skip the
+# 30s padding and language detection and decode greedily up to a token budget
+WHISPER_FAST_DECODE = _env_bool("WHISPER_FAST_DECODE", True)
+WHISPER_FAST_MAX_SECONDS = _env_float("WHISPER_FAST_MAX_SECONDS", 10.0)
+WHISPER_LANGUAGE = _env_str("WHISPER_LANGUAGE", "en")
+WHISPER_MAX_TOKENS = _env_int("WHISPER_MAX_TOKENS", 48)
+
+# Beep detection on stream media frames (tone_detector.py). BEEP_THRESHOLD is the
+# share of frame energy at one frequency (0-1); raise it to cut false positives
+BEEP_DETECTION = _env_bool("BEEP_DETECTION", True)
+BEEP_THRESHOLD = _env_float("BEEP_THRESHOLD", 0.7)
+BEEP_MIN_MS = _env_float("BEEP_MIN_MS", 120.0)
+BEEP_MAX_MS = _env_float("BEEP_MAX_MS", 2000.0)
+BEEP_MIN_LEVEL_DB = _env_float("BEEP_MIN_LEVEL_DB", -45.0)
+
+# /analyze result cache keyed by decoded audio; RESULT_CACHE_MAX_ENTRIES=0 disables
+# it. RESULT_CACHE_DIR adds an on-disk tier that survives restarts, pruned to
+# RESULT_CACHE_DISK_MAX_MB
+RESULT_CACHE_MAX_ENTRIES = _env_int("RESULT_CACHE_MAX_ENTRIES", 1024)
+RESULT_CACHE_MAX_MB = _env_float("RESULT_CACHE_MAX_MB", 32.0)
+RESULT_CACHE_TTL_SECONDS = _env_float("RESULT_CACHE_TTL_SECONDS", 600.0)
+RESULT_CACHE_DIR = _env_str("RESULT_CACHE_DIR", "")
+RESULT_CACHE_DISK_MAX_MB = _env_float("RESULT_CACHE_DISK_MAX_MB", 1024.0)
+
+# Opt-in request profiling (profiling.py): with PROFILING_ENABLED, requests sent with
+# "X-Profile: 1" or "?profile=1", plus PROFILE_SAMPLE_RATE of all others, write
+# cProfile/torch traces to PROFILE_DIR (newest PROFILE_MAX_REQUESTS kept)
+PROFILING_ENABLED = _env_bool("PROFILING_ENABLED", False)
+PROFILE_SAMPLE_RATE = _env_float("PROFILE_SAMPLE_RATE", 0.0)
+PROFILE_DIR = _env_str("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+PROFILE_TORCH = _env_bool("PROFILE_TORCH", True)
+PROFILE_MAX_REQUESTS = _env_int("PROFILE_MAX_REQUESTS", 100)
+
+# Stream session recording for benchmarks.replay (empty dir disables); records
+# STREAM_RECORD_SAMPLE_RATE (0-1) of sessions as raw mu-law frames with arrival times
+STREAM_RECORD_DIR = _env_str("STREAM_RECORD_DIR", "")
+STREAM_RECORD_SAMPLE_RATE = _env_float("STREAM_RECORD_SAMPLE_RATE", 1.0)
+
+# Models loaded in the background at startup (others load on first use);
+# /ready reports 503 until all of them are loaded and warmed up
+PRELOAD_MODELS = _env_list("PRELOAD_MODELS", "vad,wav2vec2,whisper")
+MODEL_WARMUP = _env_bool("MODEL_WARMUP", True)
+# A model that fails to load is retried after MODEL_RETRY_SECONDS, doubling per
+# consecutive failure up to MODEL_RETRY_MAX_SECONDS; ensembles run without it meanwhile
+MODEL_RETRY_SECONDS = _env_float("MODEL_RETRY_SECONDS", 5.0)
+MODEL_RETRY_MAX_SECONDS = _env_float("MODEL_RETRY_MAX_SECONDS", 300.0)
+WARMUP_SECONDS = _env_float("WARMUP_SECONDS", 1.0)
+
+# Weighted {label: {phrase: weight}} lexicon for transcription scoring;
+# the file is re-read when its mtime changes (checked every N seconds, 0 = never)
+LEXICON_PATH = _env_str("LEXICON_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "lexicon.json"))
+LEXICON_RELOAD_SECONDS = _env_float("LEXICON_RELOAD_SECONDS", 5.0)
+
+# Human/machine head on the Wav2Vec2 encoder (python -m tools.train_acoustic_head);
+# without the file the wav2vec2 analyzer uses its transcription alone.
+# ACOUSTIC_HEAD_WEIGHT is the head's share when it is blended with the transcription
+ACOUSTIC_HEAD_PATH = _env_str(
+    "ACOUSTIC_HEAD_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "acoustic_head.safetensors")
+)
+ACOUSTIC_HEAD_WEIGHT = _env_float("ACOUSTIC_HEAD_WEIGHT", 0.5)
+
+# Micro-batching scheduler
+BATCH_MAX_SIZE = _env_int("BATCH_MAX_SIZE", 8)
+BATCH_MAX_WAIT_MS = _env_float("BATCH_MAX_WAIT_MS", 20.0)
+
+# Inference executor: "thread" or "process" worker pools per model
+INFERENCE_EXECUTOR = _env_str("INFERENCE_EXECUTOR", "thread")
+PREPROCESS_CONCURRENCY = _env_int("PREPROCESS_CONCURRENCY", 2)
+VAD_CONCURRENCY = _env_int("VAD_CONCURRENCY", 2)
+WAV2VEC2_CONCURRENCY = _env_int("WAV2VEC2_CONCURRENCY", 1)
+WHISPER_CONCURRENCY = _env_int("WHISPER_CONCURRENCY", 1)
+
+# CPU precision per model ("fp32" or "int8" dynamic quantization of Linear layers)
+WAV2VEC2_PRECISION = _env_str("WAV2VEC2_PRECISION", "fp32")
+WHISPER_PRECISION = _env_str("WHISPER_PRECISION", "fp32")
+
+# Intra-op threads per model (0 keeps the default): ONNX Runtime sessions always, torch
+# only with INFERENCE_EXECUTOR=process, since torch's thread count is process-wide
+WAV2VEC2_THREADS = _env_int("WAV2VEC2_THREADS", 0)
+WHISPER_THREADS = _env_int("WHISPER_THREADS", 0)
+
+# Inference backend per model: "torch" (eager PyTorch) or "onnx" (ONNX Runtime on the
+# graphs python -m tools.export_onnx writes to ONNX_MODEL_DIR). For Whisper, onnx runs
+# the short-window decode; longer windows still use the PyTorch model
+WAV2VEC2_BACKEND = _env_str("WAV2VEC2_BACKEND", "torch")
+WHISPER_BACKEND = _env_str("WHISPER_BACKEND", "torch")
+ONNX_MODEL_DIR = _env_str("ONNX_MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "onnx_models"))
+ONNX_GRAPH_OPTIMIZATION = _env_str("ONNX_GRAPH_OPTIMIZATION", "all")  # disable, basic, extended or all
+
+# Prefork serving (python serve.py): PRELOAD_MODELS load once, then SERVE_WORKERS
+# processes fork and share the weights. SERVE_TORCH_THREADS is each worker's torch
+# thread count (0 = CPU count / SERVE_WORKERS)
+HOST = _env_str("HOST", "0.0.0.0")
+PORT = _env_int("PORT", 8001)
+SERVE_WORKERS = _env_int("SERVE_WORKERS", 2)
+SERVE_TORCH_THREADS = _env_int("SERVE_TORCH_THREADS", 0)
+
+# Cascading ensemble: stop once cheap analyzers reach this weighted confidence
+CASCADE_THRESHOLD = _env_float("CASCADE_THRESHOLD", 0.75)
+STREAM_MODEL_TYPE = _env_str("STREAM_MODEL_TYPE", "ensemble")  # ensemble or cascade
+
+# Stream sessions: connections beyond MAX_STREAM_SESSIONS are closed with 1013 (0 = no
+# limit); sessions silent for the idle timeout or open past the max duration are evicted
+MAX_STREAM_SESSIONS = _env_int("MAX_STREAM_SESSIONS", 100)
+SESSION_IDLE_TIMEOUT_SECONDS = _env_float("SESSION_IDLE_TIMEOUT_SECONDS", 30.0)
+SESSION_MAX_DURATION_SECONDS = _env_float("SESSION_MAX_DURATION_SECONDS", 3600.0)
+SESSION_HISTORY = _env_int("SESSION_HISTORY", 32)
+
+# Stream analysis runs behind a queue of STREAM_ANALYSIS_QUEUE windows; when it falls
+# behind, STREAM_OVERLOAD_POLICY "coalesce" drops the oldest queued window, "skip"
+# drops the new one and "degrade" drops the oldest and analyzes late windows
+# (queue overflow or waiting over STREAM_DEGRADE_LAG_MS) with VAD only
+STREAM_ANALYSIS_QUEUE = _env_int("STREAM_ANALYSIS_QUEUE", 1)
+STREAM_OVERLOAD_POLICY = _env_str("STREAM_OVERLOAD_POLICY", "coalesce")
+STREAM_DEGRADE_LAG_MS = _env_float("STREAM_DEGRADE_LAG_MS", 1500.0)
+
+# Per-member deadlines for parallel ensembles (0 disables the timeout)
+WAV2VEC2_TIMEOUT_MS = _env_float("WAV2VEC2_TIMEOUT_MS", 3000.0)
+WHISPER_TIMEOUT_MS = _env_float("WHISPER_TIMEOUT_MS", 4000.0)
+VAD_TIMEOUT_MS = _env_float("VAD_TIMEOUT_MS", 500.0)
+# Streams always apply the deadlines; /analyze clips can be any length, so only opt in
+ANALYZE_MEMBER_DEADLINES = _env_bool("ANALYZE_MEMBER_DEADLINES", False)
+
+# /analyze/batch grouping: clips per padded batch and padded 16kHz input budget
+ANALYZE_BATCH_MAX_SIZE = _env_int("ANALYZE_BATCH_MAX_SIZE", 16)
+ANALYZE_BATCH_MEMORY_MB = _env_float("ANALYZE_BATCH_MEMORY_MB", 64.0)
@@ -0,0 +1,154 @@
+"""
+Managed inference executor
+Runs blocking model and DSP work off the asyncio event loop in per-model
+worker pools with bounded concurrency and queue/wait accounting
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from metrics import QUEUE_WAIT_SECONDS
+from profiling import current_profile
+
+logger = logging.getLogger(__name__)
+
+
+class InferencePool:
+    """One named worker pool; callers wait in an admission queue for a free slot"""
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int = 1,
+        mode: str = "thread",
+        initializer: Optional[Callable] = None,
+    ):
+        self.name = name
+        self.mode = mode
+        self.max_concurrency = max(1, max_concurrency)
+        self._initializer = initializer
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recent_waits = deque(maxlen=1000)
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_concurrency,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=self._initializer,
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency,
+                    thread_name_prefix=f"amd-{self.name}",
+                    initializer=self._initializer,
+                )
+        return self._executor
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Wait for a free slot, then run fn(*args) in the pool
+
+        If the caller is cancelled (e.g. a member timeout) the job keeps its
+        slot until the worker actually finishes, so the pool never runs more
+        than max_concurrency jobs at once.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        enqueued_at = time.monotonic()
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        wait = time.monotonic() - enqueued_at
+        self._wait_total += wait
+        self._wait_max = max(self._wait_max, wait)
+        self._recent_waits.append(wait)
+        QUEUE_WAIT_SECONDS.labels(f"executor:{self.name}").observe(wait)
+
+        # Profiled requests run under the profiler in the worker thread;
+        # process workers cannot share the profile and are not profiled
+        profile = current_profile.get()
+        if profile is not None and self.mode != "process":
+            fn, args = profile.run, (fn, self.name) + args
+
+        self.active += 1
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        except Exception:
+            self._finish(None)
+            raise
+        future.add_done_callback(self._finish)
+        return await asyncio.shield(future)
+
+    def _finish(self, future: Optional[asyncio.Future]):
+        self.active -= 1
+        self._semaphore.release()
+        if future is None or future.cancelled() or future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict:
+        """Queue depth and admission wait times"""
+        started = self.completed + self.failed + self.active
+        recent = sorted(self._recent_waits)
+        return {
+            "mode": self.mode,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queued,
+            "active": self.active,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_ms_avg": (self._wait_total / started * 1000.0) if started else 0.0,
+            "wait_ms_p95": recent[int(len(recent) * 0.95) - 1] * 1000.0 if recent else 0.0,
+            "wait_ms_max": self._wait_max * 1000.0,
+        }
+
+
+class InferenceExecutor:
+    """Registry of per-model inference pools"""
+
+    def __init__(self):
+        self.pools: Dict[str, InferencePool] = {}
+
+    def add_pool(
+        self,
+        name: str,
+        max_concurrency: int = 1,
+        mode: str = "thread",
+        initializer: Optional[Callable] = None,
+    ) -> InferencePool:
+        self.pools[name] = InferencePool(name, max_concurrency, mode, initializer)
+        return self.pools[name]
+
+    async def run(self, pool: str, fn: Callable, *args) -> Any:
+        """Run fn(*args) in the named pool and await its result"""
+        return await self.pools[pool].run(fn, *args)
+
+    def shutdown(self):
+        for pool in self.pools.values():
+            pool.shutdown()
+
+    def stats(self) -> Dict:
+        return {name: pool.stats() for name, pool in self.pools.items()}
@@ -0,0 +1,170 @@
+"""
+Weighted phrase lexicon for transcription scoring
+Phrases are compiled once into a word-level Aho-Corasick automaton, so a
+transcription is scored in a single pass regardless of lexicon size
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words; punctuation and whitespace only separate them"""
+    return TOKEN_RE.findall(text.lower())
+
+
+class PhraseMatcher:
+    """Word-level Aho-Corasick automaton over a {label: {phrase: weight}} lexicon
+
+    Matching works on whole words, so "hi" never matches inside "this" and
+    "press" never matches inside "pressure". Overlapping phrases all match.
+    """
+
+    def __init__(self, lexicon: Dict[str, Dict[str, float]]):
+        self.phrases: List[Tuple[str, str, float]] = []  # (label, phrase, weight)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+
+        for label, entries in lexicon.items():
+            for phrase, weight in entries.items():
+                words = tokenize(phrase)
+                if not words:
+                    raise ValueError(f"Lexicon phrase {phrase!r} ({label}) has no words")
+                self._add(words, len(self.phrases))
+                self.phrases.append((label, " ".join(words), float(weight)))
+        self._build_failure_links()
+
+    def _add(self, words: List[str], phrase_id: int):
+        state = 0
+        for word in words:
+            next_state = self._goto[state].get(word)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][word] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append(phrase_id)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and word not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(word, 0)
+                self._fail[child] = target if target != child else 0
+                # Phrases ending at the fallback state also end here
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def match(self, text: str) -> List[int]:
+        """Ids of every distinct phrase found in the text"""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+        for word in tokenize(text):
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word, 0)
+            if out[state]:
+                found.update(out[state])
+        return sorted(found)
+
+    def score(self, text: str) -> Tuple[Dict[str, float], List[str]]:
+        """Summed weight per label of the distinct phrases found, and the phrases"""
+        scores: Dict[str, float] = {}
+        matched = []
+        for phrase_id in self.match(text):
+            label, phrase, weight = self.phrases[phrase_id]
+            scores[label] = scores.get(label, 0.0) + weight
+            matched.append(phrase)
+        return scores, matched
+
+
+def load_lexicon(path: str) -> Dict[str, Dict[str, float]]:
+    """Read a {label: {phrase: weight}} JSON lexicon"""
+    with open(path, "rb") as f:
+        return parse_lexicon(f.read(), path)
+
+
+def parse_lexicon(data: bytes, path: str) -> Dict[str, Dict[str, float]]:
+    lexicon = json.loads(data)
+    if not isinstance(lexicon, dict) or not all(isinstance(entries, dict) for entries in lexicon.values()):
+        raise ValueError(f"{path} must map each label to a {{phrase: weight}} object")
+    return lexicon
+
+
+class Lexicon:
+    """A lexicon file and its compiled matcher, recompiled when the file changes
+
+    The file's mtime is checked at most every `check_interval` seconds (0
+    disables hot reload). A file that fails to load keeps the previous matcher.
+    """
+
+    def __init__(self, path: str, check_interval: float = 5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.loaded_at: Optional[float] = None
+        self.version: Optional[str] = None  # hash of the file content, stable across restarts and workers
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._matcher = self._compile()
+
+    def _compile(self) -> PhraseMatcher:
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path, "rb") as f:
+            data = f.read()
+        matcher = PhraseMatcher(parse_lexicon(data, self.path))
+        self._mtime = mtime
+        self.version = hashlib.blake2b(data, digest_size=8).hexdigest()
+        self.loaded_at = time.time()
+        return matcher
+
+    def reload(self) -> bool:
+        """Recompile from disk; returns False (keeping the old matcher) on error"""
+        try:
+            self._matcher = self._compile()
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"❌ Keeping previous lexicon, failed to load {self.path}: {e}")
+            return False
+        logger.info(f"📖 Lexicon reloaded: {len(self._matcher.phrases)} phrases from {self.path}")
+        return True
+
+    @property
+    def matcher(self) -> PhraseMatcher:
+        if self.check_interval > 0:
+            now = time.monotonic()
+            if now >= self._next_check:
+                self._next_check = now + self.check_interval
+                try:
+                    mtime = os.stat(self.path).st_mtime
+                except OSError:
+                    mtime = self._mtime
+                if mtime != self._mtime:
+                    self._mtime = mtime  # a broken file is reported once, not on every check
+                    self.reload()
+        return self._matcher
+
+    def score(self, text: str) -> Tuple[Dict[str, float], List[str]]:
+        return self.matcher.score(text)
+
+    def info(self) -> Dict:
+        counts: Dict[str, int] = {}
+        for label, _, _ in self._matcher.phrases:
+            counts[label] = counts.get(label, 0) + 1
+        return {"path": self.path, "phrases": counts, "version": self.version, "loaded_at": self.loaded_at}
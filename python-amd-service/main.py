@@ -4,30 +4,62 @@ Provides multiple ML models for real-time audio classification
 """
 
 import asyncio
+import base64
+import binascii
+import functools
+import hashlib
 import json
 import logging
 import ssl
 import os
-ssl._create_default_https_context = ssl._create_unverified_context
-os.environ['CURL_CA_BUNDLE'] = ''
+
+import config
+if config.MODEL_STORE_DIR:
+    # Weights come from the local artifact store; never reach out to a model hub
+    os.environ.setdefault('HF_HUB_OFFLINE', '1')
+    os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+else:
+    ssl._create_default_https_context = ssl._create_unverified_context
+    os.environ['CURL_CA_BUNDLE'] = ''
 import tempfile
 import time
 from typing import Dict, List, Optional, Union
-import uuid
 import wave
 
-import librosa
 import numpy as np
 import torch
 import torchaudio
 import whisper
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, Header, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
-from transformers import pipeline, Wav2Vec2Processor, Wav2Vec2ForCTC
+from transformers import Wav2Vec2Processor, Wav2Vec2ForCTC
 import uvicorn
 import webrtcvad
 
+from acoustic_head import encode, load_head
+import model_store
+import onnx_backend
+from batching import MicroBatcher
+from codec import SUPPORTED_ENCODINGS, decode_audio, decode_mulaw, decode_wav
+from executor import InferenceExecutor
+from lexicon import Lexicon
+from model_registry import ModelRegistry, ModelUnavailable
+from preprocessing import PreparedAudio, prepare_audio
+from profiling import Profiler
+from metrics import (
+    ACTIVE_SESSIONS, ANALYZER_SECONDS, CONTENT_TYPE, MODEL_MEMORY_BYTES, REGISTRY, REQUEST_SECONDS,
+    QUEUE_WAIT_SECONDS, STAGE_SECONDS, STREAM_LAG_SECONDS, STREAM_WINDOWS_SHED, WINDOWS_ANALYZED,
+)
+from quantization import apply_precision, model_size_bytes, set_num_threads
+from result_cache import ResultCache, audio_key
+from session_recorder import open_recorder
+from sessions import CLOSE_GOING_AWAY, CLOSE_INTERNAL_ERROR, CLOSE_TRY_AGAIN_LATER, SessionManager
+from ring_buffer import AudioRingBuffer
+from tone_detector import ToneDetector
+import whisper_fast
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -49,12 +81,41 @@ app.add_middleware(
 
 # Global model storage
 models = {}
-active_sessions = {}
+session_manager = SessionManager(
+    max_sessions=config.MAX_STREAM_SESSIONS,
+    idle_timeout=config.SESSION_IDLE_TIMEOUT_SECONDS,
+    max_duration=config.SESSION_MAX_DURATION_SECONDS,
+    history=config.SESSION_HISTORY,
+)
+
+# Weight sizes by model object; serializing a model to measure it is too slow per scrape
+_model_sizes: Dict[str, tuple] = {}
+
+def loaded_model_memory() -> Dict[tuple, int]:
+    """Weight bytes of each loaded torch model, for the model memory gauge"""
+    sizes = {}
+    for name in ("wav2vec2_model", "wav2vec2_onnx", "whisper", "whisper_onnx", "acoustic_head"):
+        model = models.get(name)
+        if model is None:
+            continue
+        cached = _model_sizes.get(name)
+        if cached is None or cached[0] is not model:
+            size = model.size_bytes if name.endswith("_onnx") else model_size_bytes(model)
+            cached = _model_sizes[name] = (model, size)
+        sizes[(name,)] = cached[1]
+    return sizes
+
+ACTIVE_SESSIONS.set_function(lambda: len(session_manager))
+MODEL_MEMORY_BYTES.set_function(loaded_model_memory)
+
+# Transcription phrase lexicon, recompiled when the file changes
+lexicon = Lexicon(config.LEXICON_PATH, config.LEXICON_RELOAD_SECONDS)
 
 class AudioAnalysisRequest(BaseModel):
     audio_data: str  # base64 encoded
     sample_rate: int = 8000
-    model_type: str = "ensemble"  # wav2vec2, whisper, vad, ensemble
+    model_type: str = "ensemble"  # wav2vec2, whisper, vad, ensemble, cascade
+    encoding: str = "pcm16"  # pcm16, mulaw, alaw
 
 class AudioAnalysisResponse(BaseModel):
     detection: str  # human, machine, unknown
@@ -64,47 +125,200 @@ class AudioAnalysisResponse(BaseModel):
     reasoning: str
     metadata: Dict
 
-class StreamSession(BaseModel):
-    session_id: str
-    call_sid: str
-    model_type: str
-    buffer_size: int = 0
-    analysis_count: int = 0
-    last_detection: Optional[str] = None
-    confidence_scores: List[float] = []
+class BatchClip(BaseModel):
+    id: Optional[str] = None
+    audio_data: str  # base64 encoded
+    sample_rate: int = 8000
+    encoding: str = "pcm16"  # pcm16, mulaw, alaw
+
+class BatchAnalysisRequest(BaseModel):
+    clips: List[BatchClip]
+    model_type: str = "ensemble"  # wav2vec2, whisper, vad, ensemble
+
+def make_beep_detector(sample_rate: int) -> Optional[ToneDetector]:
+    """Per-session beep detector, or None when beep detection is disabled"""
+    if not config.BEEP_DETECTION:
+        return None
+    return ToneDetector(
+        sample_rate,
+        threshold=config.BEEP_THRESHOLD,
+        min_duration_ms=config.BEEP_MIN_MS,
+        max_duration_ms=config.BEEP_MAX_MS,
+        min_level_db=config.BEEP_MIN_LEVEL_DB,
+    )
+
+def _model_source(name: str, hub_id: str) -> str:
+    """Local artifact directory when a model store is configured, otherwise the hub id"""
+    if not config.MODEL_STORE_DIR:
+        return hub_id
+    version_dir = model_store.resolve_version(config.MODEL_STORE_DIR, config.MODEL_STORE_VERSION)
+    return model_store.artifact_path(version_dir, name)
+
+def _check_backend(backend: str):
+    if backend not in onnx_backend.BACKENDS:
+        raise ValueError(f"Unsupported backend: {backend} (expected one of {', '.join(onnx_backend.BACKENDS)})")
+
+def _load_onnx(cls, name: str, source: str, precision: str, threads: int):
+    """ONNX Runtime model exported from `source`; warns when it was exported from another one"""
+    model = cls(os.path.join(config.ONNX_MODEL_DIR, name), precision, threads, config.ONNX_GRAPH_OPTIMIZATION)
+    if model.source != source:
+        logger.warning(f"ONNX {name} was exported from {model.source}, the configured model is {source}")
+    return model
+
+def _load_wav2vec2():
+    source = _model_source("wav2vec2", config.WAV2VEC2_MODEL)
+    _check_backend(config.WAV2VEC2_BACKEND)
+    logger.info(f"Loading Wav2Vec2 model from {source} ({config.WAV2VEC2_PRECISION}, {config.WAV2VEC2_BACKEND})...")
+    local = bool(config.MODEL_STORE_DIR)
+    models['wav2vec2_processor'] = Wav2Vec2Processor.from_pretrained(source, local_files_only=local)
+    if config.WAV2VEC2_BACKEND == "onnx":
+        models.pop('wav2vec2_model', None)
+        encoder = models['wav2vec2_onnx'] = _load_onnx(
+            onnx_backend.OnnxWav2Vec2, "wav2vec2", source, config.WAV2VEC2_PRECISION, config.WAV2VEC2_THREADS
+        )
+        hidden_size = encoder.hidden_size
+    else:
+        models.pop('wav2vec2_onnx', None)
+        if local:
+            model = model_store.load_wav2vec2(source)
+        else:
+            model = Wav2Vec2ForCTC.from_pretrained(source).eval()
+        models['wav2vec2_model'] = apply_precision(model, config.WAV2VEC2_PRECISION)
+        hidden_size = models['wav2vec2_model'].config.hidden_size
+    # The acoustic head is optional: without it wav2vec2 is transcription-only
+    models.pop('acoustic_head', None)
+    if os.path.isfile(config.ACOUSTIC_HEAD_PATH):
+        head, _ = load_head(config.ACOUSTIC_HEAD_PATH)
+        if head.hidden_size != hidden_size:
+            raise ValueError(
+                f"Acoustic head {config.ACOUSTIC_HEAD_PATH} expects hidden size {head.hidden_size}, "
+                f"{source} has {hidden_size}"
+            )
+        models['acoustic_head'] = head
+        logger.info(f"Loaded acoustic head from {config.ACOUSTIC_HEAD_PATH} (layer {head.layer})")
+
+def _load_whisper():
+    source = _model_source("whisper", config.WHISPER_MODEL)
+    _check_backend(config.WHISPER_BACKEND)
+    logger.info(f"Loading Whisper model from {source} ({config.WHISPER_PRECISION}, {config.WHISPER_BACKEND})...")
+    device = "cpu" if config.WHISPER_PRECISION == "int8" else None  # quantized kernels are CPU-only
+    if config.MODEL_STORE_DIR:
+        model = model_store.load_whisper(source, device=device)
+    else:
+        model = whisper.load_model(source, device=device)
+    models['whisper'] = apply_precision(model, config.WHISPER_PRECISION)
+    models.pop('whisper_onnx', None)
+    if config.WHISPER_BACKEND == "onnx":
+        models['whisper_onnx'] = _load_onnx(
+            onnx_backend.OnnxWhisper, "whisper", source, config.WHISPER_PRECISION, config.WHISPER_THREADS
+        )
+
+def _load_vad():
+    logger.info("Initializing Voice Activity Detection...")
+    models['vad'] = webrtcvad.Vad(2)  # Aggressiveness level 2
+
+MODEL_LOADERS = {
+    "wav2vec2": _load_wav2vec2,
+    "whisper": _load_whisper,
+    "vad": _load_vad,
+}
+
+def load_model_weights(names: Optional[List[str]] = None):
+    """Load the named models (all by default) into the global model storage"""
+    for name in names or list(MODEL_LOADERS):
+        MODEL_LOADERS[name]()
+        registry.mark_ready(name)
+
+# Models loaded by serve.py before it forked this worker; their weights are shared copy-on-write
+inherited_models = set()
+
+def load_shared_weights(names: List[str]):
+    """Load models in the serve.py parent, ahead of forking the workers that use them"""
+    for name in names:
+        MODEL_LOADERS[name]()
+        inherited_models.add(name)
+
+def worker_ready() -> int:
+    """No-op used to start pool workers (and their model loading) ahead of traffic"""
+    return os.getpid()
+
+def _init_pool_worker(model_names: List[str], num_threads: int):
+    set_num_threads(num_threads)
+    # Process workers do not share the parent's models, so each loads its own
+    if model_names:
+        load_model_weights(model_names)
+
+def _pool_initializer(model_names: List[str], num_threads: int = 0):
+    # torch's thread count is process-wide, so only worker processes can have their own
+    if config.INFERENCE_EXECUTOR == "process" and (model_names or num_threads > 0):
+        return functools.partial(_init_pool_worker, model_names, num_threads)
+    return None
+
+if config.INFERENCE_EXECUTOR != "process" and (
+    (config.WAV2VEC2_THREADS > 0 and config.WAV2VEC2_BACKEND == "torch") or config.WHISPER_THREADS > 0
+):
+    logger.warning(
+        "⚠️ WAV2VEC2_THREADS/WHISPER_THREADS do not limit torch with INFERENCE_EXECUTOR=thread; "
+        "all pools share the process-wide torch thread count"
+    )
+
+# Blocking inference and DSP run here instead of on the event loop
+inference = InferenceExecutor()
+inference.add_pool("preprocess", config.PREPROCESS_CONCURRENCY, config.INFERENCE_EXECUTOR)
+inference.add_pool("vad", config.VAD_CONCURRENCY, config.INFERENCE_EXECUTOR, _pool_initializer(["vad"]))
+inference.add_pool("wav2vec2", config.WAV2VEC2_CONCURRENCY, config.INFERENCE_EXECUTOR, _pool_initializer(["wav2vec2"], config.WAV2VEC2_THREADS))
+inference.add_pool("whisper", config.WHISPER_CONCURRENCY, config.INFERENCE_EXECUTOR, _pool_initializer(["whisper"], config.WHISPER_THREADS))
+
+async def _load_model(name: str):
+    if name in inherited_models:
+        return  # already in memory; the registry only warms it up in this worker
+    if config.INFERENCE_EXECUTOR == "process" and name in inference.pools:
+        # The pool's worker processes load the models they serve
+        await inference.run(name, worker_ready)
+    else:
+        await asyncio.get_running_loop().run_in_executor(None, MODEL_LOADERS[name])
+
+def _synthetic_window(analyzer: str) -> PreparedAudio:
+    """Tone over low noise, enough to run every code path of an analyzer once"""
+    sample_rate = 8000
+    t = np.arange(int(sample_rate * config.WARMUP_SECONDS)) / sample_rate
+    noise = np.random.default_rng(0).standard_normal(len(t)) * 0.01
+    audio = (0.1 * np.sin(2 * np.pi * 440 * t) + noise).astype(np.float32)
+    return prepare_window(audio, sample_rate, (analyzer,))
+
+async def _warmup_model(name: str):
+    """Run one synthetic window through the model so the first real call is not slow"""
+    window = _synthetic_window(name)
+    if name == "wav2vec2":
+        await inference.run("wav2vec2", transcribe_wav2vec2_batch, [window])
+    elif name == "whisper":
+        await inference.run("whisper", transcribe_whisper_batch, [window])
+    elif name == "vad":
+        await inference.run("vad", analyze_with_vad, window)
+
+# Per-model load state; models load concurrently and on first use
+registry = ModelRegistry(
+    warmup=config.MODEL_WARMUP,
+    retry_seconds=config.MODEL_RETRY_SECONDS,
+    max_retry_seconds=config.MODEL_RETRY_MAX_SECONDS,
+)
+for _name in MODEL_LOADERS:
+    registry.register(_name, functools.partial(_load_model, _name), functools.partial(_warmup_model, _name))
 
 @app.on_event("startup")
 async def load_models():
-    """Load all ML models on startup"""
-    logger.info("🚀 Loading ML models...")
-    
-    try:
-        # Load Wav2Vec2 model
-        logger.info("Loading Wav2Vec2 model...")
-        models['wav2vec2_processor'] = Wav2Vec2Processor.from_pretrained("facebook/wav2vec2-base-960h")
-        models['wav2vec2_model'] = Wav2Vec2ForCTC.from_pretrained("facebook/wav2vec2-base-960h")
-        
-        # Load Whisper model
-        logger.info("Loading Whisper model...")
-        models['whisper'] = whisper.load_model("base")
-        
-        # Load HuggingFace audio classification pipeline
-        logger.info("Loading audio classification pipeline...")
-        models['audio_classifier'] = pipeline(
-            "audio-classification",
-            model="superb/wav2vec2-base-superb-ks",
-            return_all_scores=True
-        )
-        
-        # Initialize VAD
-        logger.info("Initializing Voice Activity Detection...")
-        models['vad'] = webrtcvad.Vad(2)  # Aggressiveness level 2
-        
-        logger.info("✅ All models loaded successfully!")
-        
-    except Exception as e:
-        logger.error(f"❌ Error loading models: {e}")
-        raise
+    """Start loading the preloaded models in the background"""
+    logger.info(f"🚀 Loading ML models: {', '.join(config.PRELOAD_MODELS)}")
+    # Requests only wait for the models they use; /ready reports when all are loaded
+    registry.preload(config.PRELOAD_MODELS)
+
+@app.on_event("shutdown")
+async def stop_schedulers():
+    """Drain the batch schedulers and worker pools on shutdown"""
+    for scheduler in schedulers.values():
+        await scheduler.stop()
+    await session_manager.stop()
+    inference.shutdown()
 
 @app.get("/health")
 async def health_check():
@@ -112,7 +326,48 @@ async def health_check():
     return {
         "status": "healthy",
         "models_loaded": len(models),
-        "active_sessions": len(active_sessions),
+        "models": registry.status(),
+        "active_sessions": len(session_manager),
+        "sessions": session_manager.stats(),
+        "schedulers": {name: scheduler.stats() for name, scheduler in schedulers.items()},
+        "executor": inference.stats(),
+        "result_cache": result_cache.stats(),
+        "pid": os.getpid(),
+        "timestamp": time.time()
+    }
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Per-stage latency histograms, queue waits, sessions and memory (Prometheus format)"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@app.get("/profiles")
+async def list_profiles():
+    """Index of the stored request profiles, newest first"""
+    return {
+        "enabled": profiler.enabled,
+        "sample_rate": profiler.sample_rate,
+        "profiles": await asyncio.get_running_loop().run_in_executor(None, profiler.index),
+    }
+
+@app.get("/profiles/{name}")
+async def download_profile(name: str):
+    """Download one profile file (.pstats, .txt report or .trace.json for chrome://tracing)"""
+    path = profiler.file_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile file not found: {name}")
+    return FileResponse(path, filename=name)
+
+@app.get("/ready")
+async def readiness_check(response: Response):
+    """Readiness probe: 503 until every preloaded model is loaded and warmed up"""
+    ready = registry.all_ready(config.PRELOAD_MODELS)
+    if not ready:
+        response.status_code = 503
+    return {
+        "ready": ready,
+        "models": registry.status(),
+        "pid": os.getpid(),
         "timestamp": time.time()
     }
 
@@ -121,125 +376,197 @@ async def list_models():
     """List available models"""
     return {
         "available_models": list(models.keys()),
+        "precision": {
+            "wav2vec2": config.WAV2VEC2_PRECISION,
+            "whisper": config.WHISPER_PRECISION,
+        },
+        "backend": {
+            "wav2vec2": config.WAV2VEC2_BACKEND,
+            "whisper": config.WHISPER_BACKEND,
+        },
+        "acoustic_head": config.ACOUSTIC_HEAD_PATH if 'acoustic_head' in models else None,
+        "lexicon": lexicon.info(),
         "model_info": {
-            "wav2vec2": "Facebook Wav2Vec2 Base 960h - Speech recognition",
+            "wav2vec2": "Facebook Wav2Vec2 Base 960h - Speech recognition + acoustic human/machine head",
             "whisper": "OpenAI Whisper Base - Speech transcription",
-            "audio_classifier": "SuperB Wav2Vec2 - Audio classification",
             "vad": "WebRTC VAD - Voice activity detection"
         }
     }
 
-def preprocess_audio(audio_data: np.ndarray, target_sr: int = 16000) -> np.ndarray:
-    """Preprocess audio for ML models"""
-    # Normalize audio
-    if audio_data.dtype != np.float32:
-        audio_data = audio_data.astype(np.float32)
+def prepare_window(audio_data: np.ndarray, sample_rate: int, analyzers: tuple) -> PreparedAudio:
+    """Resample and normalize a window once for every analyzer that will consume it"""
+    whisper_model = models.get('whisper')
+    return prepare_audio(
+        audio_data,
+        sample_rate,
+        asr=bool({"wav2vec2", "whisper"} & set(analyzers)),
+        vad="vad" in analyzers,
+        mel_bins=whisper_model.dims.n_mels if whisper_model is not None and "whisper" in analyzers else None,
+        mel_samples=whisper_mel_samples(len(audio_data) / sample_rate if sample_rate else 0.0),
+    )
+
+def whisper_mel_samples(duration: float) -> Optional[int]:
+    """Trimmed mel length for the short-window decode, or None for the full 30s decode"""
+    if config.WHISPER_FAST_DECODE and duration <= config.WHISPER_FAST_MAX_SECONDS:
+        return whisper_fast.mel_samples(int(np.ceil(duration * 16000)))
+    return None
+
+def transcribe_wav2vec2_batch(windows: List[PreparedAudio]) -> List[Dict]:
+    """Transcribe a batch of windows, and score them with the acoustic head, in one padded encoder pass"""
+    processor = models['wav2vec2_processor']
+    onnx_encoder = models.get('wav2vec2_onnx')
+    head = models.get('acoustic_head')
+    
+    audio = [window.audio_16k for window in windows]
+    inputs = processor(audio, sampling_rate=16000, return_tensors="pt", padding=True)
+    
+    encoder_args = (
+        inputs.input_values, inputs.get("attention_mask"),
+        [len(samples) for samples in audio], [head.layer] if head is not None else []
+    )
+    if onnx_encoder is not None:
+        logits, pooled = onnx_encoder.encode(*encoder_args)
+    else:
+        logits, pooled = encode(models['wav2vec2_model'], *encoder_args)
+    
+    # Get predicted tokens
+    predicted_ids = torch.argmax(logits, dim=-1)
+    texts = processor.batch_decode(predicted_ids)
+    probabilities = head.machine_probability(pooled[0]).tolist() if head is not None else [None] * len(texts)
+    return [
+        {"text": text, "machine_probability": probability}
+        for text, probability in zip(texts, probabilities)
+    ]
+
+def transcribe_whisper_batch(windows: List[PreparedAudio]) -> List[Dict]:
+    """Transcribe a batch of windows with one padded Whisper decode"""
+    model = models['whisper']
+    results: List[Optional[Dict]] = [None] * len(windows)
+    
+    # Clips longer than Whisper's 30s context need the sliding-window transcribe loop
+    batched, short = [], []
+    for i, window in enumerate(windows):
+        if len(window.audio_16k) > whisper.audio.N_SAMPLES:
+            result = model.transcribe(window.audio_16k)
+            results[i] = {"text": result['text'].strip(), "language": result.get('language', 'unknown')}
+        elif whisper_mel_samples(window.duration) is not None:
+            short.append(i)
+        else:
+            batched.append(i)
+    
+    if short:
+        # Streaming-size windows: trimmed encoder input, greedy fixed-language decode
+        n_samples = max(whisper_mel_samples(windows[i].duration) for i in short)
+        mel = torch.from_numpy(np.stack([windows[i].log_mel(model.dims.n_mels, n_samples) for i in short]))
+        onnx_whisper = models.get('whisper_onnx')
+        if onnx_whisper is not None:
+            texts = onnx_whisper.transcribe_short(mel, config.WHISPER_LANGUAGE, config.WHISPER_MAX_TOKENS)
+        else:
+            texts = whisper_fast.transcribe_short(model, mel, config.WHISPER_LANGUAGE, config.WHISPER_MAX_TOKENS)
+        for i, text in zip(short, texts):
+            results[i] = {"text": text, "language": config.WHISPER_LANGUAGE}
+    
+    if batched:
+        mel = torch.from_numpy(
+            np.stack([windows[i].log_mel(model.dims.n_mels) for i in batched])
+        ).to(model.device)
+        options = whisper.DecodingOptions(fp16=model.device.type == "cuda", without_timestamps=True)
+        for i, decoded in zip(batched, whisper.decode(model, mel, options)):
+            results[i] = {"text": decoded.text.strip(), "language": decoded.language}
+    
+    return results
+
+# Cross-session batch schedulers, shared by /analyze and every stream
+schedulers = {
+    "wav2vec2": MicroBatcher(
+        "wav2vec2", transcribe_wav2vec2_batch, config.BATCH_MAX_SIZE, config.BATCH_MAX_WAIT_MS,
+        pool=inference.pools["wav2vec2"]
+    ),
+    "whisper": MicroBatcher(
+        "whisper", transcribe_whisper_batch, config.BATCH_MAX_SIZE, config.BATCH_MAX_WAIT_MS,
+        pool=inference.pools["whisper"]
+    ),
+}
+
+def analysis_failed(model: str, error: Exception, **extra) -> Dict:
+    """Neutral result for an analyzer that raised"""
+    return {
+        "detection": "unknown",
+        "confidence": 0.5,
+        "reasoning": f"Analysis failed: {str(error)}",
+        **extra,
+        "model": model
+    }
+
+def combine_acoustic(detection: str, confidence: float, machine_probability: float) -> tuple:
+    """Blend a transcription decision with the acoustic head's P(machine)"""
+    if detection == "unknown":
+        probability = machine_probability
+    else:
+        text_probability = confidence if detection == "machine" else 1.0 - confidence
+        weight = config.ACOUSTIC_HEAD_WEIGHT
+        probability = (1.0 - weight) * text_probability + weight * machine_probability
+    
+    if probability > 0.5:
+        return "machine", probability
+    elif probability < 0.5:
+        return "human", 1.0 - probability
+    return "unknown", 0.5
+
+def wav2vec2_result(result: Dict) -> Dict:
+    """AMD result from a Wav2Vec2 transcription and, when loaded, the acoustic head"""
+    transcription = result['text']
+    detection, confidence, reasoning = analyze_transcription_for_amd(transcription)
+    machine_probability = result.get('machine_probability')
+    if machine_probability is not None:
+        detection, confidence = combine_acoustic(detection, confidence, machine_probability)
+        reasoning = f"{reasoning}; acoustic P(machine)={machine_probability:.2f}"
     
-    # Normalize to [-1, 1]
-    if np.max(np.abs(audio_data)) > 0:
-        audio_data = audio_data / np.max(np.abs(audio_data))
+    return {
+        "detection": detection,
+        "confidence": confidence,
+        "reasoning": reasoning,
+        "transcription": transcription,
+        "acoustic_machine_probability": machine_probability,
+        "model": "wav2vec2"
+    }
+
+def whisper_result(result: Dict) -> Dict:
+    """AMD result from a Whisper transcription"""
+    transcription = result['text']
+    detection, confidence, reasoning = analyze_transcription_for_amd(transcription)
     
-    return audio_data
+    return {
+        "detection": detection,
+        "confidence": confidence,
+        "reasoning": reasoning,
+        "transcription": transcription,
+        "language": result.get('language', 'unknown'),
+        "model": "whisper"
+    }
 
-def analyze_with_wav2vec2(audio_data: np.ndarray, sample_rate: int) -> Dict:
+async def analyze_with_wav2vec2(prepared: PreparedAudio) -> Dict:
     """Analyze audio using Wav2Vec2"""
     try:
-        # Resample to 16kHz if needed
-        if sample_rate != 16000:
-            audio_data = librosa.resample(audio_data, orig_sr=sample_rate, target_sr=16000)
-        
-        # Preprocess
-        audio_data = preprocess_audio(audio_data)
-        
-        # Process with Wav2Vec2
-        processor = models['wav2vec2_processor']
-        model = models['wav2vec2_model']
-        
-        inputs = processor(audio_data, sampling_rate=16000, return_tensors="pt", padding=True)
-        
-        with torch.no_grad():
-            logits = model(inputs.input_values).logits
-        
-        # Get predicted tokens
-        predicted_ids = torch.argmax(logits, dim=-1)
-        transcription = processor.batch_decode(predicted_ids)[0]
-        
-        # Analyze transcription for AMD
-        detection, confidence, reasoning = analyze_transcription_for_amd(transcription)
-        
-        return {
-            "detection": detection,
-            "confidence": confidence,
-            "reasoning": reasoning,
-            "transcription": transcription,
-            "model": "wav2vec2"
-        }
-        
+        return wav2vec2_result(await schedulers['wav2vec2'].submit(prepared))
     except Exception as e:
         logger.error(f"Wav2Vec2 analysis error: {e}")
-        return {
-            "detection": "unknown",
-            "confidence": 0.5,
-            "reasoning": f"Analysis failed: {str(e)}",
-            "transcription": "",
-            "model": "wav2vec2"
-        }
+        return analysis_failed("wav2vec2", e, transcription="")
 
-def analyze_with_whisper(audio_data: np.ndarray, sample_rate: int) -> Dict:
+async def analyze_with_whisper(prepared: PreparedAudio) -> Dict:
     """Analyze audio using Whisper"""
     try:
-        # Resample to 16kHz if needed
-        if sample_rate != 16000:
-            audio_data = librosa.resample(audio_data, orig_sr=sample_rate, target_sr=16000)
-        
-        # Preprocess
-        audio_data = preprocess_audio(audio_data)
-        
-        # Transcribe with Whisper
-        result = models['whisper'].transcribe(audio_data)
-        transcription = result['text'].strip()
-        
-        # Analyze transcription for AMD
-        detection, confidence, reasoning = analyze_transcription_for_amd(transcription)
-        
-        return {
-            "detection": detection,
-            "confidence": confidence,
-            "reasoning": reasoning,
-            "transcription": transcription,
-            "language": result.get('language', 'unknown'),
-            "model": "whisper"
-        }
-        
+        return whisper_result(await schedulers['whisper'].submit(prepared))
     except Exception as e:
         logger.error(f"Whisper analysis error: {e}")
-        return {
-            "detection": "unknown",
-            "confidence": 0.5,
-            "reasoning": f"Analysis failed: {str(e)}",
-            "transcription": "",
-            "model": "whisper"
-        }
+        return analysis_failed("whisper", e, transcription="")
 
-def analyze_with_vad(audio_data: np.ndarray, sample_rate: int) -> Dict:
+def analyze_with_vad(prepared: PreparedAudio) -> Dict:
     """Analyze audio using Voice Activity Detection"""
     try:
-        # Convert to 16-bit PCM
-        if audio_data.dtype != np.int16:
-            audio_data = (audio_data * 32767).astype(np.int16)
-        
-        # Resample to supported rate (8kHz, 16kHz, 32kHz, 48kHz)
-        supported_rates = [8000, 16000, 32000, 48000]
-        target_rate = min(supported_rates, key=lambda x: abs(x - sample_rate))
-        
-        if sample_rate != target_rate:
-            audio_data = librosa.resample(
-                audio_data.astype(np.float32), 
-                orig_sr=sample_rate, 
-                target_sr=target_rate
-            )
-            audio_data = (audio_data * 32767).astype(np.int16)
-            sample_rate = target_rate
+        # 16-bit PCM at a supported rate (8kHz, 16kHz, 32kHz, 48kHz)
+        audio_data = prepared.vad_pcm
+        sample_rate = prepared.vad_rate
         
         # Analyze in 30ms chunks
         vad = models['vad']
@@ -287,57 +614,53 @@ def analyze_with_vad(audio_data: np.ndarray, sample_rate: int) -> Dict:
         
     except Exception as e:
         logger.error(f"VAD analysis error: {e}")
+        return analysis_failed("vad", e)
+
+def analyze_with_beep(prepared: PreparedAudio) -> Dict:
+    """Look for a voicemail beep anywhere in the window"""
+    detector = make_beep_detector(prepared.sample_rate)
+    events = detector.detect(prepared.audio) if detector is not None else []
+    if not events:
+        # No beep is no evidence either way; ensemble_analysis leaves it out
         return {
             "detection": "unknown",
             "confidence": 0.5,
-            "reasoning": f"Analysis failed: {str(e)}",
-            "model": "vad"
+            "reasoning": "No beep detected",
+            "model": "beep"
         }
+    
+    beep = max(events, key=lambda event: event["confidence"])
+    return {
+        "detection": "machine",
+        "confidence": beep["confidence"],
+        "reasoning": f"{beep['frequency']:.0f}Hz beep for {beep['duration_ms']:.0f}ms",
+        "frequency": beep["frequency"],
+        "duration_ms": beep["duration_ms"],
+        "model": "beep"
+    }
+
+def analyze_with_vad_batch(windows: List[PreparedAudio]) -> List[Dict]:
+    """Run VAD over a batch of windows in one pool job"""
+    return [analyze_with_vad(window) for window in windows]
 
 def analyze_transcription_for_amd(transcription: str) -> tuple:
     """Analyze transcription text for AMD patterns"""
     text = transcription.lower().strip()
     
-    # Machine indicators
-    machine_patterns = [
-        "you have reached",
-        "please leave a message",
-        "after the beep",
-        "not available",
-        "voicemail",
-        "mailbox",
-        "press",
-        "dial",
-        "extension",
-        "automated",
-        "system",
-        "recording"
-    ]
-    
-    # Human indicators
-    human_patterns = [
-        "hello",
-        "hi",
-        "yes",
-        "speaking",
-        "this is",
-        "how can i help",
-        "what's up",
-        "hey there"
-    ]
-    
-    machine_score = sum(1 for pattern in machine_patterns if pattern in text)
-    human_score = sum(1 for pattern in human_patterns if pattern in text)
-    
     if len(text) < 3:
         return "unknown", 0.5, "Transcription too short"
     
+    # Weighted machine/human phrases from the lexicon file, matched on whole words
+    scores, _ = lexicon.score(text)
+    machine_score = scores.get("machine", 0.0)
+    human_score = scores.get("human", 0.0)
+    
     if machine_score > human_score:
         confidence = min(0.9, 0.6 + (machine_score * 0.1))
-        return "machine", confidence, f"Machine patterns detected: {machine_score}"
+        return "machine", confidence, f"Machine patterns detected: {machine_score:g}"
     elif human_score > machine_score:
         confidence = min(0.9, 0.6 + (human_score * 0.1))
-        return "human", confidence, f"Human patterns detected: {human_score}"
+        return "human", confidence, f"Human patterns detected: {human_score:g}"
     else:
         return "unknown", 0.5, "Ambiguous transcription patterns"
 
@@ -351,12 +674,12 @@ def ensemble_analysis(results: List[Dict]) -> Dict:
             "model": "ensemble"
         }
     
-    # Weight different models
+    # Weight different models; a voicemail beep is the strongest single machine cue
     model_weights = {
+        "beep": 0.8,
         "whisper": 0.4,
         "wav2vec2": 0.3,
-        "vad": 0.2,
-        "audio_classifier": 0.1
+        "vad": 0.2
     }
     
     detection_scores = {"human": 0, "machine": 0, "unknown": 0}
@@ -367,6 +690,8 @@ def ensemble_analysis(results: List[Dict]) -> Dict:
         detection = result.get("detection", "unknown")
         confidence = result.get("confidence", 0.5)
         weight = model_weights.get(model, 0.1)
+        if model == "beep" and detection == "unknown":
+            continue
         
         detection_scores[detection] += confidence * weight
         total_weight += weight
@@ -375,6 +700,8 @@ def ensemble_analysis(results: List[Dict]) -> Dict:
     if total_weight > 0:
         for key in detection_scores:
             detection_scores[key] /= total_weight
+    else:
+        detection_scores["unknown"] = 0.5
     
     # Get final decision
     final_detection = max(detection_scores, key=detection_scores.get)
@@ -389,163 +716,677 @@ def ensemble_analysis(results: List[Dict]) -> Dict:
         "detection_scores": detection_scores
     }
 
+ENSEMBLE_MEMBERS = ("wav2vec2", "whisper", "vad")
+
+# Cascade order: every cheap analyzer runs first as one tier, then each
+# expensive one in increasing cost while the decision is still ambiguous
+CHEAP_ANALYZERS = ("beep", "vad") if config.BEEP_DETECTION else ("vad",)
+EXPENSIVE_ANALYZERS = ("whisper", "wav2vec2")
+CASCADE_MEMBERS = CHEAP_ANALYZERS + EXPENSIVE_ANALYZERS
+
+# Analyzers that can back an early exit but never decide one alone: VAD
+# silence is as likely a caller waiting for a greeting as an answering machine
+ADVISORY_ANALYZERS = ("vad",)
+
+async def run_analyzer(name: str, prepared: PreparedAudio) -> Dict:
+    """Run one analyzer by name and record its latency"""
+    if name in MODEL_LOADERS:
+        await registry.ensure(name)
+    start = time.perf_counter()
+    if name == "wav2vec2":
+        result = await analyze_with_wav2vec2(prepared)
+    elif name == "whisper":
+        result = await analyze_with_whisper(prepared)
+    elif name == "vad":
+        result = await inference.run("vad", analyze_with_vad, prepared)
+    elif name == "beep":
+        result = await inference.run("preprocess", analyze_with_beep, prepared)
+    else:
+        raise ValueError(f"Unknown analyzer: {name}")
+    elapsed = time.perf_counter() - start
+    ANALYZER_SECONDS.labels(name).observe(elapsed)
+    result["latency_ms"] = elapsed * 1000
+    return result
+
+def cascade_can_exit(decision: Dict, results: List[Dict]) -> bool:
+    """Whether the cascade may stop with this decision instead of running the next tier"""
+    if decision["detection"] == "unknown" or decision["confidence"] < config.CASCADE_THRESHOLD:
+        return False
+    return any(
+        result["model"] not in ADVISORY_ANALYZERS and result["detection"] == decision["detection"]
+        for result in results
+    )
+
+MEMBER_TIMEOUTS_MS = {
+    "wav2vec2": config.WAV2VEC2_TIMEOUT_MS,
+    "whisper": config.WHISPER_TIMEOUT_MS,
+    "vad": config.VAD_TIMEOUT_MS,
+}
+
+async def run_ensemble_members(prepared: PreparedAudio, members: tuple, deadlines: bool = True) -> tuple:
+    """Run ensemble members concurrently, dropping any that miss their deadline or whose model is unavailable
+    
+    Returns (results, timed_out, unavailable member names) so the caller can
+    decide on a partial ensemble. With deadlines off every member runs to completion.
+    """
+    async def run_member(name: str):
+        # A cold load is not held to the deadline; a failed one raises ModelUnavailable
+        if name in MODEL_LOADERS:
+            await registry.ensure(name)
+        timeout_ms = MEMBER_TIMEOUTS_MS.get(name, 0) if deadlines else 0
+        return await asyncio.wait_for(run_analyzer(name, prepared), timeout_ms / 1000 if timeout_ms > 0 else None)
+    
+    outcomes = await asyncio.gather(*(run_member(name) for name in members), return_exceptions=True)
+    
+    results, timed_out, unavailable = [], [], []
+    for name, outcome in zip(members, outcomes):
+        if isinstance(outcome, asyncio.TimeoutError):
+            logger.warning(f"⏱️ {name} missed its {MEMBER_TIMEOUTS_MS.get(name)}ms deadline")
+            timed_out.append(name)
+        elif isinstance(outcome, ModelUnavailable):
+            # Logged with its retry time by the registry when the load failed
+            unavailable.append(name)
+        elif isinstance(outcome, BaseException):
+            raise outcome
+        else:
+            results.append(outcome)
+    return results, timed_out, unavailable
+
+def dropped_reasoning(timed_out: List[str], unavailable: List[str]) -> str:
+    notes = [f"{', '.join(timed_out)} timed out"] if timed_out else []
+    notes += [f"{', '.join(unavailable)} unavailable"] if unavailable else []
+    return f" (partial: {'; '.join(notes)})" if notes else ""
+
+def partial_ensemble_analysis(results: List[Dict], timed_out: List[str], unavailable: List[str] = ()) -> Dict:
+    """Ensemble decision that records which members were dropped"""
+    decision = ensemble_analysis(results)
+    decision["timed_out"] = timed_out
+    decision["unavailable"] = list(unavailable)
+    decision["reasoning"] += dropped_reasoning(timed_out, unavailable)
+    return decision
+
+async def cascade_analysis(prepared: PreparedAudio, members: tuple = CASCADE_MEMBERS, deadlines: bool = True) -> Dict:
+    """Run cheap analyzers first and stop once the ensemble is confident enough"""
+    tiers = [tuple(name for name in CHEAP_ANALYZERS if name in members)]
+    tiers += [(name,) for name in EXPENSIVE_ANALYZERS if name in members]
+    
+    results, timed_out, unavailable = [], [], []
+    decision = ensemble_analysis(results)
+    for tier in tiers:
+        if not tier:
+            continue
+        tier_results, tier_timed_out, tier_unavailable = await run_ensemble_members(prepared, tier, deadlines)
+        results += tier_results
+        timed_out += tier_timed_out
+        unavailable += tier_unavailable
+        decision = partial_ensemble_analysis(results, timed_out, unavailable)
+        if cascade_can_exit(decision, results):
+            break
+    
+    stages_run = [result["model"] for result in results]
+    reasoning = f"Cascade decision after {', '.join(stages_run) or 'no stages'}"
+    reasoning += dropped_reasoning(timed_out, unavailable)
+    dropped = timed_out + unavailable
+    decision.update({
+        "model": "cascade",
+        "reasoning": reasoning,
+        "stages_run": stages_run,
+        "stages_skipped": [name for name in members if name not in stages_run and name not in dropped],
+        "early_exit": len(stages_run) + len(dropped) < len(members),
+    })
+    return decision
+
+# /analyze results by audio content, shared by retries and duplicate submissions
+result_cache = ResultCache(
+    max_entries=config.RESULT_CACHE_MAX_ENTRIES,
+    max_bytes=int(config.RESULT_CACHE_MAX_MB * 2**20),
+    ttl_seconds=config.RESULT_CACHE_TTL_SECONDS,
+    disk_dir=config.RESULT_CACHE_DIR,
+    disk_max_bytes=int(config.RESULT_CACHE_DISK_MAX_MB * 2**20),
+)
+
+def _result_config_version() -> str:
+    """Hash of the model configuration that changes results, for the result cache key
+
+    Built from settings and file contents only, so it is the same after a
+    restart and in every worker.
+    """
+    store = None
+    if config.MODEL_STORE_DIR:
+        try:
+            store = model_store.resolve_version(config.MODEL_STORE_DIR, config.MODEL_STORE_VERSION)
+        except FileNotFoundError:
+            pass  # reported when the models load
+    head = None
+    if os.path.isfile(config.ACOUSTIC_HEAD_PATH):
+        with open(config.ACOUSTIC_HEAD_PATH, "rb") as f:
+            head = hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+    settings = (
+        store, config.WAV2VEC2_MODEL, config.WHISPER_MODEL,
+        config.WAV2VEC2_PRECISION, config.WHISPER_PRECISION, config.WAV2VEC2_BACKEND, config.WHISPER_BACKEND,
+        head, config.ACOUSTIC_HEAD_WEIGHT, config.WHISPER_FAST_DECODE, config.WHISPER_FAST_MAX_SECONDS,
+        config.WHISPER_LANGUAGE, config.WHISPER_MAX_TOKENS, config.CASCADE_THRESHOLD,
+        config.BEEP_DETECTION, config.BEEP_THRESHOLD, config.BEEP_MIN_MS, config.BEEP_MAX_MS, config.BEEP_MIN_LEVEL_DB,
+    )
+    return hashlib.blake2b(repr(settings).encode(), digest_size=8).hexdigest()
+
+RESULT_CONFIG_VERSION = _result_config_version()
+
+profiler = Profiler(
+    config.PROFILE_DIR,
+    enabled=config.PROFILING_ENABLED,
+    sample_rate=config.PROFILE_SAMPLE_RATE,
+    torch_enabled=config.PROFILE_TORCH,
+    max_profiles=config.PROFILE_MAX_REQUESTS,
+)
+
+def profile_requested(connection) -> bool:
+    """Whether a request or WebSocket asked to be profiled (X-Profile header or ?profile=1)"""
+    value = connection.headers.get("x-profile") or connection.query_params.get("profile") or ""
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+def is_cacheable(result: Dict) -> bool:
+    """Only complete results are cached: no member timed out, was unavailable or failed"""
+    members = result.get("individual_results", [result])
+    return not result.get("timed_out") and not result.get("unavailable") and not any(
+        member.get("reasoning", "").startswith("Analysis failed") for member in members
+    )
+
+async def run_analysis(
+    audio_data: np.ndarray, sample_rate: int, model_type: str, start_time: float, profile: bool = False
+) -> AudioAnalysisResponse:
+    """Build the response for decoded audio, reusing the cached result of identical audio"""
+    # Lexicon and model versions are part of the key so a reload never serves stale scores
+    key = audio_key(audio_data, sample_rate, model_type, lexicon.version, RESULT_CONFIG_VERSION)
+    async with profiler.profile("analyze", model_type, profile) as request_profile:
+        final_result, cache_status = await result_cache.get_or_compute(
+            key, functools.partial(analyze_decoded, audio_data, sample_rate, model_type), is_cacheable
+        )
+    final_result["cache"] = cache_status
+    if request_profile is not None:
+        final_result["profile"] = request_profile.id
+    
+    elapsed = time.time() - start_time
+    REQUEST_SECONDS.labels(model_type, cache_status).observe(elapsed)
+    latency_ms = int(elapsed * 1000)
+    
+    return AudioAnalysisResponse(
+        detection=final_result["detection"],
+        confidence=final_result["confidence"],
+        latency_ms=latency_ms,
+        model_used=final_result["model"],
+        reasoning=final_result["reasoning"],
+        metadata=final_result
+    )
+
+async def analyze_decoded(audio_data: np.ndarray, sample_rate: int, model_type: str) -> Dict:
+    """Run the requested analyzers on decoded audio"""
+    if model_type == "ensemble":
+        analyzers = ENSEMBLE_MEMBERS
+    elif model_type == "cascade":
+        # Only the first tier is prepared eagerly; later tiers fill the cache on demand
+        analyzers = CHEAP_ANALYZERS
+    else:
+        analyzers = (model_type,)
+    loadable = [name for name in analyzers if name in MODEL_LOADERS]
+    if model_type in ENSEMBLE_MEMBERS:
+        await registry.ensure(*loadable)
+    else:
+        # An unavailable member is dropped from the ensemble by run_ensemble_members
+        await registry.ensure_available(*loadable)
+    prepared = await inference.run("preprocess", prepare_window, audio_data, sample_rate, analyzers)
+    
+    results = []
+    WINDOWS_ANALYZED.labels("analyze").inc()
+    
+    if model_type in ENSEMBLE_MEMBERS:
+        results.append(await run_analyzer(model_type, prepared))
+    elif model_type == "ensemble":
+        # Run all models concurrently on the shared preprocessed window
+        with STAGE_SECONDS.labels("ensemble").time():
+            results, timed_out, unavailable = await run_ensemble_members(
+                prepared, ENSEMBLE_MEMBERS, config.ANALYZE_MEMBER_DEADLINES
+            )
+    elif model_type == "cascade":
+        with STAGE_SECONDS.labels("cascade").time():
+            results.append(await cascade_analysis(prepared, deadlines=config.ANALYZE_MEMBER_DEADLINES))
+    
+    # Get final result
+    if model_type == "ensemble":
+        final_result = partial_ensemble_analysis(results, timed_out, unavailable)
+    else:
+        final_result = results[0] if results else {
+            "detection": "unknown",
+            "confidence": 0.5,
+            "reasoning": "No analysis performed",
+            "model": model_type
+        }
+    
+    return final_result
+
+def decode_upload(body, encoding: str, sample_rate: int) -> tuple:
+    """Decode a raw or WAV request body straight from its buffer; returns (samples, sample_rate)"""
+    if encoding == "wav":
+        with STAGE_SECONDS.labels("codec_decode").time():
+            return decode_wav(body)
+    if encoding not in SUPPORTED_ENCODINGS:
+        raise ValueError(f"Unsupported encoding: {encoding}")
+    with STAGE_SECONDS.labels("codec_decode").time():
+        return decode_audio(body, encoding), sample_rate
+
 @app.post("/analyze", response_model=AudioAnalysisResponse)
-async def analyze_audio(request: AudioAnalysisRequest):
+async def analyze_audio(request: AudioAnalysisRequest, http_request: Request):
     """Analyze audio for AMD detection"""
     start_time = time.time()
     
     try:
-        # Decode base64 audio
-        import base64
-        audio_bytes = base64.b64decode(request.audio_data)
+        if request.encoding not in SUPPORTED_ENCODINGS:
+            raise HTTPException(status_code=400, detail=f"Unsupported encoding: {request.encoding}")
         
-        # Convert to numpy array (assuming 16-bit PCM)
-        audio_data = np.frombuffer(audio_bytes, dtype=np.int16).astype(np.float32) / 32767.0
+        # Decode base64 audio to float32 samples
+        with STAGE_SECONDS.labels("base64_decode").time():
+            audio_bytes = base64.b64decode(request.audio_data)
+        with STAGE_SECONDS.labels("codec_decode").time():
+            audio_data = decode_audio(audio_bytes, request.encoding)
         
-        results = []
+        return await run_analysis(
+            audio_data, request.sample_rate, request.model_type, start_time, profile_requested(http_request)
+        )
         
-        if request.model_type == "wav2vec2":
-            result = analyze_with_wav2vec2(audio_data, request.sample_rate)
-            results.append(result)
-        elif request.model_type == "whisper":
-            result = analyze_with_whisper(audio_data, request.sample_rate)
-            results.append(result)
-        elif request.model_type == "vad":
-            result = analyze_with_vad(audio_data, request.sample_rate)
-            results.append(result)
-        elif request.model_type == "ensemble":
-            # Run all models
-            results.append(analyze_with_wav2vec2(audio_data, request.sample_rate))
-            results.append(analyze_with_whisper(audio_data, request.sample_rate))
-            results.append(analyze_with_vad(audio_data, request.sample_rate))
+    except HTTPException:
+        raise
+    except ModelUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Analysis error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/analyze/raw", response_model=AudioAnalysisResponse)
+async def analyze_raw_audio(
+    request: Request,
+    x_audio_encoding: str = Header("pcm16"),  # pcm16, mulaw, alaw, wav
+    x_sample_rate: int = Header(8000),
+    x_model_type: str = Header("ensemble"),
+):
+    """Analyze a raw binary audio body (no base64/JSON wrapping)"""
+    start_time = time.time()
+    
+    try:
+        body = await request.body()
+        try:
+            audio_data, sample_rate = decode_upload(body, x_audio_encoding, x_sample_rate)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        # Get final result
-        if request.model_type == "ensemble":
-            final_result = ensemble_analysis(results)
-        else:
-            final_result = results[0] if results else {
-                "detection": "unknown",
-                "confidence": 0.5,
-                "reasoning": "No analysis performed",
-                "model": request.model_type
-            }
+        return await run_analysis(audio_data, sample_rate, x_model_type, start_time, profile_requested(request))
         
-        latency_ms = int((time.time() - start_time) * 1000)
+    except HTTPException:
+        raise
+    except ModelUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Raw analysis error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/analyze/upload", response_model=AudioAnalysisResponse)
+async def analyze_uploaded_audio(
+    request: Request,
+    file: UploadFile = File(...),
+    x_audio_encoding: str = Header("wav"),  # wav, pcm16, mulaw, alaw
+    x_sample_rate: int = Header(8000),
+    x_model_type: str = Header("ensemble"),
+):
+    """Analyze a multipart file upload (WAV by default)"""
+    start_time = time.time()
+    
+    try:
+        body = await file.read()
+        try:
+            audio_data, sample_rate = decode_upload(body, x_audio_encoding, x_sample_rate)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        return AudioAnalysisResponse(
+        return await run_analysis(audio_data, sample_rate, x_model_type, start_time, profile_requested(request))
+        
+    except HTTPException:
+        raise
+    except ModelUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Upload analysis error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+BATCH_MODEL_TYPES = ("wav2vec2", "whisper", "vad", "ensemble")
+
+def plan_batches(windows: List[PreparedAudio], max_size: int, budget_bytes: float) -> List[List[int]]:
+    """Group clips of similar length into padded batches within size and memory limits"""
+    order = sorted(range(len(windows)), key=lambda i: windows[i].duration)
+    batches, current = [], []
+    for i in order:
+        # Sorted by length, so this clip sets the padded length of the batch
+        padded_bytes = (len(current) + 1) * windows[i].duration * 16000 * 4
+        if current and (len(current) >= max_size or padded_bytes > budget_bytes):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+async def analyze_clip_batch(windows: List[PreparedAudio], model_type: str) -> List[Dict]:
+    """Run each requested model once over a whole padded batch of clips"""
+    members = ENSEMBLE_MEMBERS if model_type == "ensemble" else (model_type,)
+    WINDOWS_ANALYZED.labels("batch").inc(len(windows))
+    
+    async def run_member(name: str) -> List[Dict]:
+        try:
+            await registry.ensure(name)
+            if name == "wav2vec2":
+                results = await inference.run("wav2vec2", transcribe_wav2vec2_batch, windows)
+                return [wav2vec2_result(result) for result in results]
+            if name == "whisper":
+                results = await inference.run("whisper", transcribe_whisper_batch, windows)
+                return [whisper_result(result) for result in results]
+            return await inference.run("vad", analyze_with_vad_batch, windows)
+        except Exception as e:
+            logger.error(f"Batch {name} analysis error: {e}")
+            extra = {} if name == "vad" else {"transcription": ""}
+            return [analysis_failed(name, e, **extra) for _ in windows]
+    
+    member_results = await asyncio.gather(*(run_member(name) for name in members))
+    
+    final_results = []
+    for clip_results in zip(*member_results):
+        final_result = ensemble_analysis(list(clip_results)) if model_type == "ensemble" else clip_results[0]
+        final_result["batch_size"] = len(windows)
+        final_results.append(final_result)
+    return final_results
+
+@app.post("/analyze/batch")
+async def analyze_batch(request: BatchAnalysisRequest):
+    """Analyze many clips in one request, streaming one NDJSON result per clip"""
+    start_time = time.time()
+    
+    if request.model_type not in BATCH_MODEL_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported batch model_type: {request.model_type}")
+    
+    clip_ids = [clip.id if clip.id is not None else str(i) for i, clip in enumerate(request.clips)]
+    members = ENSEMBLE_MEMBERS if request.model_type == "ensemble" else (request.model_type,)
+    
+    async def prepare_clip(clip: BatchClip) -> PreparedAudio:
+        if clip.encoding not in SUPPORTED_ENCODINGS:
+            raise ValueError(f"Unsupported encoding: {clip.encoding}")
+        try:
+            audio_bytes = base64.b64decode(clip.audio_data, validate=True)
+        except binascii.Error as e:
+            raise ValueError(f"Invalid base64 audio_data: {e}")
+        audio_data = decode_audio(audio_bytes, clip.encoding)
+        if len(audio_data) == 0:
+            raise ValueError("Clip contains no audio")
+        return await inference.run("preprocess", prepare_window, audio_data, clip.sample_rate, members)
+    
+    def result_line(clip_id: str, final_result: Dict) -> str:
+        response = AudioAnalysisResponse(
             detection=final_result["detection"],
             confidence=final_result["confidence"],
-            latency_ms=latency_ms,
+            latency_ms=int((time.time() - start_time) * 1000),
             model_used=final_result["model"],
             reasoning=final_result["reasoning"],
             metadata=final_result
         )
+        return json.dumps({"id": clip_id, **response.model_dump()}) + "\n"
+    
+    async def stream_results():
+        prepared = await asyncio.gather(*(prepare_clip(clip) for clip in request.clips), return_exceptions=True)
         
-    except Exception as e:
-        logger.error(f"Analysis error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        ready = []
+        for i, window in enumerate(prepared):
+            if isinstance(window, Exception):
+                yield json.dumps({"id": clip_ids[i], "error": str(window)}) + "\n"
+            else:
+                ready.append(i)
+        
+        groups = plan_batches(
+            [prepared[i] for i in ready],
+            config.ANALYZE_BATCH_MAX_SIZE,
+            config.ANALYZE_BATCH_MEMORY_MB * 1024 * 1024
+        )
+        
+        async def run_group(group: List[int]):
+            indices = [ready[i] for i in group]
+            return indices, await analyze_clip_batch([prepared[i] for i in indices], request.model_type)
+        
+        # Emit each group's clips as soon as that group finishes
+        for finished in asyncio.as_completed([run_group(group) for group in groups]):
+            indices, results = await finished
+            for i, final_result in zip(indices, results):
+                yield result_line(clip_ids[i], final_result)
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+async def send_event(websocket: WebSocket, event: Dict):
+    """Send one JSON event to a stream client"""
+    with STAGE_SECONDS.labels("websocket_send").time():
+        await websocket.send_text(json.dumps(event))
+
+STREAM_OVERLOAD_POLICIES = ("coalesce", "skip", "degrade")
+if config.STREAM_OVERLOAD_POLICY not in STREAM_OVERLOAD_POLICIES:
+    raise ValueError(f"STREAM_OVERLOAD_POLICY must be one of {STREAM_OVERLOAD_POLICIES}")
+
+async def analyze_stream_window(audio: np.ndarray, sample_rate: int, model_type: str, degraded: bool = False) -> Dict:
+    """Ensemble or cascade decision for one stream window; VAD only when degraded"""
+    if degraded:
+        # Beeps were already reported per frame, so only VAD runs
+        prepared = await inference.run("preprocess", prepare_window, audio, sample_rate, ("vad",))
+        results, timed_out, unavailable = await run_ensemble_members(prepared, ("vad",))
+        return partial_ensemble_analysis(results, timed_out, unavailable)
+    if model_type == "cascade":
+        prepared = await inference.run("preprocess", prepare_window, audio, sample_rate, CHEAP_ANALYZERS)
+        with STAGE_SECONDS.labels("cascade").time():
+            return await cascade_analysis(prepared, ("whisper", "vad"))
+    prepared = await inference.run("preprocess", prepare_window, audio, sample_rate, ("whisper", "vad"))
+    with STAGE_SECONDS.labels("ensemble").time():
+        results, timed_out, unavailable = await run_ensemble_members(prepared, ("whisper", "vad"))
+        return partial_ensemble_analysis(results, timed_out, unavailable)
 
 @app.websocket("/stream/{call_sid}")
 async def websocket_stream(websocket: WebSocket, call_sid: str):
-    """WebSocket endpoint for real-time audio streaming"""
+    """WebSocket endpoint for real-time audio streaming
+    
+    This coroutine only receives, decodes and buffers audio (and reports
+    beeps); full windows go through a bounded queue to an analysis task, so
+    a slow model never stalls the socket. When the queue is full the
+    STREAM_OVERLOAD_POLICY decides which windows are dropped or degraded.
+    """
     await websocket.accept()
     
-    session_id = str(uuid.uuid4())
-    session = StreamSession(
-        session_id=session_id,
-        call_sid=call_sid,
-        model_type="ensemble"
-    )
-    active_sessions[session_id] = session
+    session = session_manager.open(call_sid, config.STREAM_MODEL_TYPE)
+    if session is None:
+        logger.warning(f"🚫 Rejected stream for {call_sid}: {len(session_manager)} sessions open")
+        await websocket.close(code=CLOSE_TRY_AGAIN_LATER, reason="Too many concurrent streams")
+        return
+    session_id = session.session_id
     
     logger.info(f"🔗 WebSocket session started: {session_id} for call: {call_sid}")
     
-    audio_buffer = []
     buffer_duration = 3.0  # seconds
     sample_rate = 8000
+    required_samples = int(buffer_duration * sample_rate)
+    # Holds one analysis window plus headroom for packets arriving in between
+    audio_buffer = AudioRingBuffer(2 * required_samples)
+    decode_frame = np.empty(1024, dtype=np.float32)  # Twilio sends 160-byte (20ms) frames
+    beep_detector = make_beep_detector(sample_rate)
+    profile_windows = profile_requested(websocket)
+    recorder = open_recorder(config.STREAM_RECORD_DIR, call_sid, config.STREAM_RECORD_SAMPLE_RATE)
+    policy = config.STREAM_OVERLOAD_POLICY
+    # (window, time it filled, stream position in ms, degraded); None ends the worker.
+    # The limit is enforced by enqueue_window, so the None sentinel always fits
+    windows: asyncio.Queue = asyncio.Queue()
+    queue_limit = max(1, config.STREAM_ANALYSIS_QUEUE)
+    send_lock = asyncio.Lock()
+    samples_received = 0
+    
+    async def send(event: Dict):
+        # Beep events (receiver) and results (worker) share the socket
+        async with send_lock:
+            await send_event(websocket, event)
+    
+    def enqueue_window(window: np.ndarray, stream_ms: float):
+        degraded = False
+        if windows.qsize() >= queue_limit:
+            if policy == "skip":
+                session.windows_dropped += 1
+                STREAM_WINDOWS_SHED.labels("skipped").inc()
+                return
+            windows.get_nowait()  # the oldest queued window is superseded by this one
+            session.windows_dropped += 1
+            STREAM_WINDOWS_SHED.labels("dropped").inc()
+            degraded = policy == "degrade"
+        windows.put_nowait((window, time.monotonic(), stream_ms, degraded))
+    
+    async def analysis_worker():
+        while True:
+            item = await windows.get()
+            if item is None:
+                return
+            window, ready_at, stream_ms, degraded = item
+            wait = time.monotonic() - ready_at
+            QUEUE_WAIT_SECONDS.labels("stream").observe(wait)
+            if policy == "degrade" and wait * 1000 > config.STREAM_DEGRADE_LAG_MS:
+                degraded = True
+            if degraded:
+                session.windows_degraded += 1
+                STREAM_WINDOWS_SHED.labels("degraded").inc()
+            
+            try:
+                async with profiler.profile("stream", call_sid, profile_windows) as request_profile:
+                    final_result = await analyze_stream_window(window, sample_rate, session.model_type, degraded)
+            except Exception as e:
+                logger.error(f"❌ Stream analysis error for {session_id}: {e}")
+                continue
+            
+            WINDOWS_ANALYZED.labels("stream").inc()
+            lag = time.monotonic() - ready_at
+            STREAM_LAG_SECONDS.observe(lag)
+            session.record(final_result["detection"], final_result["confidence"], lag * 1000)
+            
+            # Send result back
+            response = {
+                "event": "analysis_result",
+                "session_id": session_id,
+                "call_sid": call_sid,
+                "detection": final_result["detection"],
+                "confidence": final_result["confidence"],
+                "analysis_count": session.analysis_count,
+                "reasoning": final_result["reasoning"],
+                "stream_ms": stream_ms,
+                "lag_ms": lag * 1000
+            }
+            if degraded:
+                response["degraded"] = True
+            if "stages_run" in final_result:
+                response["stages_run"] = final_result["stages_run"]
+            if request_profile is not None:
+                response["profile"] = request_profile.id
+            
+            try:
+                await send(response)
+            except Exception as e:
+                # The receiver sees the worker has stopped and ends the session
+                logger.error(f"❌ Failed to send analysis result for {session_id}: {e}")
+                return
+            
+            logger.info(f"📊 Analysis {session.analysis_count}: {final_result['detection']} ({final_result['confidence']:.2f}, lag {lag * 1000:.0f}ms)")
+    
+    worker = asyncio.create_task(analysis_worker())
     
     try:
         while True:
             # Receive audio data
             data = await websocket.receive_text()
+            session.touch()
             message = json.loads(data)
             
+            if worker.done():
+                if worker.exception() is not None:
+                    logger.error(f"❌ Stream analysis task for {session_id} failed: {worker.exception()}")
+                await websocket.close(code=CLOSE_INTERNAL_ERROR, reason="Stream analysis stopped")
+                break
+            
             if message.get("event") == "media":
-                # Decode audio payload (base64 mulaw)
+                # Decode audio payload (base64 mulaw) into the session's scratch frame
                 payload = message["media"]["payload"]
-                audio_chunk = base64.b64decode(payload)
+                with STAGE_SECONDS.labels("base64_decode").time():
+                    audio_chunk = base64.b64decode(payload)
+                if recorder is not None:
+                    recorder.media(audio_chunk)
+                with STAGE_SECONDS.labels("codec_decode").time():
+                    linear_audio = decode_mulaw(audio_chunk, out=decode_frame)
+                samples_received += len(linear_audio)
                 
-                # Convert mulaw to linear PCM
-                audio_data = np.frombuffer(audio_chunk, dtype=np.uint8)
-                # Simple mulaw decode (for demo - use proper mulaw decoder in production)
-                linear_audio = ((audio_data.astype(np.float32) - 128) / 128.0)
+                # A voicemail beep is reported as soon as the tone ends, ahead of any model
+                if beep_detector is not None:
+                    with STAGE_SECONDS.labels("beep_detect").time():
+                        beeps = beep_detector.process(linear_audio)
+                    for beep in beeps:
+                        session.beeps_detected += 1
+                        session.last_detection = "machine"
+                        await send({
+                            "event": "beep_detected",
+                            "session_id": session_id,
+                            "call_sid": call_sid,
+                            "detection": "machine",
+                            "confidence": beep["confidence"],
+                            "reasoning": f"{beep['frequency']:.0f}Hz beep for {beep['duration_ms']:.0f}ms",
+                            "frequency": beep["frequency"],
+                            "duration_ms": beep["duration_ms"],
+                            "stream_ms": beep["end_ms"]
+                        })
+                        logger.info(f"🔔 Beep detected for {call_sid}: {beep['frequency']:.0f}Hz, {beep['duration_ms']:.0f}ms")
                 
-                audio_buffer.extend(linear_audio)
+                audio_buffer.append(linear_audio)
                 session.buffer_size = len(audio_buffer)
                 
-                # Analyze when we have enough audio
-                required_samples = int(buffer_duration * sample_rate)
+                # Hand a full window to the analysis task (copied: the buffer keeps moving)
                 if len(audio_buffer) >= required_samples:
-                    # Analyze the buffer
-                    analysis_audio = np.array(audio_buffer[:required_samples])
-                    
-                    # Run ensemble analysis
-                    results = []
-                    results.append(analyze_with_whisper(analysis_audio, sample_rate))
-                    results.append(analyze_with_vad(analysis_audio, sample_rate))
-                    
-                    final_result = ensemble_analysis(results)
-                    
-                    session.analysis_count += 1
-                    session.last_detection = final_result["detection"]
-                    session.confidence_scores.append(final_result["confidence"])
-                    
-                    # Send result back
-                    response = {
-                        "event": "analysis_result",
-                        "session_id": session_id,
-                        "call_sid": call_sid,
-                        "detection": final_result["detection"],
-                        "confidence": final_result["confidence"],
-                        "analysis_count": session.analysis_count,
-                        "reasoning": final_result["reasoning"]
-                    }
-                    
-                    await websocket.send_text(json.dumps(response))
-                    
-                    # Clear processed audio from buffer
-                    audio_buffer = audio_buffer[required_samples//2:]  # 50% overlap
-                    
-                    logger.info(f"📊 Analysis {session.analysis_count}: {final_result['detection']} ({final_result['confidence']:.2f})")
+                    window_end_ms = (samples_received - len(audio_buffer) + required_samples) * 1000 / sample_rate
+                    enqueue_window(audio_buffer.window(required_samples).copy(), window_end_ms)
+                    audio_buffer.consume(required_samples // 2)  # 50% overlap
             
             elif message.get("event") == "stop":
                 logger.info(f"🛑 Stream stopped for session: {session_id}")
+                if recorder is not None:
+                    recorder.stop()
+                # Let the worker finish the windows already queued, then close normally
+                windows.put_nowait(None)
+                await worker
+                await websocket.close()
                 break
                 
     except WebSocketDisconnect:
         logger.info(f"🔌 WebSocket disconnected: {session_id}")
+    except asyncio.CancelledError:
+        if session.evicted is None:
+            raise
+        logger.info(f"⏱️ Session {session_id} evicted: {session.evicted}")
+        await websocket.close(code=CLOSE_GOING_AWAY, reason=session.evicted)
     except Exception as e:
         logger.error(f"❌ WebSocket error: {e}")
     finally:
-        if session_id in active_sessions:
-            del active_sessions[session_id]
+        worker.cancel()
+        session_manager.close(session)
+        if recorder is not None:
+            recorder.close()
+            logger.info(f"📼 Recorded {recorder.frames} frames to {recorder.path}")
         logger.info(f"🧹 Cleaned up session: {session_id}")
 
 @app.get("/sessions")
-async def list_sessions():
-    """List active streaming sessions"""
+async def list_sessions(limit: Optional[int] = None):
+    """List active streaming sessions (the oldest `limit` when given)"""
     return {
-        "active_sessions": len(active_sessions),
-        "sessions": [
-            {
-                "session_id": session.session_id,
-                "call_sid": session.call_sid,
-                "buffer_size": session.buffer_size,
-                "analysis_count": session.analysis_count,
-                "last_detection": session.last_detection
-            }
-            for session in active_sessions.values()
-        ]
+        "active_sessions": len(session_manager),
+        "stats": session_manager.stats(),
+        "sessions": session_manager.snapshot(limit)
     }
 
 if __name__ == "__main__":
@@ -8,15 +8,23 @@ import json
 import logging
 import time
 from typing import Dict, List, Optional
-import uuid
 import base64
 
 import numpy as np
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import uvicorn
 
+import config
+from codec import SUPPORTED_ENCODINGS, decode_audio
+from metrics import (
+    ACTIVE_SESSIONS, ANALYZER_SECONDS, CONTENT_TYPE, REGISTRY, REQUEST_SECONDS, STAGE_SECONDS, WINDOWS_ANALYZED,
+)
+from session_recorder import open_recorder
+from sessions import CLOSE_GOING_AWAY, CLOSE_TRY_AGAIN_LATER, SessionManager
+from tone_detector import ToneDetector
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -26,6 +34,7 @@ class AudioAnalysisRequest(BaseModel):
     audio_data: str  # base64 encoded
     sample_rate: int = 8000
     model_type: str = "ensemble"
+    encoding: str = "mulaw"  # mulaw, alaw, pcm16
 
 class AudioAnalysisResponse(BaseModel):
     detection: str  # human, machine, unknown
@@ -39,10 +48,17 @@ class HealthResponse(BaseModel):
     status: str
     models_loaded: int
     active_sessions: int
+    sessions: Dict
     timestamp: int
 
 # Global state
-active_sessions: Dict[str, Dict] = {}
+session_manager = SessionManager(
+    max_sessions=config.MAX_STREAM_SESSIONS,
+    idle_timeout=config.SESSION_IDLE_TIMEOUT_SECONDS,
+    max_duration=config.SESSION_MAX_DURATION_SECONDS,
+    history=config.SESSION_HISTORY,
+)
+ACTIVE_SESSIONS.set_function(lambda: len(session_manager))
 app = FastAPI(title="FastAPI AMD Service", version="1.0.0")
 
 # CORS middleware
@@ -54,6 +70,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def make_beep_detector(sample_rate: int) -> Optional[ToneDetector]:
+    """Beep detector with the configured thresholds, or None when disabled"""
+    if not config.BEEP_DETECTION:
+        return None
+    return ToneDetector(
+        sample_rate,
+        threshold=config.BEEP_THRESHOLD,
+        min_duration_ms=config.BEEP_MIN_MS,
+        max_duration_ms=config.BEEP_MAX_MS,
+        min_level_db=config.BEEP_MIN_LEVEL_DB,
+    )
+
 class SimpleAMDAnalyzer:
     """Simple AMD analyzer using basic heuristics"""
     
@@ -61,17 +89,33 @@ class SimpleAMDAnalyzer:
         self.models_loaded = 3  # Simulated models
         logger.info("SimpleAMDAnalyzer initialized")
     
-    def analyze_audio_data(self, audio_data: bytes, sample_rate: int = 8000) -> Dict:
-        """Analyze audio data using simple heuristics"""
+    def analyze_audio_data(
+        self, audio_data: bytes, sample_rate: int = 8000, encoding: str = "mulaw", detect_beeps: bool = True
+    ) -> Dict:
+        """Analyze audio data using simple heuristics
+
+        Streams pass detect_beeps=False: their beeps were already reported
+        frame by frame, and would otherwise count twice.
+        """
         start_time = time.time()
         
-        # Convert to numpy array (assuming mulaw format from Twilio)
+        # Decode to linear PCM (Twilio sends mulaw)
         try:
-            # Simple analysis based on audio characteristics
-            audio_length = len(audio_data)
+            with STAGE_SECONDS.labels("codec_decode").time():
+                samples = decode_audio(audio_data, encoding)
+            audio_length = len(samples)
+            beep_detector = make_beep_detector(sample_rate) if detect_beeps else None
+            beeps = []
+            if beep_detector is not None:
+                with STAGE_SECONDS.labels("beep_detect").time():
+                    beeps = beep_detector.detect(samples)
             
             # Basic heuristics
-            if audio_length < 1000:  # Very short audio
+            if beeps:
+                detection = "machine"
+                confidence = beeps[0]["confidence"]
+                reasoning = f"Beep tone detected ({beeps[0]['frequency']:.0f}Hz, {beeps[0]['duration_ms']:.0f}ms)"
+            elif audio_length < 1000:  # Very short audio
                 detection = "unknown"
                 confidence = 0.3
                 reasoning = "Audio too short for reliable analysis"
@@ -82,7 +126,7 @@ class SimpleAMDAnalyzer:
             else:
                 # Medium length - analyze pattern
                 # Simple pattern analysis (placeholder for real ML)
-                pattern_score = self._analyze_pattern(audio_data)
+                pattern_score = self._analyze_pattern(samples, sample_rate)
                 
                 if pattern_score > 0.7:
                     detection = "human"
@@ -97,7 +141,9 @@ class SimpleAMDAnalyzer:
                     confidence = 0.5
                     reasoning = "Ambiguous audio patterns"
             
-            latency_ms = int((time.time() - start_time) * 1000)
+            elapsed = time.time() - start_time
+            ANALYZER_SECONDS.labels("simple_heuristic").observe(elapsed)
+            latency_ms = int(elapsed * 1000)
             
             return {
                 "detection": detection,
@@ -123,21 +169,23 @@ class SimpleAMDAnalyzer:
                 "metadata": {"error": str(e)}
             }
     
-    def _analyze_pattern(self, audio_data: bytes) -> float:
-        """Simple pattern analysis"""
+    def _analyze_pattern(self, samples: np.ndarray, sample_rate: int = 8000) -> float:
+        """Simple pattern analysis on decoded linear PCM"""
         try:
-            # Convert bytes to simple numeric analysis
-            data_array = np.frombuffer(audio_data, dtype=np.uint8)
-            
-            # Calculate basic statistics
-            mean_val = np.mean(data_array)
-            std_val = np.std(data_array)
+            # Frame energy over 20ms frames
+            frame_size = max(1, sample_rate // 50)
+            n_frames = len(samples) // frame_size
+            if n_frames < 2:
+                return 0.5
+            frames = samples[:n_frames * frame_size].reshape(n_frames, frame_size)
+            energy = np.sqrt(np.mean(frames * frames, axis=1))
             
-            # Simple heuristic: higher variation suggests human speech
-            variation_score = std_val / (mean_val + 1)  # Avoid division by zero
+            # Simple heuristic: speech energy rises and falls with syllables,
+            # while tones, beeps and line noise stay flat
+            variation_score = np.std(energy) / (np.mean(energy) + 1e-6)
             
             # Normalize to 0-1 range
-            pattern_score = min(1.0, variation_score / 50.0)
+            pattern_score = float(min(1.0, variation_score / 1.2))
             
             return pattern_score
             
@@ -154,10 +202,16 @@ async def health_check():
     return HealthResponse(
         status="healthy",
         models_loaded=analyzer.models_loaded,
-        active_sessions=len(active_sessions),
+        active_sessions=len(session_manager),
+        sessions=session_manager.stats(),
         timestamp=int(time.time())
     )
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Per-stage latency histograms and session gauges (Prometheus format)"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 @app.get("/models")
 async def get_models():
     """Get available models"""
@@ -174,30 +228,47 @@ async def get_models():
 async def analyze_audio(request: AudioAnalysisRequest):
     """Analyze audio for AMD"""
     try:
+        if request.encoding not in SUPPORTED_ENCODINGS:
+            raise HTTPException(status_code=400, detail=f"Unsupported encoding: {request.encoding}")
+        
+        start_time = time.time()
+        
         # Decode base64 audio data
-        audio_data = base64.b64decode(request.audio_data)
+        with STAGE_SECONDS.labels("base64_decode").time():
+            audio_data = base64.b64decode(request.audio_data)
         
         # Analyze audio
-        result = analyzer.analyze_audio_data(audio_data, request.sample_rate)
+        result = analyzer.analyze_audio_data(audio_data, request.sample_rate, request.encoding)
+        WINDOWS_ANALYZED.labels("analyze").inc()
+        REQUEST_SECONDS.labels("simple_heuristic", "none").observe(time.time() - start_time)
         
         return AudioAnalysisResponse(**result)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Analysis endpoint error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def send_event(websocket: WebSocket, event: Dict):
+    """Send one JSON event to a stream client"""
+    with STAGE_SECONDS.labels("websocket_send").time():
+        await websocket.send_text(json.dumps(event))
+
 @app.websocket("/stream/{call_sid}")
 async def websocket_stream(websocket: WebSocket, call_sid: str):
     """WebSocket endpoint for real-time audio streaming"""
     await websocket.accept()
     
-    session_id = str(uuid.uuid4())
-    active_sessions[session_id] = {
-        "call_sid": call_sid,
-        "websocket": websocket,
-        "start_time": time.time(),
-        "audio_buffer": bytearray()
-    }
+    session = session_manager.open(call_sid, "simple_heuristic")
+    if session is None:
+        logger.warning(f"Rejected stream for {call_sid}: {len(session_manager)} sessions open")
+        await websocket.close(code=CLOSE_TRY_AGAIN_LATER, reason="Too many concurrent streams")
+        return
+    session_id = session.session_id
+    audio_buffer = bytearray()
+    beep_detector = make_beep_detector(8000)
+    recorder = open_recorder(config.STREAM_RECORD_DIR, call_sid, config.STREAM_RECORD_SAMPLE_RATE)
     
     logger.info(f"WebSocket session started: {session_id} for call {call_sid}")
     
@@ -205,25 +276,48 @@ async def websocket_stream(websocket: WebSocket, call_sid: str):
         while True:
             # Receive message from client
             data = await websocket.receive_text()
+            session.touch()
             message = json.loads(data)
             
             if message.get("event") == "media":
                 # Process media data
                 media_payload = message.get("media", {}).get("payload", "")
-                audio_chunk = base64.b64decode(media_payload)
+                with STAGE_SECONDS.labels("base64_decode").time():
+                    audio_chunk = base64.b64decode(media_payload)
+                if recorder is not None:
+                    recorder.media(audio_chunk)
+                
+                # Beeps are checked on every frame rather than once per buffer
+                if beep_detector is not None:
+                    with STAGE_SECONDS.labels("codec_decode").time():
+                        linear_audio = decode_audio(audio_chunk, "mulaw")
+                    with STAGE_SECONDS.labels("beep_detect").time():
+                        beeps = beep_detector.process(linear_audio)
+                    for beep in beeps:
+                        session.beeps_detected += 1
+                        await send_event(websocket, {
+                            "event": "beep_detected",
+                            "session_id": session_id,
+                            "call_sid": call_sid,
+                            "detection": "machine",
+                            "confidence": beep["confidence"],
+                            "reasoning": f"{beep['frequency']:.0f}Hz beep for {beep['duration_ms']:.0f}ms",
+                            "frequency": beep["frequency"],
+                            "duration_ms": beep["duration_ms"],
+                            "stream_ms": beep["end_ms"]
+                        })
+                        logger.info(f"Beep detected for {call_sid}: {beep['frequency']:.0f}Hz, {beep['duration_ms']:.0f}ms")
                 
                 # Add to buffer
-                active_sessions[session_id]["audio_buffer"].extend(audio_chunk)
+                audio_buffer.extend(audio_chunk)
+                session.buffer_size = len(audio_buffer)
                 
                 # Analyze if buffer is large enough
-                buffer_size = len(active_sessions[session_id]["audio_buffer"])
-                if buffer_size > 3000:  # ~3 seconds of audio at 8kHz
+                if session.buffer_size > 3000:  # ~3 seconds of audio at 8kHz
                     
                     # Analyze accumulated audio
-                    result = analyzer.analyze_audio_data(
-                        bytes(active_sessions[session_id]["audio_buffer"]), 
-                        8000
-                    )
+                    result = analyzer.analyze_audio_data(bytes(audio_buffer), 8000, detect_beeps=False)
+                    session.record(result["detection"], result["confidence"])
                     
                     # Send result back
                     response = {
@@ -233,35 +327,42 @@ async def websocket_stream(websocket: WebSocket, call_sid: str):
                         **result
                     }
                     
-                    await websocket.send_text(json.dumps(response))
+                    WINDOWS_ANALYZED.labels("stream").inc()
+                    await send_event(websocket, response)
                     
                     # Clear buffer after analysis
-                    active_sessions[session_id]["audio_buffer"] = bytearray()
+                    audio_buffer.clear()
                     
                     logger.info(f"Analysis sent for {call_sid}: {result['detection']} ({result['confidence']})")
             
+            elif message.get("event") == "stop" and recorder is not None:
+                recorder.stop()
+            
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected: {session_id}")
+    except asyncio.CancelledError:
+        if session.evicted is None:
+            raise
+        logger.info(f"Session {session_id} evicted: {session.evicted}")
+        await websocket.close(code=CLOSE_GOING_AWAY, reason=session.evicted)
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
     finally:
         # Cleanup
-        if session_id in active_sessions:
-            del active_sessions[session_id]
+        session_manager.close(session)
+        if recorder is not None:
+            recorder.close()
+            logger.info(f"Recorded {recorder.frames} frames to {recorder.path}")
 
 @app.get("/sessions")
-async def get_sessions():
-    """Get active streaming sessions"""
-    sessions = []
-    for session_id, session_data in active_sessions.items():
-        sessions.append({
-            "session_id": session_id,
-            "call_sid": session_data["call_sid"],
-            "duration": time.time() - session_data["start_time"],
-            "buffer_size": len(session_data["audio_buffer"])
-        })
-    
-    return {"sessions": sessions, "total": len(sessions)}
+async def get_sessions(limit: Optional[int] = None):
+    """Get active streaming sessions (the oldest `limit` when given)"""
+    return {"sessions": session_manager.snapshot(limit), "total": len(session_manager), "stats": session_manager.stats()}
+
+@app.on_event("shutdown")
+async def stop_session_manager():
+    """Stop the idle-session sweep on shutdown"""
+    await session_manager.stop()
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -0,0 +1,263 @@
+"""
+Prometheus metrics
+Dependency-free counters, gauges and histograms for the per-stage pipeline
+timings, rendered in the Prometheus text exposition format on GET /metrics
+"""
+
+import bisect
+import math
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans a single 20ms-frame decode up to a slow 30s Whisper pass
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+INF_BUCKET = 'le="+Inf"'
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+        (REGISTRY if registry is None else registry).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **labels):
+        """Child series for one combination of label values"""
+        if labels:
+            values = tuple(labels[name] for name in self.labelnames)
+        key = tuple(str(value) for value in values)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _Value:
+    def __init__(self, lock: threading.Lock):
+        self._lock = lock
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = float(value)
+
+
+class Counter(_Metric):
+    """Monotonic count; Prometheus derives per-second rates from it"""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value(self._lock)
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _samples(self):
+        for key, child in list(self._children.items()):
+            yield f"{self.name}_total{_label_text(self.labelnames, key)} {_format_value(child.value)}"
+
+
+class Gauge(_Metric):
+    """Current value, set directly or read from a callback at scrape time
+
+    The callback returns a number, or for a labeled gauge a dict mapping
+    label value tuples to numbers.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._function: Optional[Callable] = None
+
+    def _new_child(self):
+        return _Value(self._lock)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def set_function(self, function: Callable):
+        self._function = function
+
+    def _samples(self):
+        if self._function is not None:
+            try:
+                values = self._function()
+            except Exception:
+                return
+            if not isinstance(values, dict):
+                values = {(): values}
+            series = [(tuple(str(v) for v in key), value) for key, value in values.items()]
+        else:
+            series = [(key, child.value) for key, child in list(self._children.items())]
+        for key, value in series:
+            yield f"{self.name}{_label_text(self.labelnames, key)} {_format_value(value)}"
+
+
+class _HistogramChild:
+    def __init__(self, lock: threading.Lock, buckets: Sequence[float]):
+        self._lock = lock
+        self._buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            if index < len(self.counts):
+                self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observed values (latencies in seconds)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self._lock, self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _samples(self):
+        for key, child in list(self._children.items()):
+            with self._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _label_text(self.labelnames, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_bucket{_label_text(self.labelnames, key, INF_BUCKET)} {count}"
+            yield f"{self.name}_sum{_label_text(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_label_text(self.labelnames, key)} {count}"
+
+
+class Registry:
+    """Metrics rendered together by one /metrics endpoint"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric):
+        if any(existing.name == metric.name for existing in self._metrics):
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def _resident_memory_bytes() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is the peak, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+# Pipeline metrics shared by both services. Stages recorded inside executor
+# worker processes (INFERENCE_EXECUTOR=process) stay in those processes.
+STAGE_SECONDS = Histogram(
+    "amd_stage_seconds",
+    "Time spent per pipeline stage (base64_decode, codec_decode, resample, log_mel, "
+    "beep_detect, ensemble, cascade, websocket_send)",
+    ["stage"],
+)
+ANALYZER_SECONDS = Histogram("amd_analyzer_seconds", "Wall time of each analyzer per window", ["analyzer"])
+QUEUE_WAIT_SECONDS = Histogram(
+    "amd_queue_wait_seconds", "Time a job waits for a worker pool slot or a micro-batch", ["queue"]
+)
+REQUEST_SECONDS = Histogram(
+    "amd_request_seconds", "End-to-end /analyze latency by model type and cache outcome", ["model_type", "cache"]
+)
+WINDOWS_ANALYZED = Counter("amd_windows_analyzed", "Analysis windows run through the models", ["source"])
+STREAM_LAG_SECONDS = Histogram(
+    "amd_stream_window_lag_seconds", "Time from a stream window filling up to its result being sent"
+)
+STREAM_WINDOWS_SHED = Counter(
+    "amd_stream_windows_shed", "Stream windows dropped, skipped or analyzed VAD-only under overload", ["action"]
+)
+ACTIVE_SESSIONS = Gauge("amd_active_sessions", "Open WebSocket streaming sessions")
+MODEL_MEMORY_BYTES = Gauge("amd_model_memory_bytes", "Serialized weight size of each loaded model", ["model"])
+PROCESS_MEMORY_BYTES = Gauge("amd_process_resident_memory_bytes", "Resident memory of this process")
+PROCESS_MEMORY_BYTES.set_function(_resident_memory_bytes)
@@ -0,0 +1,145 @@
+"""
+Model registry
+Loads models on first use (or in a background preload), each at most once and
+concurrently with the others, and tracks per-model load state for readiness
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LOADING = "loading"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+
+
+class ModelUnavailable(RuntimeError):
+    """A model failed to load, or is waiting out the backoff before its next attempt"""
+
+
+class ModelEntry:
+    """Load state of one registered model"""
+
+    def __init__(self, name: str, load: Callable[[], Awaitable], warmup: Optional[Callable[[], Awaitable]] = None):
+        self.name = name
+        self.load = load
+        self.warmup = warmup
+        self.state = PENDING
+        self.error: Optional[str] = None
+        self.load_ms: Optional[float] = None
+        self.warmup_ms: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.failures = 0
+        self.retry_at = 0.0  # time.monotonic() of the next load attempt after a failure
+
+    def status(self) -> Dict:
+        return {
+            "state": self.state,
+            "load_ms": self.load_ms,
+            "warmup_ms": self.warmup_ms,
+            "error": self.error,
+            "failures": self.failures,
+            "retry_in_s": max(0.0, self.retry_at - time.monotonic()) if self.state == FAILED else None,
+        }
+
+
+class ModelRegistry:
+    """Single-flight, on-demand model loading
+
+    `ensure(*names)` starts any model that is not loaded yet and waits for all
+    of them; concurrent callers share one load per model. A failed load raises
+    ModelUnavailable and is retried by the first caller after a backoff that
+    doubles with each consecutive failure (`retry_seconds` up to
+    `max_retry_seconds`); until then callers get ModelUnavailable at once.
+    """
+
+    def __init__(self, warmup: bool = True, retry_seconds: float = 5.0, max_retry_seconds: float = 300.0):
+        self.entries: Dict[str, ModelEntry] = {}
+        self.warmup = warmup
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+
+    def register(self, name: str, load: Callable[[], Awaitable], warmup: Optional[Callable[[], Awaitable]] = None):
+        self.entries[name] = ModelEntry(name, load, warmup)
+
+    def mark_ready(self, name: str):
+        """Record a model that was loaded outside the registry (tools, worker processes)"""
+        entry = self.entries.get(name)
+        if entry is not None:
+            entry.state = READY
+
+    def is_ready(self, name: str) -> bool:
+        entry = self.entries.get(name)
+        return entry is not None and entry.state == READY
+
+    def all_ready(self, names: Iterable[str]) -> bool:
+        return all(self.is_ready(name) for name in names)
+
+    def _start(self, name: str) -> asyncio.Task:
+        entry = self.entries.get(name)
+        if entry is None:
+            raise KeyError(f"Unknown model: {name}")
+        if entry.task is not None and entry.task.done() and entry.state == FAILED:
+            if time.monotonic() < entry.retry_at:
+                raise ModelUnavailable(f"{name} unavailable: {entry.error}")
+            entry.task = None
+        if entry.task is None:
+            entry.task = asyncio.ensure_future(self._load(entry))
+        return entry.task
+
+    async def _load(self, entry: ModelEntry):
+        entry.state = LOADING
+        entry.error = None
+        start = time.perf_counter()
+        try:
+            await entry.load()
+            entry.load_ms = (time.perf_counter() - start) * 1000
+            logger.info(f"✅ {entry.name} loaded in {entry.load_ms:.0f}ms")
+
+            if self.warmup and entry.warmup is not None:
+                entry.state = WARMING
+                start = time.perf_counter()
+                await entry.warmup()
+                entry.warmup_ms = (time.perf_counter() - start) * 1000
+                logger.info(f"🔥 {entry.name} warmed up in {entry.warmup_ms:.0f}ms")
+        except Exception as e:
+            entry.state = FAILED
+            entry.error = str(e)
+            entry.failures += 1
+            backoff = min(self.retry_seconds * 2 ** (entry.failures - 1), self.max_retry_seconds)
+            entry.retry_at = time.monotonic() + backoff
+            logger.error(f"❌ Error loading {entry.name} (retry in {backoff:.0f}s): {e}")
+            raise ModelUnavailable(f"{entry.name} unavailable: {e}") from e
+        entry.failures = 0
+        entry.state = READY
+
+    async def ensure(self, *names: str):
+        """Wait until every named model is loaded, starting any that are not"""
+        pending = [self._start(name) for name in names if not self.is_ready(name)]
+        if pending:
+            # Shield so a cancelled request does not abort a load others are waiting on
+            await asyncio.gather(*(asyncio.shield(task) for task in pending))
+
+    async def ensure_available(self, *names: str) -> List[str]:
+        """Like ensure, but returns the models that are unavailable instead of raising"""
+        outcomes = await asyncio.gather(*(self.ensure(name) for name in names), return_exceptions=True)
+        unavailable = []
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, ModelUnavailable):
+                unavailable.append(name)
+            elif isinstance(outcome, BaseException):
+                raise outcome
+        return unavailable
+
+    def preload(self, names: Iterable[str]) -> asyncio.Future:
+        """Start loading the named models that are not ready yet in the background, all at once"""
+        tasks = [self._start(name) for name in names if not self.is_ready(name)]
+        return asyncio.gather(*tasks, return_exceptions=True)
+
+    def status(self) -> Dict[str, Dict]:
+        return {name: entry.status() for name, entry in self.entries.items()}
@@ -0,0 +1,163 @@
+"""
+Local model artifact store
+Versioned snapshots of every model as safetensors, loaded by memory-mapping
+the weights with no network access
+
+Layout:
+    <root>/<version>/manifest.json
+    <root>/<version>/<model>/...      one directory per model
+    <root>/LATEST                     name of the newest complete version
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import asdict
+from typing import Dict, Iterable, Optional
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+STORE_MODELS = ("wav2vec2", "whisper")
+MANIFEST = "manifest.json"
+LATEST = "LATEST"
+
+WAV2VEC2_WEIGHTS = "model.safetensors"  # as written by save_pretrained
+WHISPER_WEIGHTS = "model.safetensors"
+WHISPER_DIMS = "dims.json"
+
+
+def resolve_version(root: str, version: str = "latest") -> str:
+    """Directory of a store version; "latest" follows the LATEST pointer"""
+    if version == "latest":
+        try:
+            with open(os.path.join(root, LATEST)) as pointer:
+                version = pointer.read().strip()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Model store {root} has no {LATEST} pointer; run tools.export_models first")
+    path = os.path.join(root, version)
+    if not os.path.isfile(os.path.join(path, MANIFEST)):
+        raise FileNotFoundError(f"Model store version {path} is missing or incomplete")
+    return path
+
+
+def read_manifest(version_dir: str) -> Dict:
+    with open(os.path.join(version_dir, MANIFEST)) as f:
+        return json.load(f)
+
+
+def artifact_path(version_dir: str, name: str) -> str:
+    """Directory of one model in a store version, checked against the manifest"""
+    entry = read_manifest(version_dir)["models"].get(name)
+    if entry is None:
+        raise FileNotFoundError(f"Model {name} is not in store version {version_dir}")
+    path = os.path.join(version_dir, name)
+    for filename, info in entry["files"].items():
+        file_path = os.path.join(path, filename)
+        # Size check is cheap enough for every startup; hashes are checked by --verify
+        if not os.path.isfile(file_path) or os.path.getsize(file_path) != info["size"]:
+            raise FileNotFoundError(f"Model artifact {file_path} is missing or truncated")
+    return path
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def describe_files(path: str) -> Dict[str, Dict]:
+    """Size and sha256 of every file under a model directory"""
+    files = {}
+    for directory, _, names in os.walk(path):
+        for name in sorted(names):
+            file_path = os.path.join(directory, name)
+            files[os.path.relpath(file_path, path)] = {"size": os.path.getsize(file_path), "sha256": _sha256(file_path)}
+    return files
+
+
+def verify(version_dir: str, names: Optional[Iterable[str]] = None) -> Dict[str, bool]:
+    """Re-hash every artifact file and compare with the manifest"""
+    manifest = read_manifest(version_dir)
+    results = {}
+    for name in names or manifest["models"]:
+        expected = manifest["models"][name]["files"]
+        actual = describe_files(os.path.join(version_dir, name))
+        results[name] = actual == expected
+    return results
+
+
+def write_manifest(version_dir: str, sources: Dict[str, str]):
+    """Record the source and file hashes of every exported model"""
+    manifest = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "torch": torch.__version__,
+        "models": {
+            name: {"source": source, "files": describe_files(os.path.join(version_dir, name))}
+            for name, source in sources.items()
+        },
+    }
+    with open(os.path.join(version_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def save_whisper(model, path: str, alignment_heads: Optional[bytes] = None):
+    """Write a Whisper model as dims.json plus a safetensors weight file"""
+    from safetensors.torch import save_file
+
+    os.makedirs(path, exist_ok=True)
+    meta = {"dims": asdict(model.dims)}
+    if alignment_heads is not None:
+        meta["alignment_heads"] = alignment_heads.decode("ascii")
+    with open(os.path.join(path, WHISPER_DIMS), "w") as f:
+        json.dump(meta, f, indent=2, sort_keys=True)
+    state = {name: tensor.detach().cpu().contiguous() for name, tensor in model.state_dict().items()}
+    save_file(state, os.path.join(path, WHISPER_WEIGHTS))
+
+
+def load_whisper(path: str, device: Optional[str] = None):
+    """Load a stored Whisper model with its weights memory-mapped from disk
+
+    On CPU the parameters stay backed by the file's page cache, so several
+    processes loading the same version share one copy of the weights.
+    """
+    from safetensors.torch import load_file
+    from whisper.model import ModelDimensions, Whisper
+
+    with open(os.path.join(path, WHISPER_DIMS)) as f:
+        meta = json.load(f)
+    model = Whisper(ModelDimensions(**meta["dims"]))
+    model.load_state_dict(load_file(os.path.join(path, WHISPER_WEIGHTS)), assign=True)
+    if meta.get("alignment_heads"):
+        model.set_alignment_heads(meta["alignment_heads"].encode("ascii"))
+    device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+    return model.to(device).eval()
+
+
+def load_wav2vec2(path: str):
+    """Load a stored Wav2Vec2ForCTC with its weights memory-mapped from disk, like load_whisper
+
+    The model is built on the meta device from its config, so no memory is
+    allocated for initial weights that would be overwritten. A store written
+    with parameter names this transformers version does not use is loaded
+    with from_pretrained, which renames them but copies the weights.
+    """
+    from safetensors.torch import load_file
+    from transformers import Wav2Vec2Config, Wav2Vec2ForCTC
+
+    config = Wav2Vec2Config.from_pretrained(path)
+    with torch.device("meta"):
+        model = Wav2Vec2ForCTC(config)
+    try:
+        model.load_state_dict(load_file(os.path.join(path, WAV2VEC2_WEIGHTS)), assign=True)
+        if any(tensor.is_meta for tensor in model.state_dict(keep_vars=True).values()):
+            raise RuntimeError("some parameters or buffers are not in the weight file")
+    except RuntimeError as e:
+        logger.warning(f"Loading {path} with from_pretrained, its weights do not map directly: {e}")
+        return Wav2Vec2ForCTC.from_pretrained(path, local_files_only=True).eval()
+    return model.eval()
@@ -0,0 +1,168 @@
+"""
+ONNX Runtime inference backend
+Runs the Wav2Vec2-CTC encoder and the short-window Whisper decode on graphs
+written by tools.export_onnx, in place of the eager PyTorch models
+"""
+
+import json
+import os
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+from whisper.model import ModelDimensions
+
+import whisper_fast
+from acoustic_head import mean_pool
+
+try:
+    import onnxruntime as ort
+except ImportError:  # optional: only needed with WAV2VEC2_BACKEND / WHISPER_BACKEND = onnx
+    ort = None
+
+BACKENDS = ("torch", "onnx")
+GRAPH_OPTIMIZATIONS = ("disable", "basic", "extended", "all")
+METADATA = "config.json"
+
+
+def graph_path(directory: str, name: str, precision: str = "fp32") -> str:
+    """<directory>/<name>.onnx, or <name>.int8.onnx for the dynamically quantized graph"""
+    return os.path.join(directory, f"{name}.onnx" if precision == "fp32" else f"{name}.{precision}.onnx")
+
+
+def read_metadata(directory: str) -> dict:
+    with open(os.path.join(directory, METADATA)) as f:
+        return json.load(f)
+
+
+def check_graph(path: str, optimization: str = "all"):
+    """Fail at load time, not on first use, when the backend cannot run the graph"""
+    if ort is None:
+        raise ImportError("The onnx backend needs onnxruntime (pip install onnxruntime)")
+    if optimization not in GRAPH_OPTIMIZATIONS:
+        raise ValueError(f"Unsupported graph optimization: {optimization} (expected one of {', '.join(GRAPH_OPTIMIZATIONS)})")
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"{path} not found; export it with python -m tools.export_onnx")
+
+
+def create_session(path: str, threads: int = 0, optimization: str = "all"):
+    """CPU inference session with the given graph optimization level and intra-op threads (0 = ORT default)"""
+    options = ort.SessionOptions()
+    options.graph_optimization_level = {
+        "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+        "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+        "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+        "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+    }[optimization]
+    # One graph node at a time; the intra-op pool parallelizes inside each node
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.inter_op_num_threads = 1
+    if threads > 0:
+        options.intra_op_num_threads = threads
+    return ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+class OnnxModel:
+    """Graphs of one exported model, with sessions opened on first use
+
+    A process forked from one that already has ONNX Runtime sessions cannot
+    open new ones, so serve.py's parent, which loads models but never runs
+    them, opens none and each worker opens its own.
+    """
+
+    def __init__(self, directory: str, names: Sequence[str], precision: str, threads: int, optimization: str):
+        self.metadata = read_metadata(directory)
+        self.source = self.metadata["source"]
+        self.paths = [graph_path(directory, name, precision) for name in names]
+        for path in self.paths:
+            check_graph(path, optimization)
+        self.threads = threads
+        self.optimization = optimization
+        self.size_bytes = sum(os.path.getsize(path) for path in self.paths)
+        self._sessions = None
+        self._lock = threading.Lock()
+
+    def sessions(self) -> list:
+        if self._sessions is None:
+            with self._lock:
+                if self._sessions is None:
+                    self._sessions = [create_session(path, self.threads, self.optimization) for path in self.paths]
+        return self._sessions
+
+
+class OnnxWav2Vec2(OnnxModel):
+    """Wav2Vec2ForCTC encoder pass on ONNX Runtime, returning what acoustic_head.encode does
+
+    The graph outputs the CTC logits and every hidden state; only the ones a
+    call asks for are copied out.
+    """
+
+    def __init__(self, directory: str, precision: str = "fp32", threads: int = 0, optimization: str = "all"):
+        super().__init__(directory, ["model"], precision, threads, optimization)
+        self.hidden_size = self.metadata["hidden_size"]
+        self.num_hidden_layers = self.metadata["num_hidden_layers"]
+        self.conv_kernel = self.metadata["conv_kernel"]
+        self.conv_stride = self.metadata["conv_stride"]
+
+    def output_lengths(self, num_samples: Sequence[int]) -> torch.Tensor:
+        """Encoder frames per window, as Wav2Vec2Model._get_feat_extract_output_lengths"""
+        lengths = torch.tensor(list(num_samples))
+        for kernel, stride in zip(self.conv_kernel, self.conv_stride):
+            lengths = torch.div(lengths - kernel, stride, rounding_mode="floor") + 1
+        return lengths
+
+    def encode(
+        self,
+        input_values: torch.Tensor,
+        attention_mask: Optional[torch.Tensor],
+        num_samples: Sequence[int],
+        layers: Sequence[int] = (),
+    ) -> Tuple[torch.Tensor, List[torch.Tensor]]:
+        """CTC logits and pooled hidden states of `layers` (see acoustic_head.encode)"""
+        session, = self.sessions()
+        feeds = {"input_values": input_values.numpy()}
+        if any(node.name == "attention_mask" for node in session.get_inputs()):
+            if attention_mask is None:
+                attention_mask = torch.ones(input_values.shape, dtype=torch.long)
+            feeds["attention_mask"] = attention_mask.numpy().astype(np.int64)
+        names = ["logits"] + [
+            "last_hidden_state" if layer == -1 else f"hidden_states.{layer}" for layer in layers
+        ]
+        logits, *hidden = session.run(names, feeds)
+
+        lengths = self.output_lengths(num_samples)
+        pooled = [mean_pool(torch.from_numpy(states), lengths) for states in hidden]
+        return torch.from_numpy(logits), pooled
+
+
+class OnnxWhisper(OnnxModel):
+    """Short-window Whisper decode (whisper_fast) on an exported encoder and cached decoder step
+
+    The encoder graph maps mel frames straight to each decoder layer's
+    cross-attention keys and values; the decoder graph takes new tokens plus
+    the self-attention cache and returns the last position's logits and the
+    extended cache.
+    """
+
+    def __init__(self, directory: str, precision: str = "fp32", threads: int = 0, optimization: str = "all"):
+        super().__init__(directory, ["encoder", "decoder"], precision, threads, optimization)
+        self.dims = ModelDimensions(**self.metadata["dims"])
+
+    def transcribe_short(self, mel: torch.Tensor, language: str = "en", max_tokens: int = 48) -> List[str]:
+        """Same contract as whisper_fast.transcribe_short"""
+        encoder, decoder = self.sessions()
+        cross_k, cross_v = encoder.run(None, {"mel": mel.numpy()})
+        shape = (self.dims.n_text_layer, mel.shape[0], 0, self.dims.n_text_state)
+        cache = {
+            "self_k": np.zeros(shape, dtype=np.float32),
+            "self_v": np.zeros(shape, dtype=np.float32),
+            "cross_k": cross_k,
+            "cross_v": cross_v,
+        }
+
+        def step(tokens: torch.Tensor) -> torch.Tensor:
+            logits, cache["self_k"], cache["self_v"] = decoder.run(None, {"tokens": tokens.numpy(), **cache})
+            return torch.from_numpy(logits)
+
+        return whisper_fast.greedy_decode(step, self.dims, mel.shape[0], language, max_tokens)
@@ -0,0 +1,163 @@
+"""
+Shared preprocessing stage
+Resamples and normalizes each analysis window once and caches the
+representations every analyzer consumes
+"""
+
+import functools
+from math import gcd
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import firwin, resample_poly
+
+from metrics import STAGE_SECONDS
+
+ASR_SAMPLE_RATE = 16000
+VAD_SAMPLE_RATES = (8000, 16000, 32000, 48000)
+
+
+@functools.lru_cache(maxsize=32)
+def polyphase_filter(up: int, down: int) -> np.ndarray:
+    """Anti-aliasing FIR taps for a fixed up/down ratio, designed once per ratio
+
+    Same design as scipy.signal.resample_poly's default (Kaiser, beta=5).
+    """
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    taps = firwin(2 * half_len + 1, 1.0 / max_rate, window=("kaiser", 5.0))
+    taps.setflags(write=False)
+    return taps
+
+
+@functools.lru_cache(maxsize=32)
+def _polyphase_matrix(up: int) -> Tuple[np.ndarray, int, int]:
+    """Taps for integer upsampling laid out as a (window, phase) matrix
+
+    Output sample q * up + p is the dot product of input window q with column
+    p, so one matmul over all windows filters every output phase at once.
+    """
+    taps = polyphase_filter(up, 1) * up
+    half_len = (len(taps) - 1) // 2
+    phases, offsets = [], []
+    for p in range(up):
+        r = (half_len + p) % up
+        phases.append(taps[r::up])
+        offsets.append((half_len + p - r) // up)
+
+    phase_len = max(len(phase) for phase in phases)
+    first = min(offsets) - phase_len + 1  # input index of window 0's first sample
+    matrix = np.zeros((phase_len + max(offsets) - min(offsets), up), dtype=np.float32)
+    for p, (phase, offset) in enumerate(zip(phases, offsets)):
+        for t, tap in enumerate(phase):
+            matrix[offset - first - t, p] = tap
+    matrix.setflags(write=False)
+    return matrix, first, max(offsets)
+
+
+def _upsample_integer(audio: np.ndarray, up: int) -> np.ndarray:
+    matrix, first, last_offset = _polyphase_matrix(up)
+    n = len(audio)
+    width = matrix.shape[0]
+    pad_left = max(0, -first)
+    padded = np.concatenate([
+        np.zeros(pad_left, dtype=np.float32), audio, np.zeros(last_offset + width, dtype=np.float32)
+    ])
+    start = first + pad_left
+    windows = sliding_window_view(padded, width)[start:start + n]
+    return (windows @ matrix).reshape(-1)
+
+
+def resample(audio: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
+    """Fixed-ratio polyphase resample to float32"""
+    audio = audio.astype(np.float32, copy=False)
+    if orig_sr == target_sr:
+        return audio
+    divisor = gcd(orig_sr, target_sr)
+    up, down = target_sr // divisor, orig_sr // divisor
+    if down == 1 and len(audio):
+        # 8kHz telephony -> 16kHz ASR is the hot path
+        return _upsample_integer(audio, up)
+    resampled = resample_poly(audio, up, down, window=polyphase_filter(up, down))
+    return resampled.astype(np.float32, copy=False)
+
+
+def normalize_peak(audio: np.ndarray) -> np.ndarray:
+    """Scale float32 audio so its peak is at +/-1"""
+    audio = audio.astype(np.float32, copy=False)
+    peak = np.max(np.abs(audio)) if len(audio) else 0.0
+    if peak > 0:
+        audio = audio / peak
+    return audio
+
+
+def nearest_vad_rate(sample_rate: int) -> int:
+    return min(VAD_SAMPLE_RATES, key=lambda rate: abs(rate - sample_rate))
+
+
+class PreparedAudio:
+    """One analysis window and its cached derived representations
+
+    `audio` is float32 in [-1, 1] at `sample_rate`. Each representation is
+    computed on first access and reused by every analyzer afterwards.
+    """
+
+    def __init__(self, audio: np.ndarray, sample_rate: int):
+        self.audio = audio.astype(np.float32, copy=False)
+        self.sample_rate = sample_rate
+        self.vad_rate = nearest_vad_rate(sample_rate)
+        self._audio_16k: Optional[np.ndarray] = None
+        self._vad_pcm: Optional[np.ndarray] = None
+        self._log_mel: Dict[Tuple[int, Optional[int]], np.ndarray] = {}
+
+    @property
+    def duration(self) -> float:
+        return len(self.audio) / self.sample_rate if self.sample_rate else 0.0
+
+    @property
+    def audio_16k(self) -> np.ndarray:
+        """Peak-normalized float32 at 16kHz for the ASR models"""
+        if self._audio_16k is None:
+            with STAGE_SECONDS.labels("resample").time():
+                self._audio_16k = normalize_peak(resample(self.audio, self.sample_rate, ASR_SAMPLE_RATE))
+        return self._audio_16k
+
+    @property
+    def vad_pcm(self) -> np.ndarray:
+        """16-bit PCM at the nearest WebRTC VAD rate"""
+        if self._vad_pcm is None:
+            with STAGE_SECONDS.labels("resample").time():
+                audio = resample(self.audio, self.sample_rate, self.vad_rate)
+            self._vad_pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+        return self._vad_pcm
+
+    def log_mel(self, n_mels: int = 80, n_samples: Optional[int] = None) -> np.ndarray:
+        """Whisper log-mel spectrogram of the window padded/trimmed to n_samples (default 30s)"""
+        key = (n_mels, n_samples)
+        if key not in self._log_mel:
+            import whisper
+
+            padded = whisper.pad_or_trim(self.audio_16k, n_samples or whisper.audio.N_SAMPLES)
+            with STAGE_SECONDS.labels("log_mel").time():
+                self._log_mel[key] = whisper.log_mel_spectrogram(padded, n_mels).numpy()
+        return self._log_mel[key]
+
+
+def prepare_audio(
+    audio: np.ndarray,
+    sample_rate: int,
+    asr: bool = True,
+    vad: bool = True,
+    mel_bins: Optional[int] = None,
+    mel_samples: Optional[int] = None,
+) -> PreparedAudio:
+    """Build a PreparedAudio and compute the requested representations up front"""
+    prepared = PreparedAudio(audio, sample_rate)
+    if asr:
+        prepared.audio_16k
+    if vad:
+        prepared.vad_pcm
+    if mel_bins:
+        prepared.log_mel(mel_bins, mel_samples)
+    return prepared
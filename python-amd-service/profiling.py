@@ -0,0 +1,205 @@
+"""
+Opt-in request profiling
+Profiles the worker-pool calls (preprocessing, model batches, VAD) made on
+behalf of one request or stream window with cProfile and the torch profiler,
+and writes the traces plus an index entry to a local directory
+"""
+
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager, nullcontext
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# The profile of the request the current task is working for, if any
+current_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar(
+    "amd_request_profile", default=None
+)
+
+# The torch profiler is process-wide; only one call is traced at a time
+_torch_lock = threading.Lock()
+
+
+class RequestProfile:
+    """Profiles collected from every worker call made for one request"""
+
+    def __init__(self, profile_id: str, kind: str, label: str, directory: str, torch_enabled: bool):
+        self.id = profile_id
+        self.kind = kind
+        self.label = label
+        self.directory = directory
+        self.torch_enabled = torch_enabled
+        self.started = time.time()
+        self.duration_ms: Optional[float] = None
+        self.calls: List[Dict] = []
+        self.torch_traces: List[str] = []
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def _torch_profiler(self):
+        if not self.torch_enabled or not _torch_lock.acquire(blocking=False):
+            return None
+        try:
+            from torch.profiler import ProfilerActivity, profile
+
+            return profile(activities=[ProfilerActivity.CPU], record_shapes=True)
+        except Exception:
+            _torch_lock.release()
+            raise
+
+    def run(self, fn: Callable, pool: str, *args):
+        """Run fn(*args) in the calling worker thread under cProfile (and torch, when free)"""
+        profiler = cProfile.Profile()
+        torch_profiler = self._torch_profiler()
+        start = time.perf_counter()
+        try:
+            with torch_profiler if torch_profiler is not None else nullcontext():
+                profiler.enable()
+                try:
+                    return fn(*args)
+                finally:
+                    profiler.disable()
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            trace = None
+            if torch_profiler is not None:
+                try:
+                    with self._lock:
+                        trace = f"{self.id}-{len(self.torch_traces)}.trace.json"
+                        self.torch_traces.append(trace)
+                    torch_profiler.export_chrome_trace(os.path.join(self.directory, trace))
+                except Exception as e:
+                    logger.warning(f"⚠️ Torch trace export failed for profile {self.id}: {e}")
+                finally:
+                    _torch_lock.release()
+            with self._lock:
+                self._profiles.append(profiler)
+                self.calls.append({
+                    "pool": pool,
+                    "function": getattr(fn, "__name__", repr(fn)),
+                    "ms": elapsed_ms,
+                    "torch_trace": trace,
+                })
+
+    def write(self, top: int = 40) -> Dict:
+        """Write the merged cProfile stats, a text report and the index entry"""
+        with self._lock:
+            profiles = list(self._profiles)
+        files = {"torch_traces": list(self.torch_traces)}
+        if profiles:
+            stats = pstats.Stats(profiles[0])
+            for profiler in profiles[1:]:
+                stats.add(profiler)
+            files["pstats"] = f"{self.id}.pstats"
+            stats.dump_stats(os.path.join(self.directory, files["pstats"]))
+
+            report = io.StringIO()
+            pstats.Stats(profiles[0], stream=report).add(*profiles[1:]).sort_stats("cumulative").print_stats(top)
+            files["report"] = f"{self.id}.txt"
+            with open(os.path.join(self.directory, files["report"]), "w") as f:
+                f.write(report.getvalue())
+
+        entry = {
+            "id": self.id,
+            "kind": self.kind,
+            "label": self.label,
+            "started": self.started,
+            "duration_ms": self.duration_ms,
+            "worker_ms": sum(call["ms"] for call in self.calls),
+            "calls": self.calls,
+            "files": files,
+        }
+        with open(os.path.join(self.directory, f"{self.id}.json"), "w") as f:
+            json.dump(entry, f, indent=2)
+        return entry
+
+
+class Profiler:
+    """Decides which requests are profiled and manages the trace directory
+
+    A request is profiled when it asks to be (header or query flag) or, at
+    `sample_rate`, at random; nothing is profiled unless `enabled`. Only the
+    newest `max_profiles` profiles are kept.
+    """
+
+    def __init__(self, directory: str, enabled: bool = False, sample_rate: float = 0.0,
+                 torch_enabled: bool = True, max_profiles: int = 100):
+        self.directory = directory
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.torch_enabled = torch_enabled
+        self.max_profiles = max_profiles
+
+    def wants(self, requested: bool = False) -> bool:
+        if not self.enabled:
+            return False
+        return requested or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    @asynccontextmanager
+    async def profile(self, kind: str, label: str, requested: bool = False):
+        """Profile the worker calls made inside the block when this request is selected"""
+        if not self.wants(requested):
+            yield None
+            return
+
+        import asyncio
+
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{kind}-{uuid.uuid4().hex[:8]}"
+        request_profile = RequestProfile(profile_id, kind, label, self.directory, self.torch_enabled)
+        token = current_profile.set(request_profile)
+        start = time.perf_counter()
+        try:
+            yield request_profile
+        finally:
+            current_profile.reset(token)
+            request_profile.duration_ms = (time.perf_counter() - start) * 1000
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(None, request_profile.write)
+                await loop.run_in_executor(None, self.prune)
+                logger.info(f"🔬 Profile {profile_id} written ({request_profile.duration_ms:.0f}ms, {len(request_profile.calls)} worker calls)")
+            except Exception as e:
+                logger.error(f"❌ Failed to write profile {profile_id}: {e}")
+
+    def index(self) -> List[Dict]:
+        """Index entries of the stored profiles, newest first"""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for name in os.listdir(self.directory):
+            if name.endswith(".json") and not name.endswith(".trace.json"):
+                try:
+                    with open(os.path.join(self.directory, name)) as f:
+                        entries.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return sorted(entries, key=lambda entry: entry.get("started", 0), reverse=True)
+
+    def prune(self):
+        """Delete the files of all but the newest `max_profiles` profiles"""
+        for entry in self.index()[self.max_profiles:]:
+            files = entry.get("files", {})
+            names = [f"{entry['id']}.json", files.get("pstats"), files.get("report")] + files.get("torch_traces", [])
+            for name in filter(None, names):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def file_path(self, name: str) -> Optional[str]:
+        """Path of a stored profile file, or None for unknown or unsafe names"""
+        if os.path.basename(name) != name or name.startswith("."):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
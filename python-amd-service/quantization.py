@@ -0,0 +1,54 @@
+"""
+CPU precision modes for the PyTorch models
+Dynamic int8 quantization of Linear layers, applied once at load time
+"""
+
+import io
+import warnings
+
+import torch
+from torch import nn
+
+PRECISIONS = ("fp32", "int8")
+
+
+def quantize_linear_int8(model: nn.Module) -> nn.Module:
+    """Dynamically quantize every Linear layer of the model to int8, in place
+
+    Weights are stored as int8 and activations are quantized per batch, so no
+    calibration data is needed. Quantizing in place avoids holding a second
+    fp32 copy during startup. Model-defined subclasses of nn.Linear (Whisper's
+    only casts dtypes) are treated as plain Linear layers so they are
+    quantized too; torch's own subclasses are left alone.
+    """
+    for module in model.modules():
+        if isinstance(module, nn.Linear) and not type(module).__module__.startswith("torch."):
+            module.__class__ = nn.Linear
+
+    with warnings.catch_warnings():
+        # torch.ao eager-mode quantization warns about its planned migration
+        warnings.simplefilter("ignore")
+        quantized = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8, inplace=True)
+    return quantized.eval()
+
+
+def apply_precision(model: nn.Module, precision: str) -> nn.Module:
+    """Convert a freshly loaded fp32 model to the configured precision"""
+    if precision == "fp32":
+        return model
+    if precision == "int8":
+        return quantize_linear_int8(model)
+    raise ValueError(f"Unsupported precision: {precision} (expected one of {', '.join(PRECISIONS)})")
+
+
+def set_num_threads(num_threads: int):
+    """Limit intra-op threads for the whole process, all threads included (0 keeps the torch default)"""
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+
+
+def model_size_bytes(model: nn.Module) -> int:
+    """Serialized size of the model's weights, including packed int8 weights"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
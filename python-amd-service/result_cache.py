@@ -0,0 +1,254 @@
+"""
+Content-addressed analysis result cache
+Results are keyed by a hash of the decoded audio plus the request parameters,
+held in a byte-bounded LRU with a TTL and optionally mirrored to disk;
+concurrent requests for the same key share one computation
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DISK_PRUNE_INTERVAL_SECONDS = 60.0
+
+
+def audio_key(samples: np.ndarray, *params) -> str:
+    """Hex key for decoded samples and the parameters that change the result"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(memoryview(np.ascontiguousarray(samples)).cast("B"))
+    digest.update(repr((samples.dtype.str,) + params).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """LRU + TTL cache of JSON-serializable results
+
+    Entries are stored serialized, so the memory bound is exact and callers
+    always get a fresh copy. `max_entries` of 0 disables the cache (every
+    lookup misses, though concurrent requests are still coalesced). With
+    `disk_dir` set, entries are also written there and a memory miss falls
+    back to disk, so results survive restarts and are shared by workers.
+    Expired disk entries, and the oldest ones beyond `disk_max_bytes`, are
+    deleted in the background at most every DISK_PRUNE_INTERVAL_SECONDS.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 32 * 2**20,
+        ttl_seconds: float = 600.0,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 1024 * 2**20,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir or None
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()  # key -> (expires_at, payload)
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = self.disk_hits = self.misses = self.coalesced = 0
+        self.evictions = self.expirations = self.disk_pruned = 0
+        self._next_prune = 0.0
+        self._pruning: Optional[asyncio.Future] = None
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _remember(self, key: str, payload: bytes, expires_at: float):
+        self._forget(key)
+        if len(payload) > self.max_bytes:
+            return
+        self._entries[key] = (expires_at, payload)
+        self._bytes += len(payload)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def _forget(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+    def _memory_get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, payload = entry
+        if time.time() >= expires_at:
+            self._forget(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return payload
+
+    def _disk_get(self, key: str) -> Optional[Tuple[float, bytes]]:
+        path = self._disk_path(key)
+        try:
+            expires_at = os.stat(path).st_mtime + self.ttl_seconds
+            if time.time() >= expires_at:
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                return expires_at, f.read()
+        except OSError:
+            return None
+
+    def _disk_put(self, key: str, payload: bytes):
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"⚠️ Result cache disk write failed for {key}: {e}")
+
+    def _disk_prune(self) -> int:
+        """Delete expired entries, then the oldest over `disk_max_bytes`; returns the number deleted"""
+        now = time.time()
+        files = []
+        try:
+            for shard in os.scandir(self.disk_dir):
+                if shard.is_dir():
+                    for entry in os.scandir(shard.path):
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError as e:
+            logger.warning(f"⚠️ Result cache disk scan failed: {e}")
+            return 0
+
+        files.sort()  # oldest first
+        # A .tmp file is being written by some worker, unless it expired (a crashed write)
+        total = sum(size for _, size, path in files if not path.endswith(".tmp"))
+        removed = 0
+        for mtime, size, path in files:
+            partial = path.endswith(".tmp")
+            expired = now >= mtime + self.ttl_seconds
+            if not expired and (partial or total <= self.disk_max_bytes):
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass  # already removed by another worker
+            if not partial:
+                total -= size
+        return removed
+
+    def _schedule_prune(self):
+        if self._pruning is not None or time.monotonic() < self._next_prune:
+            return
+        self._next_prune = time.monotonic() + DISK_PRUNE_INTERVAL_SECONDS
+        self._pruning = asyncio.get_running_loop().run_in_executor(None, self._disk_prune)
+
+        def done(future: asyncio.Future):
+            self._pruning = None
+            if not future.cancelled() and future.exception() is None:
+                self.disk_pruned += future.result()
+
+        self._pruning.add_done_callback(done)
+
+    async def get(self, key: str) -> Optional[Dict]:
+        """Cached result for a key, from memory or disk, or None"""
+        if not self.enabled:
+            return None
+        payload = self._memory_get(key)
+        if payload is None and self.disk_dir:
+            found = await asyncio.get_running_loop().run_in_executor(None, self._disk_get, key)
+            if found is not None:
+                expires_at, payload = found
+                self._remember(key, payload, expires_at)
+                self.disk_hits += 1
+        if payload is None:
+            return None
+        self.hits += 1
+        return json.loads(payload)
+
+    async def put(self, key: str, value: Dict):
+        if not self.enabled:
+            return
+        payload = json.dumps(value).encode()
+        self._remember(key, payload, time.time() + self.ttl_seconds)
+        if self.disk_dir:
+            await asyncio.get_running_loop().run_in_executor(None, self._disk_put, key, payload)
+            self._schedule_prune()
+
+    async def _compute(self, key: str, compute: Callable[[], Awaitable[Dict]], cacheable: Callable[[Dict], bool]) -> bytes:
+        try:
+            value = await compute()
+            payload = json.dumps(value).encode()
+            if cacheable(value):
+                await self.put(key, value)
+            return payload
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Dict]],
+        cacheable: Callable[[Dict], bool] = lambda value: True,
+    ) -> Tuple[Dict, str]:
+        """Cached value, or the result of `compute` shared with concurrent callers
+
+        Returns (value, source) where source is "hit", "coalesced" or "miss".
+        The computation runs as its own task, so it finishes (and is cached)
+        even if the caller that started it goes away. Only values accepted by
+        `cacheable` are stored; a failure is raised to every waiting caller.
+        """
+        value = await self.get(key)
+        if value is not None:
+            return value, "hit"
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            source = "coalesced"
+        else:
+            self.misses += 1
+            source = "miss"
+            task = asyncio.ensure_future(self._compute(key, compute, cacheable))
+            # Marks a failure nobody is left waiting for as retrieved
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self._inflight[key] = task
+        return json.loads(await asyncio.shield(task)), source
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "disk_dir": self.disk_dir,
+            "disk_max_bytes": self.disk_max_bytes,
+            "disk_pruned": self.disk_pruned,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
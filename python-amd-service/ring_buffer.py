@@ -0,0 +1,78 @@
+"""
+Preallocated ring buffer for per-session streaming audio
+"""
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """Fixed-capacity mirrored ring buffer of audio samples
+
+    Every sample is stored twice, at i and i + capacity, so any run of up to
+    `capacity` buffered samples is contiguous in memory and can be handed to
+    the analyzers as a view without copying or reallocating.
+    """
+
+    def __init__(self, capacity: int, dtype=np.float32):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._data = np.zeros(2 * capacity, dtype=dtype)
+        self._start = 0  # position of the oldest sample, always < capacity
+        self._size = 0
+        self.dropped = 0  # samples overwritten before they were consumed
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def dtype(self):
+        return self._data.dtype
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+    def append(self, samples: np.ndarray):
+        """Append samples, overwriting the oldest ones when full"""
+        n = len(samples)
+        if n == 0:
+            return
+        if n > self.capacity:
+            self.dropped += n - self.capacity
+            samples = samples[-self.capacity:]
+            n = self.capacity
+
+        overflow = self._size + n - self.capacity
+        if overflow > 0:
+            self.consume(overflow)
+            self.dropped += overflow
+
+        write = (self._start + self._size) % self.capacity
+        first = min(n, self.capacity - write)
+        self._data[write:write + first] = samples[:first]
+        self._data[write + self.capacity:write + self.capacity + first] = samples[:first]
+
+        rest = n - first
+        if rest:
+            self._data[:rest] = samples[first:]
+            self._data[self.capacity:self.capacity + rest] = samples[first:]
+
+        self._size += n
+
+    def window(self, n: int = None) -> np.ndarray:
+        """Read-only view of the oldest n buffered samples (all by default)"""
+        n = self._size if n is None else min(n, self._size)
+        view = self._data[self._start:self._start + n]
+        view.flags.writeable = False
+        return view
+
+    def consume(self, n: int):
+        """Drop the oldest n samples"""
+        n = min(n, self._size)
+        self._start = (self._start + n) % self.capacity
+        self._size -= n
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
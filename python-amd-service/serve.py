@@ -0,0 +1,149 @@
+"""
+Prefork server for the ML service
+Loads PRELOAD_MODELS once, then forks uvicorn workers on one listening socket
+so every worker shares the same copy of the model weights (copy-on-write)
+Usage: python serve.py [--workers 2] [--host 0.0.0.0] [--port 8001] [--log-level info]
+"""
+
+import argparse
+import gc
+import logging
+import os
+import random
+import signal
+import socket
+import time
+from typing import Dict
+
+import uvicorn
+
+import config
+from quantization import set_num_threads
+
+logger = logging.getLogger("serve")
+
+RESTART_BACKOFF_SECONDS = 1.0
+STOP_TIMEOUT_SECONDS = 30.0
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """Listening socket created before the fork, so all workers accept on it"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def worker_threads(workers: int) -> int:
+    if config.SERVE_TORCH_THREADS > 0:
+        return config.SERVE_TORCH_THREADS
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def load_shared_models():
+    """Load the preloaded models and make the parent's heap safe to share"""
+    import main
+
+    start = time.perf_counter()
+    main.load_shared_weights(config.PRELOAD_MODELS)
+    logger.info(f"Loaded {', '.join(config.PRELOAD_MODELS)} in {time.perf_counter() - start:.1f}s")
+    # Objects that exist now are never collected, so the collector never writes
+    # to (and thereby copies) the pages holding them in the workers
+    gc.collect()
+    gc.freeze()
+    return main.app
+
+
+class Supervisor:
+    """Forks the workers, restarts any that die and stops them all on SIGINT/SIGTERM"""
+
+    def __init__(self, app, sock: socket.socket, workers: int, threads: int, log_level: str):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.threads = threads
+        self.log_level = log_level
+        self.children: Dict[int, int] = {}  # pid -> worker index
+        self.started: Dict[int, float] = {}  # worker index -> fork time
+        self.stopping_since = None
+
+    def spawn(self, index: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = self.run_worker()
+            except BaseException:
+                logger.exception("Worker failed")
+            finally:
+                os._exit(code)
+        self.children[pid] = index
+        self.started[index] = time.monotonic()
+        logger.info(f"Started worker {index} (pid {pid}, {self.threads} torch threads)")
+
+    def run_worker(self) -> int:
+        # uvicorn installs its own handlers for a graceful shutdown
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        random.seed()  # forked workers would otherwise sample profiles and recordings in lockstep
+        set_num_threads(self.threads)
+        server = uvicorn.Server(uvicorn.Config(self.app, log_level=self.log_level))
+        server.run(sockets=[self.sock])
+        return 0
+
+    def stop(self, signum, frame):
+        if self.stopping_since is None:
+            logger.info(f"Stopping {len(self.children)} workers")
+            self.stopping_since = time.monotonic()
+            for pid in list(self.children):
+                os.kill(pid, signal.SIGTERM)
+
+    def run(self):
+        for index in range(self.workers):
+            self.spawn(index)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        while self.children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                if self.stopping_since and time.monotonic() - self.stopping_since > STOP_TIMEOUT_SECONDS:
+                    for pid in list(self.children):
+                        os.kill(pid, signal.SIGKILL)
+                time.sleep(0.2)
+                continue
+            index = self.children.pop(pid, None)
+            if index is None or self.stopping_since is not None:
+                continue
+            logger.warning(f"Worker {index} (pid {pid}) exited with code {os.waitstatus_to_exitcode(status)}")
+            if time.monotonic() - self.started[index] < RESTART_BACKOFF_SECONDS:
+                time.sleep(RESTART_BACKOFF_SECONDS)  # do not spin on a worker that dies at startup
+            self.spawn(index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=config.HOST)
+    parser.add_argument("--port", type=int, default=config.PORT)
+    parser.add_argument("--workers", type=int, default=config.SERVE_WORKERS)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format="%(levelname)s:%(name)s:%(message)s")
+
+    if config.INFERENCE_EXECUTOR == "process":
+        # Process pools load their own models in every worker, defeating the sharing
+        parser.error("serve.py needs INFERENCE_EXECUTOR=thread")
+
+    sock = bind_socket(args.host, args.port)
+    # Loading runs single-threaded so no torch thread pool exists at fork time
+    set_num_threads(1)
+    app = load_shared_models()
+    logger.info(f"Serving on {args.host}:{args.port} with {args.workers} workers")
+    Supervisor(app, sock, args.workers, worker_threads(args.workers), args.log_level).run()
+
+
+if __name__ == "__main__":
+    main()
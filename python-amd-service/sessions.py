@@ -0,0 +1,173 @@
+"""
+Streaming session manager
+Compact per-session state with a bounded confidence history, admission
+control on concurrent sessions and eviction of idle or overlong sessions
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# WebSocket close codes (RFC 6455)
+CLOSE_GOING_AWAY = 1001
+CLOSE_INTERNAL_ERROR = 1011
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+class SessionState:
+    """Counters for one stream; the audio itself stays in the handler"""
+
+    __slots__ = (
+        "session_id", "call_sid", "model_type", "started", "started_at", "last_activity",
+        "buffer_size", "analysis_count", "last_detection", "beeps_detected", "confidence_scores",
+        "windows_dropped", "windows_degraded", "lag_ms_last", "lag_ms_max", "evicted", "_task",
+    )
+
+    def __init__(self, call_sid: str, model_type: str, history: int):
+        self.session_id = str(uuid.uuid4())
+        self.call_sid = call_sid
+        self.model_type = model_type
+        self.started = self.last_activity = time.monotonic()
+        self.started_at = time.time()
+        self.buffer_size = 0
+        self.analysis_count = 0
+        self.last_detection: Optional[str] = None
+        self.beeps_detected = 0
+        self.confidence_scores = deque(maxlen=history)
+        # Backpressure: windows shed or analyzed VAD-only, and window-to-result lag
+        self.windows_dropped = 0
+        self.windows_degraded = 0
+        self.lag_ms_last = 0.0
+        self.lag_ms_max = 0.0
+        self.evicted: Optional[str] = None  # reason, once the manager has evicted the session
+        self._task: Optional[asyncio.Task] = None
+
+    def touch(self):
+        """Mark inbound traffic; sessions without any for the idle timeout are evicted"""
+        self.last_activity = time.monotonic()
+
+    def record(self, detection: str, confidence: float, lag_ms: float = 0.0):
+        self.analysis_count += 1
+        self.last_detection = detection
+        self.confidence_scores.append(confidence)
+        self.lag_ms_last = lag_ms
+        self.lag_ms_max = max(self.lag_ms_max, lag_ms)
+
+    def summary(self, now: float) -> Dict:
+        return {
+            "session_id": self.session_id,
+            "call_sid": self.call_sid,
+            "model_type": self.model_type,
+            "duration": now - self.started,
+            "idle": now - self.last_activity,
+            "buffer_size": self.buffer_size,
+            "analysis_count": self.analysis_count,
+            "last_detection": self.last_detection,
+            "beeps_detected": self.beeps_detected,
+            "recent_confidence": list(self.confidence_scores),
+            "windows_dropped": self.windows_dropped,
+            "windows_degraded": self.windows_degraded,
+            "lag_ms_last": self.lag_ms_last,
+            "lag_ms_max": self.lag_ms_max,
+        }
+
+
+class SessionManager:
+    """Active sessions, capped at `max_sessions` (0 = unlimited)
+
+    A background sweep evicts sessions idle for `idle_timeout` seconds or
+    open for more than `max_duration` (0 disables either check) by
+    cancelling their handler task; the handler sees `state.evicted` and
+    closes the socket with 1001 (going away).
+    """
+
+    def __init__(self, max_sessions: int = 0, idle_timeout: float = 0.0, max_duration: float = 0.0,
+                 history: int = 32, sweep_interval: float = 1.0):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_duration = max_duration
+        self.history = history
+        self.sweep_interval = sweep_interval
+        self._sessions: Dict[str, SessionState] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+        self.opened = self.rejected = self.evicted_idle = self.evicted_duration = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def open(self, call_sid: str, model_type: str = "") -> Optional[SessionState]:
+        """Register the calling handler's session, or None when at capacity"""
+        if self.max_sessions and len(self._sessions) >= self.max_sessions:
+            self.rejected += 1
+            return None
+        state = SessionState(call_sid, model_type, self.history)
+        state._task = asyncio.current_task()
+        self._sessions[state.session_id] = state
+        self.opened += 1
+        self.start()
+        return state
+
+    def close(self, state: SessionState):
+        self._sessions.pop(state.session_id, None)
+
+    def start(self):
+        """Start the eviction sweep on the running event loop"""
+        if (self.idle_timeout or self.max_duration) and (self._sweeper is None or self._sweeper.done()):
+            self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    def sweep(self) -> int:
+        """Evict idle and overlong sessions; returns how many were evicted"""
+        now = time.monotonic()
+        evicted = 0
+        for state in list(self._sessions.values()):
+            if self.max_duration and now - state.started > self.max_duration:
+                state.evicted = "max duration exceeded"
+                self.evicted_duration += 1
+            elif self.idle_timeout and now - state.last_activity > self.idle_timeout:
+                state.evicted = "idle timeout"
+                self.evicted_idle += 1
+            else:
+                continue
+            logger.warning(f"Evicting session {state.session_id} ({state.call_sid}): {state.evicted}")
+            self.close(state)
+            if state._task is not None:
+                state._task.cancel()
+            evicted += 1
+        return evicted
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.sweep()
+
+    def snapshot(self, limit: Optional[int] = None) -> List[Dict]:
+        """Plain-dict summaries of up to `limit` sessions, oldest first"""
+        now = time.monotonic()
+        states = list(self._sessions.values())
+        if limit is not None:
+            states = states[:limit]
+        return [state.summary(now) for state in states]
+
+    def stats(self) -> Dict:
+        return {
+            "active": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "evicted_idle": self.evicted_idle,
+            "evicted_duration": self.evicted_duration,
+        }
@@ -0,0 +1,56 @@
+import base64
+
+import numpy as np
+import pytest
+
+import codec
+
+
+def test_mulaw_reference_values():
+    samples = codec.decode_mulaw(bytes([0xFF, 0x7F, 0x00, 0x80]), dtype=np.int16)
+    np.testing.assert_array_equal(samples, [0, 0, -32124, 32124])
+
+
+def test_alaw_reference_values():
+    samples = codec.decode_alaw(bytes([0xD5, 0x55, 0x2A, 0xAA]), dtype=np.int16)
+    np.testing.assert_array_equal(samples, [8, -8, -32256, 32256])
+
+
+@pytest.mark.parametrize("encoding", ["mulaw", "alaw"])
+def test_encode_decode_round_trip(encoding):
+    encode = codec.encode_mulaw if encoding == "mulaw" else codec.encode_alaw
+    levels = codec.decode_audio(bytes(range(256)), encoding, dtype=np.int16)
+
+    decoded = codec.decode_audio(encode(levels), encoding, dtype=np.int16)
+    np.testing.assert_array_equal(decoded, levels)
+
+
+def test_float_output_matches_int16_scaled():
+    data = bytes(range(256))
+    as_float = codec.decode_mulaw(data)
+    assert as_float.dtype == np.float32
+    np.testing.assert_allclose(as_float, codec.decode_mulaw(data, dtype=np.int16) / 32768.0)
+
+
+def test_decode_reuses_out_buffer():
+    out = np.empty(16, dtype=np.float32)
+    samples = codec.decode_mulaw(bytes(8), out=out)
+    assert len(samples) == 8
+    assert np.shares_memory(samples, out)
+
+
+def test_pcm16_int16_is_zero_copy_view():
+    data = np.array([1, -2, 32767], dtype="<i2").tobytes()
+    samples = codec.decode_pcm16(data, dtype=np.int16)
+    np.testing.assert_array_equal(samples, [1, -2, 32767])
+    np.testing.assert_allclose(codec.decode_pcm16(data), [1 / 32768, -2 / 32768, 32767 / 32768])
+
+
+def test_decode_base64_payload():
+    payload = base64.b64encode(bytes([0xFF, 0x00])).decode()
+    np.testing.assert_array_equal(codec.decode_base64(payload, dtype=np.int16), [0, -32124])
+
+
+def test_unsupported_encoding_raises():
+    with pytest.raises(ValueError):
+        codec.decode_audio(b"\x00", "gsm")
@@ -0,0 +1,72 @@
+import json
+import os
+
+import pytest
+
+from lexicon import Lexicon, PhraseMatcher, tokenize
+
+LEXICON = {
+    "machine": {"leave a message": 2.0, "after the tone": 1.5, "press": 0.5},
+    "human": {"hello": 1.0, "hi": 1.0, "this is": 0.5},
+}
+
+
+def test_tokenize_splits_on_punctuation():
+    assert tokenize("Hello, it's ME!") == ["hello", "it's", "me"]
+
+
+def test_matches_whole_words_only():
+    matcher = PhraseMatcher(LEXICON)
+
+    assert matcher.score("his pressure is high") == ({}, [])
+    assert matcher.score("hi there") == ({"human": 1.0}, ["hi"])
+
+
+def test_scores_overlapping_and_repeated_phrases_once():
+    matcher = PhraseMatcher(LEXICON)
+
+    scores, matched = matcher.score("Please leave a message after the tone. Leave a message!")
+    assert scores == {"machine": 3.5}
+    assert sorted(matched) == ["after the tone", "leave a message"]
+
+
+def test_suffix_phrases_match_through_failure_links():
+    matcher = PhraseMatcher({"machine": {"a b c": 1.0, "b c d": 2.0, "c": 0.25}})
+
+    scores, matched = matcher.score("a b c d")
+    assert scores == {"machine": 3.25}
+    assert sorted(matched) == ["a b c", "b c d", "c"]
+
+
+def test_rejects_phrase_without_words():
+    with pytest.raises(ValueError):
+        PhraseMatcher({"machine": {"...": 1.0}})
+
+
+def _write(path, lexicon, mtime):
+    with open(path, "w") as f:
+        json.dump(lexicon, f)
+    os.utime(path, (mtime, mtime))
+
+
+def test_hot_reload_recompiles_changed_file(tmp_path):
+    path = str(tmp_path / "lexicon.json")
+    _write(path, {"machine": {"beep": 1.0}}, 1000)
+    lexicon = Lexicon(path, check_interval=0.001)
+    assert lexicon.score("beep")[0] == {"machine": 1.0}
+
+    _write(path, {"human": {"beep": 2.0}}, 2000)
+    lexicon._next_check = 0.0
+    assert lexicon.score("beep")[0] == {"human": 2.0}
+
+
+def test_broken_file_keeps_previous_matcher(tmp_path):
+    path = str(tmp_path / "lexicon.json")
+    _write(path, LEXICON, 1000)
+    lexicon = Lexicon(path, check_interval=0)
+
+    with open(path, "w") as f:
+        f.write("{not json")
+    assert lexicon.reload() is False
+    assert lexicon.score("hello")[0] == {"human": 1.0}
+    assert lexicon.info()["phrases"] == {"machine": 3, "human": 3}
@@ -0,0 +1,102 @@
+"""
+The ONNX graphs written by tools.export_onnx must compute what the PyTorch
+models do: tiny randomly initialized models are exported and both backends
+are run on the same inputs
+"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+import torch
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+whisper_model = pytest.importorskip("whisper.model")
+transformers = pytest.importorskip("transformers")
+
+import acoustic_head  # noqa: E402
+import onnx_backend  # noqa: E402
+import whisper_fast  # noqa: E402
+from tools import export_onnx  # noqa: E402
+
+
+def _write_export(directory, metadata):
+    with open(os.path.join(directory, onnx_backend.METADATA), "w") as f:
+        json.dump({"source": "test", **metadata}, f)
+
+
+def _tiny_wav2vec2(feat_extract_norm: str):
+    config = transformers.Wav2Vec2Config(
+        hidden_size=32, num_hidden_layers=2, num_attention_heads=2, intermediate_size=64,
+        vocab_size=32, conv_dim=(16,) * 7, num_conv_pos_embeddings=16, num_conv_pos_embedding_groups=2,
+        feat_extract_norm=feat_extract_norm, do_stable_layer_norm=feat_extract_norm == "layer",
+    )
+    torch.manual_seed(0)
+    return transformers.Wav2Vec2ForCTC._from_config(config, attn_implementation="eager").eval()
+
+
+def _tiny_whisper():
+    dims = whisper_model.ModelDimensions(
+        n_mels=80, n_audio_ctx=1500, n_audio_state=32, n_audio_head=2, n_audio_layer=2,
+        n_vocab=51865, n_text_ctx=448, n_text_state=32, n_text_head=2, n_text_layer=2,
+    )
+    torch.manual_seed(0)
+    model = whisper_model.Whisper(dims).eval()
+    # The positional embedding is allocated with torch.empty and only ever filled
+    # from a checkpoint; a small token embedding keeps greedy decoding from
+    # repeating the last prompt token
+    torch.nn.init.normal_(model.decoder.positional_embedding, std=0.02)
+    torch.nn.init.normal_(model.decoder.token_embedding.weight, std=0.02)
+    return model
+
+
+@pytest.mark.parametrize("with_attention_mask", [False, True])
+def test_wav2vec2_logits_and_hidden_states_match(tmp_path, with_attention_mask):
+    model = _tiny_wav2vec2("layer" if with_attention_mask else "group")
+    _write_export(tmp_path, export_onnx.write_wav2vec2(model, with_attention_mask, str(tmp_path)))
+    onnx_model = onnx_backend.OnnxWav2Vec2(str(tmp_path))
+
+    num_samples = [16000, 12000]
+    input_values = torch.randn(2, 16000)
+    input_values[1, 12000:] = 0.0
+    attention_mask = None
+    if with_attention_mask:
+        attention_mask = torch.ones(2, 16000, dtype=torch.long)
+        attention_mask[1, 12000:] = 0
+
+    with torch.no_grad():
+        logits, pooled = acoustic_head.encode(model, input_values, attention_mask, num_samples, layers=(-1, 1))
+    onnx_logits, onnx_pooled = onnx_model.encode(input_values, attention_mask, num_samples, layers=(-1, 1))
+
+    np.testing.assert_allclose(onnx_logits.numpy(), logits.numpy(), rtol=1e-4, atol=1e-4)
+    for onnx_states, states in zip(onnx_pooled, pooled):
+        np.testing.assert_allclose(onnx_states.numpy(), states.numpy(), rtol=1e-4, atol=1e-4)
+    assert onnx_model.output_lengths(num_samples).tolist() == model._get_feat_extract_output_lengths(
+        torch.tensor(num_samples)
+    ).tolist()
+
+
+def test_whisper_logits_and_greedy_decode_match(tmp_path):
+    model = _tiny_whisper()
+    _write_export(tmp_path, export_onnx.write_whisper(model, str(tmp_path)))
+    onnx_model = onnx_backend.OnnxWhisper(str(tmp_path))
+
+    torch.manual_seed(1)
+    mel = torch.randn(2, 80, whisper_fast.mel_samples(24000) // 160)
+    prompt = torch.tensor([[50258, 50259, 50359, 50363]] * 2)  # sot, en, transcribe, notimestamps
+    dims = model.dims
+
+    encoder, decoder = onnx_model.sessions()
+    cross_k, cross_v = encoder.run(None, {"mel": mel.numpy()})
+    empty = np.zeros((dims.n_text_layer, 2, 0, dims.n_text_state), dtype=np.float32)
+    onnx_logits, _, _ = decoder.run(None, {
+        "tokens": prompt.numpy(), "self_k": empty, "self_v": empty, "cross_k": cross_k, "cross_v": cross_v,
+    })
+    with torch.no_grad():
+        logits = model.decoder(prompt, whisper_fast.encode_trimmed(model, mel))[:, -1]
+    np.testing.assert_allclose(onnx_logits, logits.numpy(), rtol=1e-4, atol=1e-4)
+
+    onnx_text = onnx_model.transcribe_short(mel, max_tokens=12)
+    assert onnx_text == whisper_fast.transcribe_short(model, mel, max_tokens=12)
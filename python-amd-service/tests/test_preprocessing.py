@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from scipy.signal import resample_poly
+
+from preprocessing import (
+    nearest_vad_rate,
+    normalize_peak,
+    polyphase_filter,
+    prepare_audio,
+    resample,
+)
+
+
+def _tone(sample_rate, seconds=0.5, frequency=440.0):
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    return (0.5 * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+@pytest.mark.parametrize("orig_sr,target_sr", [(8000, 16000), (8000, 48000), (16000, 16000)])
+def test_integer_upsample_matches_resample_poly(orig_sr, target_sr):
+    audio = np.random.default_rng(0).standard_normal(1234).astype(np.float32)
+    up = target_sr // orig_sr
+
+    expected = resample_poly(audio, up, 1, window=polyphase_filter(up, 1)) if up > 1 else audio
+    result = resample(audio, orig_sr, target_sr)
+
+    assert result.dtype == np.float32
+    assert len(result) == len(audio) * up
+    np.testing.assert_allclose(result, expected, atol=1e-5)
+
+
+def test_rational_resample_preserves_tone():
+    audio = _tone(44100)
+    result = resample(audio, 44100, 16000)
+
+    assert len(result) == 8000
+    spectrum = np.abs(np.fft.rfft(result))
+    peak_hz = np.argmax(spectrum) * 16000 / len(result)
+    assert abs(peak_hz - 440.0) < 4.0
+
+
+def test_resample_empty_audio():
+    assert len(resample(np.zeros(0, dtype=np.float32), 8000, 16000)) == 0
+
+
+def test_normalize_peak():
+    np.testing.assert_allclose(normalize_peak(np.array([0.25, -0.5])), [0.5, -1.0])
+    np.testing.assert_array_equal(normalize_peak(np.zeros(3)), np.zeros(3))
+
+
+def test_nearest_vad_rate():
+    assert nearest_vad_rate(8000) == 8000
+    assert nearest_vad_rate(22050) == 16000
+    assert nearest_vad_rate(44100) == 48000
+
+
+def test_prepare_audio_caches_representations():
+    prepared = prepare_audio(_tone(8000), 8000)
+
+    assert prepared.duration == pytest.approx(0.5)
+    assert len(prepared.audio_16k) == 8000
+    assert np.max(np.abs(prepared.audio_16k)) == pytest.approx(1.0)
+    assert prepared.vad_pcm.dtype == np.int16
+    assert prepared.audio_16k is prepared.audio_16k
@@ -0,0 +1,130 @@
+import asyncio
+import os
+import time
+
+import numpy as np
+import pytest
+
+from result_cache import ResultCache, audio_key
+
+
+def test_audio_key_depends_on_samples_dtype_and_params():
+    samples = np.arange(8, dtype=np.float32)
+
+    assert audio_key(samples, 8000, "ensemble") == audio_key(samples.copy(), 8000, "ensemble")
+    assert audio_key(samples, 8000, "ensemble") != audio_key(samples, 16000, "ensemble")
+    assert audio_key(samples, 8000) != audio_key(samples.astype(np.float64), 8000)
+    assert audio_key(samples, 8000) != audio_key(samples[::-1], 8000)
+
+
+def test_get_returns_fresh_copy():
+    async def run():
+        cache = ResultCache()
+        await cache.put("a", {"detection": "human"})
+        first = await cache.get("a")
+        first["detection"] = "machine"
+        return await cache.get("a")
+
+    assert asyncio.run(run()) == {"detection": "human"}
+
+
+def test_lru_eviction_by_entries_and_bytes():
+    async def run():
+        cache = ResultCache(max_entries=2, max_bytes=1000)
+        await cache.put("a", {"v": 1})
+        await cache.put("b", {"v": 2})
+        await cache.get("a")  # b becomes the least recently used
+        await cache.put("c", {"v": 3})
+        by_entries = [await cache.get(key) for key in "abc"]
+
+        small = ResultCache(max_bytes=30)
+        await small.put("a", {"v": "x" * 10})
+        await small.put("b", {"v": "y" * 10})
+        await small.put("huge", {"v": "z" * 100})
+        by_bytes = [await small.get(key) for key in ("a", "b", "huge")]
+        return by_entries, by_bytes, cache.evictions
+
+    by_entries, by_bytes, evictions = asyncio.run(run())
+    assert by_entries == [{"v": 1}, None, {"v": 3}]
+    assert evictions == 1
+    assert by_bytes == [None, {"v": "y" * 10}, None]
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    async def run():
+        cache = ResultCache(ttl_seconds=10)
+        await cache.put("a", {"v": 1})
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 11)
+        return await cache.get("a"), cache.expirations
+
+    assert asyncio.run(run()) == (None, 1)
+
+
+def test_disabled_cache_never_stores():
+    async def run():
+        cache = ResultCache(max_entries=0)
+        await cache.put("a", {"v": 1})
+        return await cache.get("a"), cache.stats()["enabled"]
+
+    assert asyncio.run(run()) == (None, False)
+
+
+def test_concurrent_misses_share_one_computation():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"v": len(calls)}
+
+    async def run():
+        cache = ResultCache()
+        first = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(3)))
+        again = await cache.get_or_compute("k", compute)
+        return first, again
+
+    first, again = asyncio.run(run())
+    assert len(calls) == 1
+    assert [source for _, source in first] == ["miss", "coalesced", "coalesced"]
+    assert again == ({"v": 1}, "hit")
+
+
+def test_uncacheable_results_and_failures_are_not_stored():
+    async def failing():
+        raise RuntimeError("model crashed")
+
+    async def partial():
+        return {"timed_out": ["whisper"]}
+
+    async def run():
+        cache = ResultCache()
+        with pytest.raises(RuntimeError):
+            await cache.get_or_compute("fail", failing)
+        value, _ = await cache.get_or_compute("partial", partial, cacheable=lambda v: not v.get("timed_out"))
+        return value, await cache.get("fail"), await cache.get("partial")
+
+    assert asyncio.run(run()) == ({"timed_out": ["whisper"]}, None, None)
+
+
+def test_disk_entries_survive_a_new_cache(tmp_path):
+    async def run():
+        await ResultCache(disk_dir=str(tmp_path)).put("abcd", {"v": 1})
+        restarted = ResultCache(disk_dir=str(tmp_path))
+        return await restarted.get("abcd"), restarted.disk_hits
+
+    assert asyncio.run(run()) == ({"v": 1}, 1)
+
+
+def test_disk_prune_removes_expired_then_oldest(tmp_path):
+    cache = ResultCache(disk_dir=str(tmp_path), ttl_seconds=100, disk_max_bytes=20)
+    now = time.time()
+    for key, age in (("aa-expired", 200), ("aa-old", 50), ("aa-new", 10)):
+        cache._disk_put(key, b"x" * 12)
+        os.utime(cache._disk_path(key), (now - age, now - age))
+    writing = os.path.join(str(tmp_path), "aa", "aa-writing.json.1.tmp")
+    with open(writing, "wb") as f:
+        f.write(b"x" * 100)
+
+    assert cache._disk_prune() == 2
+    assert sorted(os.listdir(os.path.join(str(tmp_path), "aa"))) == ["aa-new.json", "aa-writing.json.1.tmp"]
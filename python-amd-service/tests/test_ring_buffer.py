@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from ring_buffer import AudioRingBuffer
+
+
+def test_rejects_non_positive_capacity():
+    with pytest.raises(ValueError):
+        AudioRingBuffer(0)
+
+
+def test_window_returns_samples_in_order():
+    buffer = AudioRingBuffer(8)
+    buffer.append(np.arange(5, dtype=np.float32))
+
+    assert len(buffer) == 5
+    np.testing.assert_array_equal(buffer.window(), np.arange(5))
+    np.testing.assert_array_equal(buffer.window(3), np.arange(3))
+
+
+def test_window_is_contiguous_across_wraparound():
+    buffer = AudioRingBuffer(8)
+    buffer.append(np.arange(6, dtype=np.float32))
+    buffer.consume(4)
+    buffer.append(np.arange(6, 12, dtype=np.float32))
+
+    window = buffer.window()
+    assert window.flags.c_contiguous
+    np.testing.assert_array_equal(window, np.arange(4, 12))
+
+
+def test_window_is_read_only_view():
+    buffer = AudioRingBuffer(4)
+    buffer.append(np.ones(4, dtype=np.float32))
+
+    window = buffer.window()
+    assert not window.flags.writeable
+    assert np.shares_memory(window, buffer._data)
+
+
+def test_overflow_drops_oldest_samples():
+    buffer = AudioRingBuffer(4)
+    buffer.append(np.arange(3, dtype=np.float32))
+    buffer.append(np.arange(3, 6, dtype=np.float32))
+
+    assert len(buffer) == 4
+    assert buffer.dropped == 2
+    np.testing.assert_array_equal(buffer.window(), np.arange(2, 6))
+
+
+def test_append_larger_than_capacity_keeps_tail():
+    buffer = AudioRingBuffer(4)
+    buffer.append(np.arange(10, dtype=np.float32))
+
+    assert buffer.dropped == 6
+    np.testing.assert_array_equal(buffer.window(), np.arange(6, 10))
+
+
+def test_consume_and_clear():
+    buffer = AudioRingBuffer(4)
+    buffer.append(np.arange(4, dtype=np.float32))
+    buffer.consume(10)
+    assert len(buffer) == 0
+
+    buffer.append(np.arange(2, dtype=np.float32))
+    buffer.clear()
+    assert len(buffer) == 0
+    assert buffer.window().size == 0
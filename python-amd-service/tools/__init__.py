@@ -0,0 +1,4 @@
+"""
+Offline commands for the AMD ML microservice
+Run from python-amd-service/, e.g. `python -m tools.evaluate_cascade <corpus>`
+"""
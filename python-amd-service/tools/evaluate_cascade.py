@@ -0,0 +1,82 @@
+"""
+Measure how much compute the cascade saves on a labeled corpus
+
+Runs the full ensemble and the cascade on every clip and reports per-stage
+compute time, early-exit rate, accuracy and agreement between the two.
+Usage: python -m tools.evaluate_cascade <corpus_dir> [--threshold 0.75]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from collections import Counter
+
+import config
+from tools.labeled_audio import iter_labeled_clips
+
+
+def _compute_ms(result: dict) -> float:
+    return sum(member.get("latency_ms", 0.0) for member in result.get("individual_results", []))
+
+
+async def evaluate(corpus: str) -> dict:
+    import main
+
+    logging.getLogger().setLevel(logging.WARNING)
+    main.load_model_weights(list(main.ENSEMBLE_MEMBERS))
+
+    clips = 0
+    full_ms = cascade_ms = 0.0
+    full_correct = cascade_correct = agreement = early_exits = 0
+    stages = Counter()
+
+    for path, label, audio, sample_rate in iter_labeled_clips(corpus):
+        prepared = main.prepare_window(audio, sample_rate, main.ENSEMBLE_MEMBERS)
+        full = main.ensemble_analysis([await main.run_analyzer(name, prepared) for name in main.ENSEMBLE_MEMBERS])
+        cascade = await main.cascade_analysis(
+            main.prepare_window(audio, sample_rate, main.CHEAP_ANALYZERS), deadlines=False
+        )
+
+        clips += 1
+        full_ms += _compute_ms(full)
+        cascade_ms += _compute_ms(cascade)
+        full_correct += full["detection"] == label
+        cascade_correct += cascade["detection"] == label
+        agreement += full["detection"] == cascade["detection"]
+        early_exits += cascade["early_exit"]
+        stages.update(cascade["stages_run"])
+
+    await main.stop_schedulers()
+
+    if not clips:
+        raise SystemExit(f"No labeled clips found under {corpus}")
+
+    return {
+        "clips": clips,
+        "threshold": config.CASCADE_THRESHOLD,
+        "full_compute_ms": full_ms,
+        "cascade_compute_ms": cascade_ms,
+        "compute_saved_pct": 100.0 * (1 - cascade_ms / full_ms) if full_ms else 0.0,
+        "early_exit_rate": early_exits / clips,
+        "stage_run_rate": {name: count / clips for name, count in stages.items()},
+        "full_accuracy": full_correct / clips,
+        "cascade_accuracy": cascade_correct / clips,
+        "agreement": agreement / clips,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="Directory with human/ and machine/ subdirectories")
+    parser.add_argument("--threshold", type=float, help="Override CASCADE_THRESHOLD")
+    args = parser.parse_args()
+
+    if args.threshold is not None:
+        config.CASCADE_THRESHOLD = args.threshold
+
+    print(json.dumps(asyncio.run(evaluate(args.corpus)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Check the ONNX Runtime backend against PyTorch and compare their latency
+
+Loads each model on both backends in one process, runs every clip through
+both and reports the largest logit difference, transcription and detection
+agreement and per-clip latency. Exits non-zero when detections agree on
+fewer than --min-agreement of the clips, so it doubles as an equivalence test.
+Usage: python -m tools.evaluate_onnx [corpus_dir] [--models wav2vec2 whisper] [--precision fp32] [--threads 2]
+       (without corpus_dir the synthetic corpus of benchmarks.corpus is used)
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+import torch
+
+import config
+import onnx_backend
+from tools.labeled_audio import iter_labeled_clips
+
+MODELS = ("wav2vec2", "whisper")
+BACKEND_SETTINGS = {"wav2vec2": "WAV2VEC2_BACKEND", "whisper": "WHISPER_BACKEND"}
+PRECISION_SETTINGS = {"wav2vec2": "WAV2VEC2_PRECISION", "whisper": "WHISPER_PRECISION"}
+
+
+def load_clips(corpus: Optional[str], count: int, seconds: float) -> List[Tuple[str, np.ndarray, int]]:
+    """(name, audio, sample_rate) from a labeled corpus, or synthetic 8kHz clips"""
+    if corpus:
+        return [(os.path.basename(path), audio, rate) for path, _, audio, rate in iter_labeled_clips(corpus)]
+    from benchmarks.corpus import SAMPLE_RATE, make_corpus
+
+    return [(name, audio, SAMPLE_RATE) for name, _, audio in make_corpus(count, seconds, seed=0)]
+
+
+def _analyze(main, model: str, prepared) -> dict:
+    if model == "wav2vec2":
+        return main.wav2vec2_result(main.transcribe_wav2vec2_batch([prepared])[0])
+    return main.whisper_result(main.transcribe_whisper_batch([prepared])[0])
+
+
+@torch.no_grad()
+def logit_difference(main, model: str, onnx_model, prepared) -> Optional[float]:
+    """Largest absolute difference between the backends' logits for one window
+
+    Wav2Vec2: CTC logits (and the acoustic head's pooled states). Whisper: the
+    first decode step's logits, for windows the short-window decode handles.
+    """
+    if model == "wav2vec2":
+        from acoustic_head import encode
+
+        head = main.models.get("acoustic_head")
+        inputs = main.models["wav2vec2_processor"](prepared.audio_16k, sampling_rate=16000, return_tensors="pt")
+        args = (inputs.input_values, inputs.get("attention_mask"), [len(prepared.audio_16k)],
+                [head.layer] if head is not None else [])
+        torch_logits, torch_pooled = encode(main.models["wav2vec2_model"], *args)
+        onnx_logits, onnx_pooled = onnx_model.encode(*args)
+        return max(
+            float((a - b).abs().max())
+            for a, b in [(torch_logits, onnx_logits)] + list(zip(torch_pooled, onnx_pooled))
+        )
+
+    import whisper_fast
+    from whisper.tokenizer import get_tokenizer
+
+    n_samples = main.whisper_mel_samples(prepared.duration)
+    if n_samples is None:
+        return None
+    whisper_model = main.models["whisper"]
+    mel = torch.from_numpy(prepared.log_mel(whisper_model.dims.n_mels, n_samples))[None]
+    tokenizer = get_tokenizer(whisper_model.is_multilingual, num_languages=whisper_model.num_languages,
+                              language=config.WHISPER_LANGUAGE, task="transcribe")
+    tokens = torch.tensor([list(tokenizer.sot_sequence_including_notimestamps)])
+
+    torch_logits = whisper_model.decoder(tokens, whisper_fast.encode_trimmed(whisper_model, mel))[:, -1]
+    encoder, decoder = onnx_model.sessions()
+    cross_k, cross_v = encoder.run(None, {"mel": mel.numpy()})
+    empty = np.zeros((whisper_model.dims.n_text_layer, 1, 0, whisper_model.dims.n_text_state), dtype=np.float32)
+    onnx_logits = decoder.run(["logits"], {
+        "tokens": tokens.numpy(), "self_k": empty, "self_v": empty, "cross_k": cross_k, "cross_v": cross_v,
+    })[0]
+    return float((torch_logits - torch.from_numpy(onnx_logits)).abs().max())
+
+
+def _latency(values: List[float]) -> dict:
+    values = np.array(values)
+    return {
+        "latency_ms_avg": float(values.mean()),
+        "latency_ms_p50": float(np.percentile(values, 50)),
+        "latency_ms_p95": float(np.percentile(values, 95)),
+    }
+
+
+def evaluate_model(main, model: str, clips, precision: str, threads: int) -> dict:
+    """Run one model over the clips on both backends, alternating which goes first"""
+    setattr(config, PRECISION_SETTINGS[model], precision)
+    setattr(config, BACKEND_SETTINGS[model], "torch")
+    main.load_model_weights([model])
+    source = main._model_source(model, config.WAV2VEC2_MODEL if model == "wav2vec2" else config.WHISPER_MODEL)
+    cls = onnx_backend.OnnxWav2Vec2 if model == "wav2vec2" else onnx_backend.OnnxWhisper
+    onnx_model = main._load_onnx(cls, model, source, precision, threads)
+    onnx_key = f"{model}_onnx"
+
+    def run(backend: str, prepared) -> Tuple[dict, float]:
+        if backend == "onnx":
+            main.models[onnx_key] = onnx_model
+        else:
+            main.models.pop(onnx_key, None)
+        start = time.perf_counter()
+        result = _analyze(main, model, prepared)
+        return result, (time.perf_counter() - start) * 1000
+
+    windows = [main.prepare_window(audio, rate, (model,)) for _, audio, rate in clips]
+    for backend in ("torch", "onnx"):
+        run(backend, windows[0])  # lazy initialization does not count against the first clip
+
+    latencies = {"torch": [], "onnx": []}
+    results = {"torch": [], "onnx": []}
+    differences = []
+    for i, prepared in enumerate(windows):
+        for backend in (("torch", "onnx") if i % 2 == 0 else ("onnx", "torch")):
+            result, ms = run(backend, prepared)
+            results[backend].append(result)
+            latencies[backend].append(ms)
+        difference = logit_difference(main, model, onnx_model, prepared)
+        if difference is not None:
+            differences.append(difference)
+
+    main.models.pop(onnx_key, None)
+    torch_latency, onnx_latency = _latency(latencies["torch"]), _latency(latencies["onnx"])
+    pairs = list(zip(results["torch"], results["onnx"]))
+    mismatches = [
+        {"clip": clips[i][0], "torch": a["detection"], "onnx": b["detection"]}
+        for i, (a, b) in enumerate(pairs) if a["detection"] != b["detection"]
+    ]
+    return {
+        "clips": len(pairs),
+        "precision": precision,
+        "torch": torch_latency,
+        "onnx": onnx_latency,
+        "speedup": torch_latency["latency_ms_avg"] / onnx_latency["latency_ms_avg"],
+        "max_logit_difference": max(differences) if differences else None,
+        "compared_windows": len(differences),
+        "transcription_match": sum(a["transcription"] == b["transcription"] for a, b in pairs) / len(pairs),
+        "detection_agreement": 1 - len(mismatches) / len(pairs),
+        "detection_mismatches": mismatches[:10],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", nargs="?", help="Directory with human/ and machine/ subdirectories")
+    parser.add_argument("--models", nargs="+", choices=MODELS, default=list(MODELS))
+    parser.add_argument("--precision", choices=("fp32", "int8"), default="fp32", help="Same on both backends")
+    parser.add_argument("--threads", type=int, default=0, help="Intra-op threads on both backends (0 = default)")
+    parser.add_argument("--clips", type=int, default=24, help="Synthetic clips without a corpus")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Synthetic clip length")
+    parser.add_argument("--min-agreement", type=float, default=1.0,
+                        help="Fail below this detection agreement (default: every clip)")
+    args = parser.parse_args()
+
+    import main as service
+    from quantization import set_num_threads
+
+    logging.getLogger().setLevel(logging.WARNING)
+    set_num_threads(args.threads)
+    clips = load_clips(args.corpus, args.clips, args.seconds)
+    if not clips:
+        raise SystemExit(f"No labeled clips found under {args.corpus}")
+
+    report = {model: evaluate_model(service, model, clips, args.precision, args.threads) for model in args.models}
+    print(json.dumps(report, indent=2))
+    failed = [model for model, result in report.items() if result["detection_agreement"] < args.min_agreement]
+    if failed:
+        raise SystemExit(f"Detections differ between backends for: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Compare int8-quantized models against the fp32 baseline on a labeled corpus
+
+Each (model, precision) pair runs in a fresh worker process so memory numbers
+are not polluted by the other run. Reports per-clip latency, resident memory,
+serialized weight size, detection agreement with fp32 and accuracy.
+Usage: python -m tools.evaluate_quantization <corpus_dir> [--models wav2vec2 whisper] [--threads 2]
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import config
+from tools.labeled_audio import iter_labeled_clips
+
+MODELS = ("wav2vec2", "whisper")
+PRECISION_SETTINGS = {"wav2vec2": "WAV2VEC2_PRECISION", "whisper": "WHISPER_PRECISION"}
+
+
+def _rss_mb() -> float:
+    """Current resident set size (Linux), falling back to the peak elsewhere"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _analyze(main, model: str, prepared) -> dict:
+    if model == "wav2vec2":
+        return main.wav2vec2_result(main.transcribe_wav2vec2_batch([prepared])[0])
+    return main.whisper_result(main.transcribe_whisper_batch([prepared])[0])
+
+
+def evaluate_precision(corpus: str, model: str, precision: str, threads: int = 0) -> dict:
+    """Load one model at one precision and run it over the corpus (worker process entry point)"""
+    import main
+    from quantization import model_size_bytes, set_num_threads
+
+    logging.getLogger().setLevel(logging.WARNING)
+    set_num_threads(threads)
+    setattr(config, PRECISION_SETTINGS[model], precision)
+
+    rss_before = _rss_mb()
+    main.load_model_weights([model])
+    rss_loaded = _rss_mb()
+    weights = main.models["wav2vec2_model" if model == "wav2vec2" else "whisper"]
+
+    clips = list(iter_labeled_clips(corpus))
+    if clips:
+        # Warm up lazy initialization so it does not count against the first clip
+        _analyze(main, model, main.prepare_window(clips[0][2], clips[0][3], (model,)))
+
+    latencies, detections, labels, transcriptions = [], [], [], []
+    for path, label, audio, sample_rate in clips:
+        prepared = main.prepare_window(audio, sample_rate, (model,))
+        start = time.perf_counter()
+        result = _analyze(main, model, prepared)
+        latencies.append((time.perf_counter() - start) * 1000)
+        detections.append(result["detection"])
+        transcriptions.append(result["transcription"])
+        labels.append(label)
+
+    return {
+        "latencies_ms": latencies,
+        "detections": detections,
+        "transcriptions": transcriptions,
+        "labels": labels,
+        "model_size_mb": model_size_bytes(weights) / 2**20,
+        "rss_model_mb": rss_loaded - rss_before,
+        "rss_peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def _run_isolated(corpus: str, model: str, precision: str, threads: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(evaluate_precision, corpus, model, precision, threads).result()
+
+
+def _summary(run: dict) -> dict:
+    latencies = np.array(run["latencies_ms"])
+    correct = sum(d == label for d, label in zip(run["detections"], run["labels"]))
+    return {
+        "latency_ms_avg": float(latencies.mean()),
+        "latency_ms_p95": float(np.percentile(latencies, 95)),
+        "model_size_mb": run["model_size_mb"],
+        "rss_model_mb": run["rss_model_mb"],
+        "rss_peak_mb": run["rss_peak_mb"],
+        "accuracy": correct / len(latencies),
+    }
+
+
+def compare(baseline: dict, quantized: dict) -> dict:
+    """Summarize an fp32 run and an int8 run of the same model over the same clips"""
+    clips = len(baseline["detections"])
+    fp32, int8 = _summary(baseline), _summary(quantized)
+    return {
+        "clips": clips,
+        "fp32": fp32,
+        "int8": int8,
+        "speedup": fp32["latency_ms_avg"] / int8["latency_ms_avg"] if int8["latency_ms_avg"] else 0.0,
+        "detection_agreement": sum(a == b for a, b in zip(baseline["detections"], quantized["detections"])) / clips,
+        "transcription_match": sum(a == b for a, b in zip(baseline["transcriptions"], quantized["transcriptions"])) / clips,
+    }
+
+
+def evaluate(corpus: str, models=MODELS, threads: int = 0) -> dict:
+    report = {}
+    for model in models:
+        baseline = _run_isolated(corpus, model, "fp32", threads)
+        if not baseline["detections"]:
+            raise SystemExit(f"No labeled clips found under {corpus}")
+        report[model] = compare(baseline, _run_isolated(corpus, model, "int8", threads))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="Directory with human/ and machine/ subdirectories")
+    parser.add_argument("--models", nargs="+", choices=MODELS, default=list(MODELS))
+    parser.add_argument("--threads", type=int, default=0, help="Torch intra-op threads (0 = default)")
+    args = parser.parse_args()
+
+    print(json.dumps(evaluate(args.corpus, args.models, args.threads), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Snapshot every model into the local artifact store for offline startup
+
+Run once on a host with network access; the service then loads the snapshot
+with MODEL_STORE_DIR=<store_dir> and never contacts a model hub.
+Usage: python -m tools.export_models <store_dir> [--version 2024-06-01] [--models wav2vec2 whisper]
+       python -m tools.export_models <store_dir> --verify [--version latest]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+
+import config
+import model_store
+
+
+def _export_wav2vec2(dest: str) -> str:
+    from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor
+
+    Wav2Vec2Processor.from_pretrained(config.WAV2VEC2_MODEL).save_pretrained(dest)
+    Wav2Vec2ForCTC.from_pretrained(config.WAV2VEC2_MODEL).save_pretrained(dest, safe_serialization=True)
+    return config.WAV2VEC2_MODEL
+
+
+def _export_whisper(dest: str) -> str:
+    import whisper
+
+    model = whisper.load_model(config.WHISPER_MODEL, device="cpu")
+    model_store.save_whisper(model, dest, whisper._ALIGNMENT_HEADS.get(config.WHISPER_MODEL))
+    return config.WHISPER_MODEL
+
+
+EXPORTERS = {
+    "wav2vec2": _export_wav2vec2,
+    "whisper": _export_whisper,
+}
+
+
+def export(root: str, version: str, names) -> str:
+    """Write a complete store version, then publish it as LATEST"""
+    final_dir = os.path.join(root, version)
+    if os.path.exists(final_dir):
+        raise SystemExit(f"{final_dir} already exists; store versions are immutable")
+
+    # Build in a scratch directory so a failed export never looks complete
+    partial_dir = os.path.join(root, f".{version}.partial")
+    shutil.rmtree(partial_dir, ignore_errors=True)
+    os.makedirs(partial_dir)
+
+    sources = {}
+    for name in names:
+        start = time.perf_counter()
+        sources[name] = EXPORTERS[name](os.path.join(partial_dir, name))
+        print(f"Exported {name} from {sources[name]} in {time.perf_counter() - start:.1f}s")
+
+    model_store.write_manifest(partial_dir, sources)
+    os.replace(partial_dir, final_dir)
+
+    pointer = os.path.join(root, f".{model_store.LATEST}.tmp")
+    with open(pointer, "w") as f:
+        f.write(version + "\n")
+    os.replace(pointer, os.path.join(root, model_store.LATEST))
+    return final_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("store", help="Artifact store root directory")
+    parser.add_argument("--version", help="Version name (default: UTC timestamp; 'latest' with --verify)")
+    parser.add_argument("--models", nargs="+", choices=model_store.STORE_MODELS, default=list(model_store.STORE_MODELS))
+    parser.add_argument("--verify", action="store_true", help="Re-hash an existing version against its manifest")
+    args = parser.parse_args()
+
+    if args.verify:
+        version_dir = model_store.resolve_version(args.store, args.version or "latest")
+        results = model_store.verify(version_dir)
+        print(json.dumps({"version": version_dir, "models": results}, indent=2))
+        raise SystemExit(0 if all(results.values()) else 1)
+
+    os.makedirs(args.store, exist_ok=True)
+    version = args.version or time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    print(f"Model store version ready: {export(args.store, version, args.models)}")
+
+
+if __name__ == "__main__":
+    main()
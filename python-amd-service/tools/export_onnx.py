@@ -0,0 +1,247 @@
+"""
+Export the locally cached Wav2Vec2-CTC and Whisper models to ONNX
+
+Reads the same sources as the service (MODEL_STORE_DIR when set, otherwise the
+hub caches) and writes <out_dir>/wav2vec2 and <out_dir>/whisper for
+WAV2VEC2_BACKEND=onnx / WHISPER_BACKEND=onnx. With --int8, also writes graphs
+whose MatMul weights are dynamically quantized (used with *_PRECISION=int8).
+Usage: python -m tools.export_onnx [out_dir] [--models wav2vec2 whisper] [--int8] [--opset 17]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+import warnings
+
+import torch
+import torch.nn.functional as F
+from torch import nn
+
+import config
+import onnx_backend
+import whisper_fast
+
+MODELS = ("wav2vec2", "whisper")
+
+
+class Wav2Vec2Graph(nn.Module):
+    """Wav2Vec2ForCTC up to the logits, also returning the final and every per-layer hidden state
+
+    The final state is its own output: with do_stable_layer_norm it is the last
+    layer's output after the encoder's closing layer norm.
+    """
+
+    def __init__(self, model, with_attention_mask: bool):
+        super().__init__()
+        self.model = model
+        self.with_attention_mask = with_attention_mask
+
+    def forward(self, input_values: torch.Tensor, attention_mask: torch.Tensor = None):
+        outputs = self.model.wav2vec2(
+            input_values, attention_mask=attention_mask if self.with_attention_mask else None,
+            output_hidden_states=True,
+        )
+        last = outputs.last_hidden_state
+        return (self.model.lm_head(last), last, *outputs.hidden_states)
+
+
+def _attention(q: torch.Tensor, k: torch.Tensor, v: torch.Tensor, n_head: int, mask: torch.Tensor = None):
+    """whisper's MultiHeadAttention.qkv_attention without SDPA, so it exports to plain ops"""
+    scale = (q.shape[-1] // n_head) ** -0.25
+    q = q.view(*q.shape[:2], n_head, -1).permute(0, 2, 1, 3)
+    k = k.view(*k.shape[:2], n_head, -1).permute(0, 2, 1, 3)
+    v = v.view(*v.shape[:2], n_head, -1).permute(0, 2, 1, 3)
+    qk = (q * scale) @ (k * scale).transpose(-1, -2)
+    if mask is not None:
+        qk = qk + mask
+    w = F.softmax(qk.float(), dim=-1).to(q.dtype)
+    return (w @ v).permute(0, 2, 1, 3).flatten(start_dim=2)
+
+
+class WhisperEncoderGraph(nn.Module):
+    """Trimmed encoder (whisper_fast.encode_trimmed) plus each decoder layer's cross-attention keys/values"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, mel: torch.Tensor):
+        audio_features = whisper_fast.encode_trimmed(self.model, mel)
+        blocks = self.model.decoder.blocks
+        cross_k = torch.stack([block.cross_attn.key(audio_features) for block in blocks])
+        cross_v = torch.stack([block.cross_attn.value(audio_features) for block in blocks])
+        return cross_k, cross_v
+
+
+class WhisperDecoderGraph(nn.Module):
+    """One cached TextDecoder step: new tokens -> last position's logits and the extended self-attention cache"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, tokens, self_k, self_v, cross_k, cross_v):
+        decoder = self.model.decoder
+        n_head = self.model.dims.n_text_head
+        offset = self_k.shape[2]
+        end = offset + tokens.shape[1]
+        x = decoder.token_embedding(tokens) + decoder.positional_embedding[offset:end]
+        mask = decoder.mask[offset:end, :end]
+
+        keys, values = [], []
+        for i, block in enumerate(decoder.blocks):
+            h = block.attn_ln(x)
+            k = torch.cat([self_k[i], block.attn.key(h)], dim=1)
+            v = torch.cat([self_v[i], block.attn.value(h)], dim=1)
+            keys.append(k)
+            values.append(v)
+            x = x + block.attn.out(_attention(block.attn.query(h), k, v, n_head, mask))
+            h = block.cross_attn_ln(x)
+            x = x + block.cross_attn.out(_attention(block.cross_attn.query(h), cross_k[i], cross_v[i], n_head))
+            x = x + block.mlp(block.mlp_ln(x))
+
+        x = decoder.ln(x[:, -1])
+        logits = (x @ torch.transpose(decoder.token_embedding.weight.to(x.dtype), 0, 1)).float()
+        return logits, torch.stack(keys), torch.stack(values)
+
+
+def _export(module: nn.Module, args: tuple, path: str, input_names, output_names, dynamic_axes, opset: int):
+    # The exporter restores the wrapper's mode afterwards; a new module would put the model in training mode
+    module.eval()
+    with warnings.catch_warnings(), torch.no_grad():
+        # The TorchScript-based exporter warns about tracing and its own deprecation
+        warnings.simplefilter("ignore")
+        torch.onnx.export(
+            module, args, path, input_names=input_names, output_names=output_names,
+            dynamic_axes=dynamic_axes, opset_version=opset, dynamo=False,
+        )
+
+
+def _quantize(directory: str, names):
+    """Dynamic int8 quantization of MatMul/Gemm weights, mirroring quantization.py's Linear-only int8"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    for name in names:
+        quantize_dynamic(
+            onnx_backend.graph_path(directory, name), onnx_backend.graph_path(directory, name, "int8"),
+            op_types_to_quantize=["MatMul", "Gemm"], weight_type=QuantType.QInt8,
+        )
+
+
+def write_wav2vec2(model, with_attention_mask: bool, dest: str, opset: int = 17, int8: bool = False) -> dict:
+    """Write a Wav2Vec2ForCTC's graph into dest; returns the metadata OnnxWav2Vec2 reads"""
+    input_values = torch.zeros(2, 16000)
+    input_names = ["input_values"] + (["attention_mask"] if with_attention_mask else [])
+    example = (input_values,) + ((torch.ones(2, 16000, dtype=torch.long),) if with_attention_mask else ())
+    hidden = ["last_hidden_state"] + [f"hidden_states.{i}" for i in range(model.config.num_hidden_layers + 1)]
+    axes = {name: {0: "batch", 1: "samples"} for name in input_names}
+    axes.update({name: {0: "batch", 1: "frames"} for name in ["logits"] + hidden})
+    _export(Wav2Vec2Graph(model, with_attention_mask), example, onnx_backend.graph_path(dest, "model"),
+            input_names, ["logits"] + hidden, axes, opset)
+    if int8:
+        _quantize(dest, ["model"])
+
+    return {
+        "hidden_size": model.config.hidden_size,
+        "num_hidden_layers": model.config.num_hidden_layers,
+        "conv_kernel": list(model.config.conv_kernel),
+        "conv_stride": list(model.config.conv_stride),
+    }
+
+
+def write_whisper(model, dest: str, opset: int = 17, int8: bool = False) -> dict:
+    """Write a Whisper model's encoder and decoder-step graphs into dest; returns the metadata OnnxWhisper reads"""
+    import whisper
+
+    dims = model.dims
+    mel = torch.zeros(2, dims.n_mels, whisper_fast.mel_samples(16000) // whisper.audio.HOP_LENGTH)
+    _export(WhisperEncoderGraph(model), (mel,), onnx_backend.graph_path(dest, "encoder"),
+            ["mel"], ["cross_k", "cross_v"],
+            {"mel": {0: "batch", 2: "frames"}, "cross_k": {1: "batch", 2: "audio_ctx"},
+             "cross_v": {1: "batch", 2: "audio_ctx"}}, opset)
+
+    with torch.no_grad():
+        cross_k, cross_v = WhisperEncoderGraph(model)(mel)
+    cache = torch.zeros(dims.n_text_layer, 2, 3, dims.n_text_state)
+    tokens = torch.zeros(2, 1, dtype=torch.long)
+    cache_axes = {1: "batch", 2: "past"}
+    _export(WhisperDecoderGraph(model), (tokens, cache, cache, cross_k, cross_v),
+            onnx_backend.graph_path(dest, "decoder"),
+            ["tokens", "self_k", "self_v", "cross_k", "cross_v"], ["logits", "new_self_k", "new_self_v"],
+            {"tokens": {0: "batch", 1: "new"}, "self_k": cache_axes, "self_v": cache_axes,
+             "cross_k": {1: "batch", 2: "audio_ctx"}, "cross_v": {1: "batch", 2: "audio_ctx"},
+             "logits": {0: "batch"}, "new_self_k": {1: "batch", 2: "total"}, "new_self_v": {1: "batch", 2: "total"}},
+            opset)
+    if int8:
+        _quantize(dest, ["encoder", "decoder"])
+
+    return {"dims": vars(dims)}
+
+
+def _export_wav2vec2(dest: str, args) -> dict:
+    import main
+    from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor
+
+    source = main._model_source("wav2vec2", config.WAV2VEC2_MODEL)
+    local = bool(config.MODEL_STORE_DIR)
+    processor = Wav2Vec2Processor.from_pretrained(source, local_files_only=local)
+    model = Wav2Vec2ForCTC.from_pretrained(source, local_files_only=local, attn_implementation="eager").eval()
+    with_mask = bool(processor.feature_extractor.return_attention_mask)
+    return {"source": source, **write_wav2vec2(model, with_mask, dest, args.opset, args.int8)}
+
+
+def _export_whisper(dest: str, args) -> dict:
+    import main
+    import model_store
+    import whisper
+
+    source = main._model_source("whisper", config.WHISPER_MODEL)
+    if config.MODEL_STORE_DIR:
+        model = model_store.load_whisper(source, device="cpu")
+    else:
+        model = whisper.load_model(source, device="cpu")
+    return {"source": source, **write_whisper(model, dest, args.opset, args.int8)}
+
+
+EXPORTERS = {
+    "wav2vec2": _export_wav2vec2,
+    "whisper": _export_whisper,
+}
+
+
+def export(root: str, name: str, args) -> str:
+    """Write one model's graphs and metadata, replacing any previous export only once complete"""
+    final_dir = os.path.join(root, name)
+    partial_dir = os.path.join(root, f".{name}.partial")
+    shutil.rmtree(partial_dir, ignore_errors=True)
+    os.makedirs(partial_dir)
+
+    metadata = EXPORTERS[name](partial_dir, args)
+    metadata.update(opset=args.opset, int8=args.int8, exported_at=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()))
+    with open(os.path.join(partial_dir, onnx_backend.METADATA), "w") as f:
+        json.dump(metadata, f, indent=2, sort_keys=True)
+
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.replace(partial_dir, final_dir)
+    return final_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out_dir", nargs="?", default=config.ONNX_MODEL_DIR, help="Default: ONNX_MODEL_DIR")
+    parser.add_argument("--models", nargs="+", choices=MODELS, default=list(MODELS))
+    parser.add_argument("--int8", action="store_true", help="Also write dynamically quantized int8 graphs")
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    for name in args.models:
+        start = time.perf_counter()
+        path = export(args.out_dir, name, args)
+        print(f"Exported {name} to {path} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""
+Labeled audio corpus loader shared by the evaluation and training commands
+
+Layout: <root>/<label>/<clip>.wav where label is "human" or "machine".
+Any format soundfile can read (PCM, mu-law or A-law WAV, FLAC) is accepted.
+"""
+
+import os
+from typing import Iterator, Tuple
+
+import numpy as np
+import soundfile as sf
+
+LABELS = ("human", "machine")
+AUDIO_EXTENSIONS = (".wav", ".flac", ".ogg")
+
+
+def iter_labeled_clips(root: str) -> Iterator[Tuple[str, str, np.ndarray, int]]:
+    """Yield (path, label, mono float32 audio, sample_rate) for every clip"""
+    for label in LABELS:
+        label_dir = os.path.join(root, label)
+        if not os.path.isdir(label_dir):
+            continue
+        for name in sorted(os.listdir(label_dir)):
+            if not name.lower().endswith(AUDIO_EXTENSIONS):
+                continue
+            path = os.path.join(label_dir, name)
+            audio, sample_rate = sf.read(path, dtype="float32", always_2d=True)
+            yield path, label, audio.mean(axis=1), sample_rate
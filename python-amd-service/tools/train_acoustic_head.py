@@ -0,0 +1,201 @@
+"""
+Train and evaluate the acoustic human/machine head on a labeled corpus
+
+Cuts every clip into stream-sized windows, runs the service's Wav2Vec2 encoder
+once per window (frozen) to collect pooled hidden states of the candidate
+layers, and fits the small head on them, keeping the layer that validates best.
+Clips, not windows, are split into train and validation sets.
+Usage: python -m tools.train_acoustic_head <corpus_dir> [--layers -1 6 9] [--window 3.0] [--out acoustic_head.safetensors]
+       python -m tools.train_acoustic_head <corpus_dir> --evaluate [--head acoustic_head.safetensors]
+"""
+
+import argparse
+import json
+import logging
+import random
+import time
+from typing import Dict, List
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+import config
+from acoustic_head import LABELS, AcousticHead, encode, load_head, save_head
+from preprocessing import PreparedAudio
+from tools.labeled_audio import iter_labeled_clips
+
+
+def _windows(audio: np.ndarray, sample_rate: int, seconds: float) -> List[PreparedAudio]:
+    """Consecutive windows of `seconds`; a trailing remainder of at least half a window is kept"""
+    size = int(seconds * sample_rate)
+    windows = [PreparedAudio(audio[start:start + size], sample_rate) for start in range(0, len(audio), size)]
+    if len(windows) > 1 and len(windows[-1].audio) < size // 2:
+        windows.pop()
+    return windows
+
+
+def extract_features(corpus: str, seconds: float, layers: List[int], batch_size: int) -> Dict:
+    """Pooled hidden states per layer for every window, with window labels and clip ids"""
+    import main
+
+    logging.getLogger().setLevel(logging.WARNING)
+    config.WAV2VEC2_BACKEND = "torch"  # features are read from the PyTorch encoder
+    main.load_model_weights(["wav2vec2"])
+    processor, model = main.models["wav2vec2_processor"], main.models["wav2vec2_model"]
+
+    windows, labels, clip_ids = [], [], []
+    for clip_id, (_, label, audio, sample_rate) in enumerate(iter_labeled_clips(corpus)):
+        for window in _windows(audio, sample_rate, seconds):
+            windows.append(window)
+            labels.append(LABELS.index(label))
+            clip_ids.append(clip_id)
+    if not windows:
+        raise SystemExit(f"No labeled clips found under {corpus}")
+
+    features = {layer: [] for layer in layers}
+    encode_s = 0.0
+    for start in range(0, len(windows), batch_size):
+        audio = [window.audio_16k for window in windows[start:start + batch_size]]
+        inputs = processor(audio, sampling_rate=16000, return_tensors="pt", padding=True)
+        began = time.perf_counter()
+        _, pooled = encode(model, inputs.input_values, inputs.get("attention_mask"), [len(a) for a in audio], layers)
+        encode_s += time.perf_counter() - began
+        for layer, layer_features in zip(layers, pooled):
+            features[layer].append(layer_features.float())
+
+    return {
+        "features": {layer: torch.cat(chunks) for layer, chunks in features.items()},
+        "labels": torch.tensor(labels),
+        "clip_ids": torch.tensor(clip_ids),
+        "encode_ms_per_window": encode_s * 1000 / len(windows),
+    }
+
+
+def split_clips(clip_ids: torch.Tensor, val_fraction: float, seed: int):
+    """Window indices for train and validation, splitting whole clips"""
+    clips = sorted(set(clip_ids.tolist()))
+    random.Random(seed).shuffle(clips)
+    val_clips = set(clips[:max(1, int(len(clips) * val_fraction))]) if len(clips) > 1 else set()
+    is_val = torch.tensor([clip in val_clips for clip in clip_ids.tolist()])
+    return torch.nonzero(~is_val).flatten(), torch.nonzero(is_val).flatten()
+
+
+def train(features: torch.Tensor, labels: torch.Tensor, layer: int, args) -> AcousticHead:
+    """Full-batch AdamW on the frozen features, with class-balanced loss"""
+    torch.manual_seed(args.seed)
+    head = AcousticHead(features.shape[1], layer, args.hidden)
+    optimizer = torch.optim.AdamW(head.parameters(), lr=args.lr, weight_decay=args.weight_decay)
+    counts = torch.bincount(labels, minlength=len(LABELS)).float()
+    class_weights = counts.sum() / (len(LABELS) * counts.clamp(min=1))
+
+    head.train()
+    for _ in range(args.epochs):
+        optimizer.zero_grad()
+        loss = F.cross_entropy(head(features), labels, weight=class_weights)
+        loss.backward()
+        optimizer.step()
+    return head.eval()
+
+
+def evaluate(head: AcousticHead, features: torch.Tensor, labels: torch.Tensor, clip_ids: torch.Tensor) -> Dict:
+    """Window and clip-level (mean window probability) accuracy, per-label recall and log loss"""
+    if not len(labels):
+        return {}
+    probability = head.machine_probability(features)
+    predicted = (probability > 0.5).long()
+    machine = LABELS.index("machine")
+
+    clip_correct = []
+    for clip in set(clip_ids.tolist()):
+        members = clip_ids == clip
+        clip_correct.append(int(probability[members].mean() > 0.5) == int(labels[members][0]))
+
+    eps = 1e-6
+    target = (labels == machine).float()
+    log_loss = -(target * torch.log(probability + eps) + (1 - target) * torch.log(1 - probability + eps)).mean()
+    metrics = {
+        "windows": len(labels),
+        "accuracy": float((predicted == labels).float().mean()),
+        "clip_accuracy": float(np.mean(clip_correct)),
+        "log_loss": float(log_loss),
+    }
+    for index, label in enumerate(LABELS):
+        members = labels == index
+        if members.any():
+            metrics[f"{label}_recall"] = float((predicted[members] == index).float().mean())
+    return metrics
+
+
+def _head_ms_per_window(head: AcousticHead, features: torch.Tensor) -> float:
+    repeat = 20
+    began = time.perf_counter()
+    for _ in range(repeat):
+        head.machine_probability(features)
+    return (time.perf_counter() - began) * 1000 / (repeat * len(features))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="Directory with human/ and machine/ subdirectories")
+    parser.add_argument("--evaluate", action="store_true", help="Evaluate an existing head instead of training")
+    parser.add_argument("--head", default=config.ACOUSTIC_HEAD_PATH, help="Head file to evaluate")
+    parser.add_argument("--out", default=config.ACOUSTIC_HEAD_PATH, help="Where to write the trained head")
+    parser.add_argument("--layers", type=int, nargs="+", default=[-1], help="Encoder layers to try (-1 = last)")
+    parser.add_argument("--window", type=float, default=3.0, help="Window length in seconds (stream default 3s)")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--val-fraction", type=float, default=0.2)
+    parser.add_argument("--epochs", type=int, default=200)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--weight-decay", type=float, default=1e-2)
+    parser.add_argument("--hidden", type=int, default=128)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.evaluate:
+        head, metadata = load_head(args.head)
+        data = extract_features(args.corpus, args.window, [head.layer], args.batch_size)
+        features = data["features"][head.layer]
+        report = {
+            "head": args.head,
+            "layer": head.layer,
+            "trained_metrics": {key[len("metric."):]: value for key, value in metadata.items() if key.startswith("metric.")},
+            "metrics": evaluate(head, features, data["labels"], data["clip_ids"]),
+            "encode_ms_per_window": data["encode_ms_per_window"],
+            "head_ms_per_window": _head_ms_per_window(head, features),
+        }
+        print(json.dumps(report, indent=2))
+        return
+
+    data = extract_features(args.corpus, args.window, args.layers, args.batch_size)
+    train_idx, val_idx = split_clips(data["clip_ids"], args.val_fraction, args.seed)
+    labels, clip_ids = data["labels"], data["clip_ids"]
+
+    results, best = {}, None
+    for layer in args.layers:
+        features = data["features"][layer]
+        head = train(features[train_idx], labels[train_idx], layer, args)
+        results[str(layer)] = {
+            "train": evaluate(head, features[train_idx], labels[train_idx], clip_ids[train_idx]),
+            "validation": evaluate(head, features[val_idx], labels[val_idx], clip_ids[val_idx]),
+        }
+        score = results[str(layer)]["validation"].get("accuracy", results[str(layer)]["train"]["accuracy"])
+        if best is None or score > best[0]:
+            best = (score, layer, head)
+
+    _, layer, head = best
+    save_head(head, args.out, {f"validation_{key}": value for key, value in results[str(layer)]["validation"].items()})
+    print(json.dumps({
+        "windows": len(labels),
+        "train_windows": len(train_idx),
+        "validation_windows": len(val_idx),
+        "layers": results,
+        "selected_layer": layer,
+        "encode_ms_per_window": data["encode_ms_per_window"],
+        "head_ms_per_window": _head_ms_per_window(head, data["features"][layer]),
+        "saved": args.out,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
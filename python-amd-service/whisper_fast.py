@@ -0,0 +1,115 @@
+"""
+Low-latency Whisper decode for short AMD windows
+Encodes only the window's own mel frames instead of 30s of padding and
+decodes greedily in a fixed language with a bounded token budget
+"""
+
+import functools
+from typing import Callable, List, Tuple
+
+import torch
+import torch.nn.functional as F
+from whisper.audio import N_SAMPLES, SAMPLE_RATE
+from whisper.tokenizer import Tokenizer, get_tokenizer
+
+# Windows are padded up to a whole number of these so batches share a shape
+BUCKET_SAMPLES = SAMPLE_RATE
+
+
+def mel_samples(num_samples: int) -> int:
+    """Padded length (in 16kHz samples) the trimmed encoder input is computed at"""
+    buckets = max(1, -(-num_samples // BUCKET_SAMPLES))
+    return min(buckets * BUCKET_SAMPLES, N_SAMPLES)
+
+
+@functools.lru_cache(maxsize=8)
+def _decode_setup(multilingual: bool, num_languages: int, n_vocab: int, language: str) -> Tuple[Tokenizer, torch.Tensor]:
+    """Tokenizer and the tokens greedy decoding must never emit"""
+    tokenizer = get_tokenizer(multilingual, num_languages=num_languages, language=language, task="transcribe")
+    # Same set as whisper's default suppress_tokens="-1", plus timestamps
+    suppress = set(tokenizer.non_speech_tokens)
+    suppress.update([
+        tokenizer.transcribe, tokenizer.translate, tokenizer.sot, tokenizer.sot_prev,
+        tokenizer.sot_lm, tokenizer.no_speech,
+    ])
+    suppress.update(range(tokenizer.timestamp_begin, n_vocab))
+    return tokenizer, torch.tensor(sorted(t for t in suppress if t is not None and t < n_vocab))
+
+
+def encode_trimmed(model, mel: torch.Tensor) -> torch.Tensor:
+    """Whisper encoder over a short mel input, using only the positions it covers
+
+    Same computation as AudioEncoder.forward, minus the assertion that the
+    input spans the full 30s context.
+    """
+    encoder = model.encoder
+    x = F.gelu(encoder.conv1(mel))
+    x = F.gelu(encoder.conv2(x))
+    x = x.permute(0, 2, 1)
+    x = (x + encoder.positional_embedding[:x.shape[1]]).to(x.dtype)
+    for block in encoder.blocks:
+        x = block(x)
+    return encoder.ln_post(x)
+
+
+def greedy_decode(step: Callable[[torch.Tensor], torch.Tensor], dims, batch: int, language: str = "en",
+                  max_tokens: int = 48, device=None) -> List[str]:
+    """Greedy, fixed-language decode of `batch` sequences
+
+    `step(tokens)` returns the next-token logits (batch, n_vocab). It gets the
+    whole prompt first and then only the newest token, so it keeps its own
+    key/value cache. No language detection, temperature fallback or timestamp
+    decoding; decoding stops at end-of-text or after `max_tokens`.
+    """
+    multilingual = dims.n_vocab >= 51865
+    num_languages = dims.n_vocab - 51765 - int(multilingual)
+    tokenizer, suppress = _decode_setup(multilingual, num_languages, dims.n_vocab, language)
+
+    prompt = list(tokenizer.sot_sequence_including_notimestamps)
+    tokens = torch.tensor([prompt] * batch, device=device)
+    suppress = suppress.to(device)
+    # Like whisper's SuppressBlank: the first token may not be a space or end-of-text
+    first_suppress = torch.tensor(tokenizer.encode(" ") + [tokenizer.eot], device=device)
+    finished = torch.zeros(batch, dtype=torch.bool, device=device)
+
+    max_tokens = min(max_tokens, dims.n_text_ctx - len(prompt))
+    for i in range(max_tokens):
+        logits = step(tokens if i == 0 else tokens[:, -1:])
+        logits[:, suppress] = -float("inf")
+        if i == 0:
+            logits[:, first_suppress] = -float("inf")
+        next_tokens = logits.argmax(dim=-1)
+        next_tokens[finished] = tokenizer.eot
+        finished |= next_tokens == tokenizer.eot
+        tokens = torch.cat([tokens, next_tokens[:, None]], dim=-1)
+        if finished.all():
+            break
+
+    texts = []
+    for sequence in tokens[:, len(prompt):].tolist():
+        if tokenizer.eot in sequence:
+            sequence = sequence[:sequence.index(tokenizer.eot)]
+        texts.append(tokenizer.decode(sequence).strip())
+    return texts
+
+
+@torch.no_grad()
+def transcribe_short(model, mel: torch.Tensor, language: str = "en", max_tokens: int = 48) -> List[str]:
+    """Greedy, fixed-language transcription of a batch of short mel windows
+
+    `mel` is (batch, n_mels, frames) for windows padded to the same length
+    (see `mel_samples`).
+    """
+    if model.device.type == "cuda":
+        mel = mel.half()
+    audio_features = encode_trimmed(model, mel.to(model.device))
+
+    kv_cache, hooks = model.install_kv_cache_hooks()
+    try:
+        return greedy_decode(
+            lambda tokens: model.decoder(tokens, audio_features, kv_cache=kv_cache)[:, -1],
+            model.dims, mel.shape[0], language, max_tokens, model.device,
+        )
+    finally:
+        for hook in hooks:
+            hook.remove()